@@ -0,0 +1,146 @@
+# src/artifacts.py
+#
+# Sostituzione atomica delle cartelle di artefatti derivati (store dei chunk, indice BM25).
+# Ogni versione è una sottocartella della cartella dell'artefatto; il file CURRENT
+# contiene il nome della versione attiva e viene sostituito con os.replace, che è
+# atomico: chi legge vede sempre una versione completa, la vecchia o la nuova.
+# La versione precedente resta su disco (un lettore può averla appena scelta);
+# quelle più vecchie vengono eliminate alla pubblicazione successiva.
+# Una versione può contenere un manifest.json (id della generazione e sha256 dei
+# file), scritto prima della pubblicazione: la verifica completa dei file è
+# esplicita (verify_manifest), al caricamento basta confrontare l'id.
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+_TMP_SUFFIX = ".tmp"
+
+
+def new_version(base_dir: Path) -> Path:
+    """
+    Crea in base_dir la cartella di una nuova versione, ancora non visibile ai lettori.
+    """
+    version_dir = base_dir / f"v{time.time_ns()}-{os.getpid()}{_TMP_SUFFIX}"
+    version_dir.mkdir(parents=True)
+    return version_dir
+
+
+def current_version(base_dir: Path) -> Optional[Path]:
+    """
+    Cartella della versione attiva, o None se base_dir non ne ha ancora una.
+    """
+    try:
+        name = (base_dir / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    version_dir = base_dir / name
+    return version_dir if name and version_dir.is_dir() else None
+
+
+def publish_version(version_dir: Path) -> Path:
+    """
+    Rende attiva una versione completa (creata con new_version) e restituisce la
+    sua cartella definitiva. Le versioni anteriori a quella sostituita vengono
+    eliminate; quelle ancora in scrittura (.tmp) di altri processi restano.
+    """
+    base_dir = version_dir.parent
+    final_dir = version_dir.with_name(version_dir.name[: -len(_TMP_SUFFIX)])
+    os.replace(version_dir, final_dir)
+
+    previous = current_version(base_dir)
+    tmp_file = base_dir / f"{CURRENT_FILE}.{os.getpid()}{_TMP_SUFFIX}"
+    tmp_file.write_text(final_dir.name, encoding="utf-8")
+    os.replace(tmp_file, base_dir / CURRENT_FILE)
+
+    keep = {final_dir.name, previous.name if previous else ""}
+    for child in base_dir.iterdir():
+        if (
+            child.is_dir()
+            and child.name.startswith("v")
+            and not child.name.endswith(_TMP_SUFFIX)
+            and child.name not in keep
+            and child.name < final_dir.name
+        ):
+            # Su Windows una versione ancora aperta in mmap non si può eliminare: si riproverà
+            shutil.rmtree(child, ignore_errors=True)
+    return final_dir
+
+
+@contextmanager
+def writing_version(base_dir: Path) -> Iterator[Path]:
+    """
+    with writing_version(base_dir) as tmp_dir: scrive i file in tmp_dir e, se il
+    blocco termina senza errori, pubblica la versione; altrimenti la elimina.
+    """
+    version_dir = new_version(base_dir)
+    try:
+        yield version_dir
+    except BaseException:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+    publish_version(version_dir)
+
+
+class ManifestMismatchError(RuntimeError):
+    """
+    I file su disco non sono quelli registrati nel manifest (es. modificati dopo la build).
+    """
+
+
+def file_digest(path: Path) -> Dict:
+    """
+    Dimensione e sha256 del file.
+    """
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return {"size": path.stat().st_size, "sha256": h.hexdigest()}
+
+
+def new_generation_id() -> str:
+    return uuid.uuid4().hex
+
+
+def write_manifest(version_dir: Path, generation: str, files: List[str], **fields):
+    """
+    Scrive il manifest di una versione non ancora pubblicata: id della generazione,
+    campi aggiuntivi (es. numero di chunk) e dimensione e sha256 dei file indicati.
+    """
+    manifest = {
+        "generation": generation,
+        "created": time.time(),
+        **fields,
+        "files": {name: file_digest(version_dir / name) for name in files},
+    }
+    (version_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+
+def read_manifest(version_dir: Path) -> Dict:
+    manifest_file = version_dir / MANIFEST_FILE
+    if not manifest_file.exists():
+        raise FileNotFoundError(f"Manifest non trovato: {manifest_file}")
+    return json.loads(manifest_file.read_text(encoding="utf-8"))
+
+
+def verify_manifest(version_dir: Path) -> str:
+    """
+    Verifica completa dei file della versione (sha256, costo proporzionale alla loro
+    dimensione): è un controllo esplicito, non va fatto a ogni caricamento.
+    Restituisce la generazione; solleva ManifestMismatchError se un file manca o è diverso.
+    """
+    manifest = read_manifest(version_dir)
+    for name, expected in manifest["files"].items():
+        path = version_dir / name
+        if not path.exists() or file_digest(path) != expected:
+            raise ManifestMismatchError(f"{name} non corrisponde a {version_dir / MANIFEST_FILE}")
+    return manifest["generation"]
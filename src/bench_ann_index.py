@@ -0,0 +1,104 @@
+# src/bench_ann_index.py
+#
+# Benchmark dei tipi di indice FAISS (flat / hnsw / ivfpq) a diverse dimensioni
+# del corpus. Per ogni dimensione usa vettori sintetici normalizzati con bassa
+# dimensione intrinseca (come gli embeddings di testo), prende il flat come verità e riporta:
+#   - recall@k rispetto all'indice flat
+#   - QPS (query al secondo, ricerca in batch)
+#   - tempo di costruzione
+#
+# Esempio:
+#   python bench_ann_index.py --sizes 10000 100000 1000000 --k 5
+
+import argparse
+import time
+from typing import Dict, List
+
+import numpy as np
+import faiss
+
+from config import HNSW_EF_SEARCH, IVF_NPROBE
+from build_vector_store import make_index
+from retriever import configure_search
+
+
+def synthetic_vectors(n: int, dim: int, latent_dim: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Vettori normalizzati con struttura a bassa dimensione intrinseca (come gli
+    embeddings di testo): proiezione casuale di un latente gaussiano + rumore.
+    """
+    projection = rng.standard_normal((latent_dim, dim)).astype("float32")
+    latent = rng.standard_normal((n, latent_dim)).astype("float32")
+    vectors = latent @ projection + 0.1 * rng.standard_normal((n, dim)).astype("float32")
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """
+    Frazione dei veri top-k (flat) presenti nei top-k dell'indice approssimato.
+    """
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def bench_size(n: int, args, rng: np.random.Generator) -> List[Dict]:
+    data = synthetic_vectors(n + args.queries, args.dim, args.latent_dim, rng)
+    vectors, queries = data[:n], data[n:]
+
+    rows = []
+    truth = None
+    for index_type in ["flat"] + args.types:
+        start = time.perf_counter()
+        index = faiss.IndexIDMap2(make_index(args.dim, vectors, index_type))
+        index.add_with_ids(vectors, np.arange(n, dtype="int64"))
+        configure_search(index, ef_search=args.ef_search, nprobe=args.nprobe)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, found = index.search(queries, args.k)
+        search_s = time.perf_counter() - start
+
+        if index_type == "flat":
+            truth = found
+
+        rows.append(
+            {
+                "n": n,
+                "type": index_type,
+                "recall": recall_at_k(found, truth),
+                "qps": len(queries) / search_s,
+                "build_s": build_s,
+            }
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k e QPS dei tipi di indice FAISS.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--types", nargs="+", default=["hnsw", "ivfpq"], choices=["hnsw", "ivfpq"])
+    parser.add_argument("--dim", type=int, default=384, help="Dimensione vettori (all-MiniLM-L6-v2 = 384)")
+    parser.add_argument("--latent-dim", type=int, default=32, help="Dimensione intrinseca dei dati sintetici")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--ef-search", type=int, default=HNSW_EF_SEARCH)
+    parser.add_argument("--nprobe", type=int, default=IVF_NPROBE)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    rows: List[Dict] = []
+    for n in args.sizes:
+        print(f"Benchmark su {n} vettori...")
+        rows.extend(bench_size(n, args, rng))
+
+    print(f"\n=== INDICI FAISS: recall@{args.k} rispetto a flat, QPS ===")
+    print(f"{'vettori':>10} {'indice':>7} {'recall':>8} {'QPS':>12} {'build (s)':>10}")
+    for r in rows:
+        print(f"{r['n']:>10} {r['type']:>7} {r['recall']:>8.3f} {r['qps']:>12.0f} {r['build_s']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
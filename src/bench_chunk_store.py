@@ -0,0 +1,148 @@
+# src/bench_chunk_store.py
+#
+# Benchmark della metadata dei chunk: JSONL (parsing completo in una lista di dict,
+# come faceva il vecchio retriever) contro lo store binario in mmap (chunk_store.py).
+# Per ogni dimensione genera un corpus sintetico e, in un processo separato per
+# ciascun formato, misura:
+#   - avvio: tempo per rendere disponibili i chunk
+#   - lookup: tempo medio di una lettura per faiss_id (a caldo)
+#   - RSS anonima: memoria privata del processo (heap Python/numpy), oltre alla base dell'interprete
+#   - RSS file: pagine di file mappate (page cache condivisa e recuperabile dal kernel)
+#
+# Esempio:
+#   python bench_chunk_store.py --sizes 10000 1000000 --text-chars 2000
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+from chunk_store import ChunkStore, iter_jsonl, write_chunk_store
+
+_WORDS = (
+    "provider deployer system risk high-risk article annex authority market surveillance "
+    "conformity assessment biometric identification transparency obligation regulation "
+    "notified body union member state data governance documentation human oversight"
+).split()
+
+
+def make_corpus(n: int, text_chars: int, out_dir: Path, seed: int = 0):
+    """
+    Scrive un chunks_metadata.jsonl sintetico con n chunk di ~text_chars caratteri
+    e lo converte nello store binario.
+    """
+    rng = random.Random(seed)
+    base = " ".join(rng.choice(_WORDS) for _ in range(text_chars // 4))[:text_chars]
+    jsonl = out_dir / "chunks_metadata.jsonl"
+    with jsonl.open("w", encoding="utf-8") as f:
+        for i in range(n):
+            offset = rng.randrange(0, 64)
+            text = f"Chunk {i}. " + base[offset:] + base[:offset]
+            f.write(json.dumps({"id": f"ai_act_{i}", "text": text, "faiss_id": i}) + "\n")
+
+    start = time.perf_counter()
+    write_chunk_store(iter_jsonl(jsonl), out_dir / "chunk_store")
+    return time.perf_counter() - start
+
+
+def rss_mb() -> Dict[str, float]:
+    """
+    RSS anonima e RSS di file del processo corrente, in MB (da /proc, solo Linux).
+    """
+    rss = {}
+    with open("/proc/self/status", "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                name, value, _unit = line.split()
+                rss[name[:-1]] = int(value) / 1024
+    return rss
+
+
+def child(fmt: str, data_dir: Path, lookups: int) -> Dict:
+    """
+    Eseguito in un processo separato: carica un formato e misura avvio, lookup e RSS.
+    """
+    base_rss = rss_mb()
+
+    start = time.perf_counter()
+    if fmt == "jsonl":
+        chunks = list(iter_jsonl(data_dir / "chunks_metadata.jsonl"))
+        by_faiss_id = {ch["faiss_id"]: ch for ch in chunks}
+        get = by_faiss_id.__getitem__
+        n = len(chunks)
+    else:
+        store = ChunkStore(data_dir / "chunk_store")
+        get = store.get_by_faiss_id
+        n = len(store)
+    load_s = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    ids = rng.integers(0, n, size=lookups).tolist()
+    start = time.perf_counter()
+    for faiss_id in ids:
+        get(faiss_id)["text"]
+    lookup_us = (time.perf_counter() - start) / lookups * 1e6
+
+    rss = rss_mb()
+    return {
+        "load_s": load_s,
+        "lookup_us": lookup_us,
+        "anon_mb": rss["RssAnon"] - base_rss["RssAnon"],
+        "file_mb": rss["RssFile"] - base_rss["RssFile"],
+    }
+
+
+def run_child(fmt: str, data_dir: Path, lookups: int) -> Dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", fmt, "--data-dir", str(data_dir), "--lookups", str(lookups)],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Avvio, lookup e RSS: metadata JSONL vs store binario.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--text-chars", type=int, default=2000, help="Caratteri per chunk (~512 token)")
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--child", choices=["jsonl", "store"], help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.data_dir, args.lookups)))
+        return
+
+    rows = []
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            data_dir = Path(tmp)
+            print(f"Genero {n} chunk sintetici...")
+            convert_s = make_corpus(n, args.text_chars, data_dir)
+            print(f"  conversione JSONL → store binario: {convert_s:.2f} s")
+            for fmt in ("jsonl", "store"):
+                rows.append(dict(run_child(fmt, data_dir, args.lookups), n=n, fmt=fmt))
+
+    print("\n=== METADATA DEI CHUNK: JSONL vs STORE BINARIO ===")
+    print(
+        f"{'chunk':>10} {'formato':>8} {'avvio (s)':>10} {'lookup (µs)':>12} "
+        f"{'RSS anon (MB)':>14} {'RSS file (MB)':>14}"
+    )
+    for r in rows:
+        print(
+            f"{r['n']:>10} {r['fmt']:>8} {r['load_s']:>10.3f} {r['lookup_us']:>12.2f} "
+            f"{r['anon_mb']:>14.1f} {r['file_mb']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# src/bench_judge.py
+#
+# Benchmark della valutazione RAGAS: tempo reale di run_ragas.py con il giudice
+# di rete (GPT via RAGAS) e con il giudice locale (embeddings di EMBEDDING_MODEL_NAME).
+# Ogni giudice viene eseguito in un processo separato (import compresi) con cache
+# vuote in una cartella temporanea, poi rieseguito con le cache piene:
+#   - a freddo: tutte le chiamate al giudice
+#   - a caldo : nessuna chiamata, solo lettura dei punteggi salvati
+# Il giudice "openai" viene saltato se manca OPENAI_API_KEY.
+#
+# Esempio:
+#   python bench_judge.py
+#   python bench_judge.py --judges local --models openai claude
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from ragas_judges import JUDGES
+
+
+def run_judge(judge: str, cache_dir: Path, models: Optional[List[str]]) -> float:
+    """
+    Esegue run_ragas.py in un processo separato e restituisce il tempo reale (s).
+    Le medie vanno nella cartella temporanea, non in data/eval.
+    """
+    cmd = [sys.executable, str(Path(__file__).with_name("run_ragas.py")), "--judge", judge]
+    cmd += ["--cache-dir", str(cache_dir), "--out-dir", str(cache_dir)]
+    if models:
+        cmd += ["--models", *models]
+    start = time.perf_counter()
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo reale di run_ragas.py: giudice di rete vs locale.")
+    parser.add_argument("--judges", nargs="+", choices=JUDGES, default=JUDGES)
+    parser.add_argument("--models", nargs="+", default=None, help="Modelli da valutare (default: tutti)")
+    args = parser.parse_args()
+
+    rows = []
+    for judge in args.judges:
+        if judge == "openai" and not os.getenv("OPENAI_API_KEY"):
+            print("OPENAI_API_KEY non impostata: salto il giudice openai.")
+            continue
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"Giudice {judge}: esecuzione a freddo...")
+            cold = run_judge(judge, Path(tmp), args.models)
+            print(f"Giudice {judge}: esecuzione a caldo...")
+            warm = run_judge(judge, Path(tmp), args.models)
+        rows.append((judge, cold, warm))
+
+    print("\n=== VALUTAZIONE RAGAS: TEMPO REALE ===")
+    print(f"{'giudice':>8} {'freddo (s)':>11} {'caldo (s)':>10}")
+    for judge, cold, warm in rows:
+        print(f"{judge:>8} {cold:>11.2f} {warm:>10.2f}")
+    cold_times = {judge: cold for judge, cold, _ in rows}
+    if "openai" in cold_times and "local" in cold_times:
+        print(f"\nGiudice locale {cold_times['openai'] / cold_times['local']:.1f}x più veloce a freddo.")
+
+
+if __name__ == "__main__":
+    main()
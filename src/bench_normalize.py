@@ -0,0 +1,82 @@
+# src/bench_normalize.py
+#
+# Regressione + benchmark di prepare_corpus.normalize_whitespace.
+# Verifica che la versione lineare e quella a streaming producano un output
+# identico byte per byte alla vecchia implementazione (while + replace) su
+# ai_act_en.txt, poi confronta i tempi. Esce con errore se l'output differisce.
+#
+# Esempio:
+#   python bench_normalize.py --repeat 5
+
+import argparse
+import sys
+import time
+
+from config import AI_ACT_RAW_FILE
+from prepare_corpus import iter_text_blocks, normalize_whitespace, normalize_whitespace_stream
+
+
+def normalize_whitespace_legacy(text: str) -> str:
+    """
+    Implementazione originale (quadratica nel caso peggiore), usata come riferimento.
+    """
+    text = text.replace("\r\n", "\n")
+    text = text.replace("\t", " ")
+    while "  " in text:
+        text = text.replace("  ", " ")
+    return text
+
+
+def best_time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regressione e benchmark di normalize_whitespace.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Testo come lo legge prepare_corpus (newline universali) e testo grezzo con \r\n
+    with AI_ACT_RAW_FILE.open("r", encoding="utf-8") as f:
+        text = f.read()
+    with AI_ACT_RAW_FILE.open("r", encoding="utf-8", newline="") as f:
+        raw_text = f.read()
+    # Caso avverso: padding lungo come nelle tabelle dei testi consolidati
+    padded_text = text.replace(" ", " " * 40)
+
+    failures = 0
+    for name, sample in [("ai_act_en.txt", text), ("ai_act_en.txt (\\r\\n)", raw_text), ("padding x40", padded_text)]:
+        expected = normalize_whitespace_legacy(sample).encode("utf-8")
+        candidates = {"lineare": normalize_whitespace(sample)}
+        for block_chars in (1, 7, 4096, 1 << 20):
+            blocks = (sample[i:i + block_chars] for i in range(0, len(sample), block_chars))
+            candidates[f"stream/{block_chars}"] = "".join(normalize_whitespace_stream(blocks))
+        for label, output in candidates.items():
+            ok = output.encode("utf-8") == expected
+            failures += not ok
+            print(f"[{'OK' if ok else 'DIVERSO'}] {name:<24} {label}")
+
+    streamed_file = "".join(normalize_whitespace_stream(iter_text_blocks(AI_ACT_RAW_FILE, 4096)))
+    ok = streamed_file == normalize_whitespace_legacy(text)
+    failures += not ok
+    print(f"[{'OK' if ok else 'DIVERSO'}] {'ai_act_en.txt':<24} stream da file")
+
+    print("\n=== TEMPI (migliore su", args.repeat, "ripetizioni) ===")
+    for name, sample in [("ai_act_en.txt", text), ("padding x40", padded_text)]:
+        legacy = best_time(lambda: normalize_whitespace_legacy(sample), args.repeat)
+        linear = best_time(lambda: normalize_whitespace(sample), args.repeat)
+        print(f"{name:<16} legacy {legacy * 1000:8.2f} ms | lineare {linear * 1000:8.2f} ms | {legacy / linear:5.1f}x")
+
+    if failures:
+        print(f"\n❌ {failures} output diversi dalla versione originale.")
+        sys.exit(1)
+    print("\n✅ Output identico alla versione originale.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# src/bench_retriever.py
+#
+# Micro-benchmark del retriever: confronta la latenza per query "a freddo"
+# (ricaricando metadata, indice e modello a ogni chiamata, come faceva la vecchia
+# retrieve_chunks) con quella "a caldo" del Retriever condiviso.
+
+import argparse
+import json
+import statistics
+import time
+from typing import List
+
+from config import PROJECT_ROOT
+from retriever import Retriever, get_retriever, reset_retriever
+
+EVAL_FILE = PROJECT_ROOT / "data" / "eval" / "ai_act_eval.jsonl"
+
+
+def load_questions(limit: int) -> List[str]:
+    """
+    Usa le domande del dataset di valutazione come query di test.
+    """
+    questions = []
+    with EVAL_FILE.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            questions.append(json.loads(line)["question"])
+    return questions[:limit]
+
+
+def format_ms(values: List[float]) -> str:
+    values_ms = [v * 1000 for v in values]
+    return (
+        f"media {statistics.mean(values_ms):9.2f} ms | "
+        f"mediana {statistics.median(values_ms):9.2f} ms | "
+        f"max {max(values_ms):9.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark latenza retriever (cold vs warm).")
+    parser.add_argument("--queries", type=int, default=25, help="Numero di query per la fase warm")
+    parser.add_argument("--cold-queries", type=int, default=3, help="Numero di query per la fase cold")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    questions = load_questions(args.queries)
+
+    # Cold: ogni query ricarica tutto da disco (comportamento precedente)
+    cold = []
+    for question in questions[: args.cold_queries]:
+        start = time.perf_counter()
+        Retriever().search(question, top_k=args.top_k)
+        cold.append(time.perf_counter() - start)
+
+    # Prima query sul Retriever condiviso (include il caricamento una tantum)
+    reset_retriever()
+    start = time.perf_counter()
+    retriever = get_retriever()
+    retriever.search(questions[0], top_k=args.top_k)
+    first = time.perf_counter() - start
+
+    # Warm: risorse già in RAM
+    warm = []
+    for question in questions:
+        start = time.perf_counter()
+        retriever.search(question, top_k=args.top_k)
+        warm.append(time.perf_counter() - start)
+
+    # Batch: tutte le query con un solo encode + una sola ricerca FAISS
+    start = time.perf_counter()
+    retriever.search_batch(questions, top_k=args.top_k)
+    batch = time.perf_counter() - start
+
+    print("\n=== LATENZA RETRIEVER PER QUERY ===")
+    print(f"cold  ({len(cold):3d} query): {format_ms(cold)}")
+    print(f"prima query condivisa:  {first * 1000:9.2f} ms")
+    print(f"warm  ({len(warm):3d} query): {format_ms(warm)}")
+    print(f"batch ({len(questions):3d} query): {batch * 1000 / len(questions):9.2f} ms per query")
+    print(f"speedup medio cold/warm: {statistics.mean(cold) / statistics.mean(warm):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
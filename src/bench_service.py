@@ -0,0 +1,181 @@
+# src/bench_service.py
+#
+# Load test del servizio HTTP (service.py): N client concorrenti inviano le domande
+# del dataset di valutazione e si misurano throughput, latenza p50/p99 e la
+# dimensione media dei batch di query ottenuta dal micro-batching (da /metrics).
+# Con --stream (/answer in streaming) si misura anche il time-to-first-token.
+# Senza --url il servizio viene avviato in questo processo con l'LLM finto
+# (llm_fake.py), così il benchmark gira offline e misura solo retrieval + servizio.
+#
+# Esempio:
+#   python bench_service.py --endpoint answer --requests 500 --concurrency 32
+#   python bench_service.py --url http://127.0.0.1:8000 --endpoint retrieve
+#   python bench_service.py --endpoint answer --stream
+
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse
+
+from config import EVAL_FILE, FAKE_LLM_LATENCY
+
+
+def load_questions() -> List[str]:
+    questions = []
+    with EVAL_FILE.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                questions.append(json.loads(line)["question"])
+    return questions
+
+
+def start_local_service(port: int, fake_latency: float):
+    """
+    Avvia uvicorn in un thread con il servizio e l'LLM finto; ritorna quando è pronto.
+    """
+    import uvicorn
+    from service import create_app
+
+    server = uvicorn.Server(
+        uvicorn.Config(create_app("fake", fake_latency), host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("Avvio del servizio fallito")
+        time.sleep(0.1)
+    return server, thread
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def batching_totals(url: str) -> Tuple[int, int]:
+    """
+    (batch, query) serviti finora dal micro-batcher del servizio; (0, 0) se disattivo.
+    """
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+    conn.request("GET", "/metrics")
+    stats = json.loads(conn.getresponse().read())["query_batching"]
+    conn.close()
+    if not stats:
+        return 0, 0
+    return stats["batches"], stats["queries"]
+
+
+def run_load(
+    url: str,
+    endpoint: str,
+    questions: List[str],
+    n_requests: int,
+    concurrency: int,
+    top_k: int,
+    stream: bool = False,
+) -> Dict:
+    parsed = urlparse(url)
+    local = threading.local()
+
+    def request(i: int) -> Tuple[float, float]:
+        """
+        Una richiesta: (latenza totale, tempo alla prima riga della risposta).
+        """
+        # Una connessione keep-alive per thread client
+        if not hasattr(local, "conn"):
+            local.conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=120)
+        payload = {"question": questions[i % len(questions)], "top_k": top_k}
+        if stream:
+            payload["stream"] = True
+        start = time.perf_counter()
+        local.conn.request("POST", f"/{endpoint}", body=json.dumps(payload), headers={"Content-Type": "application/json"})
+        response = local.conn.getresponse()
+        if response.status != 200:
+            raise RuntimeError(f"HTTP {response.status} su /{endpoint}")
+        response.readline()
+        first = time.perf_counter() - start
+        response.read()
+        return time.perf_counter() - start, first
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        measures = list(pool.map(request, range(n_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [total for total, _ in measures]
+    firsts = [first for _, first in measures]
+    return {
+        "throughput": n_requests / elapsed,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "mean": statistics.mean(latencies),
+        "ttft_p50": percentile(firsts, 50),
+        "ttft_p99": percentile(firsts, 99),
+        "elapsed": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test del servizio RAG (throughput, p50/p99).")
+    parser.add_argument("--url", default=None, help="Servizio già avviato (default: avvio locale con LLM finto)")
+    parser.add_argument("--port", type=int, default=8765, help="Porta del servizio avviato localmente")
+    parser.add_argument("--endpoint", choices=["retrieve", "answer"], default="answer")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--fake-latency", type=float, default=FAKE_LLM_LATENCY)
+    parser.add_argument("--stream", action="store_true", help="/answer in streaming: misura anche il TTFT")
+    args = parser.parse_args()
+    stream = args.stream and args.endpoint == "answer"
+
+    questions = load_questions()
+    server = None
+    url = args.url
+    if url is None:
+        print(f"Avvio servizio locale con LLM finto (latenza {args.fake_latency:.3f} s)...")
+        server, thread = start_local_service(args.port, args.fake_latency)
+        url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        # Riscaldamento (cache, primo encode) fuori dalle misure
+        run_load(url, args.endpoint, questions, min(len(questions), 20), 4, args.top_k, stream)
+
+        rows = []
+        for concurrency in args.concurrency:
+            print(f"/{args.endpoint}: {args.requests} richieste, {concurrency} client...")
+            batches_before, queries_before = batching_totals(url)
+            row = run_load(url, args.endpoint, questions, args.requests, concurrency, args.top_k, stream)
+            batches_after, queries_after = batching_totals(url)
+            batches = batches_after - batches_before
+            row["batch"] = (queries_after - queries_before) / batches if batches else 0.0
+            rows.append(dict(row, c=concurrency))
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join()
+
+    print(f"\n=== SERVIZIO /{args.endpoint}{' (streaming)' if stream else ''} ===")
+    header = f"{'client':>7} {'req/s':>9} {'p50 (ms)':>10} {'p99 (ms)':>10} {'media (ms)':>11} {'batch medio':>12}"
+    if stream:
+        header += f" {'TTFT p50 (ms)':>14} {'TTFT p99 (ms)':>14}"
+    print(header)
+    for r in rows:
+        line = (
+            f"{r['c']:>7} {r['throughput']:>9.1f} {r['p50'] * 1000:>10.1f} "
+            f"{r['p99'] * 1000:>10.1f} {r['mean'] * 1000:>11.1f} {r['batch']:>12.1f}"
+        )
+        if stream:
+            line += f" {r['ttft_p50'] * 1000:>14.1f} {r['ttft_p99'] * 1000:>14.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
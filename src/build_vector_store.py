@@ -1,7 +1,13 @@
 # src/build_vector_store.py
+#
+# Uso:
+#   python build_vector_store.py                # ricostruzione completa
+#   python build_vector_store.py --incremental  # aggiorna solo i chunk cambiati
 
+import argparse
 import json
-from typing import List, Dict
+import math
+from typing import List, Dict, Optional
 
 import numpy as np
 import faiss
@@ -10,10 +16,25 @@ from sentence_transformers import SentenceTransformer
 from config import (
     CHUNKS_JSONL,
     VECTOR_STORE_DIR,
-    FAISS_INDEX_FILE,
-    CHUNKS_METADATA_FILE,
+    FAISS_INDEX_NAME,
+    CHUNKS_METADATA_NAME,
+    CHUNK_STORE_NAME,
+    SPARSE_INDEX_NAME,
     EMBEDDING_MODEL_NAME,
+    EMBEDDING_BATCH_SIZE,
+    FAISS_INDEX_TYPE,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    IVF_NLIST,
+    PQ_M,
+    PQ_NBITS,
+    IVF_TRAIN_SAMPLE,
 )
+from artifacts import new_generation_id, write_manifest, writing_version
+from chunk_store import iter_jsonl, write_chunk_store
+from embedding_cache import EmbeddingCache, text_hash
+from sparse_index import build_sparse_index
+from vector_store import Generation, current_generation
 
 
 def load_chunks() -> List[Dict]:
@@ -50,72 +71,237 @@ def build_embeddings_model() -> SentenceTransformer:
     return model
 
 
-def create_faiss_index(embeddings: np.ndarray) -> faiss.IndexFlatIP:
+def encode_chunks(texts: List[str]) -> np.ndarray:
+    """
+    Embeddings dei chunk: si codificano solo i testi non ancora in cache.
+    Il modello viene caricato solo se c'è davvero qualcosa da codificare.
+    """
+    cache = EmbeddingCache(EMBEDDING_MODEL_NAME)
+
+    def encode_missing(missing_texts: List[str]) -> np.ndarray:
+        model = build_embeddings_model()
+        print(f"Calcolo embeddings per {len(missing_texts)} chunk nuovi o modificati...")
+        return model.encode(
+            missing_texts,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            show_progress_bar=True,
+            convert_to_numpy=True,
+        )
+
+    embeddings = cache.encode(texts, encode_missing)
+    print(f"Cache embeddings: {cache.stats()}")
+    return embeddings
+
+
+def make_index(dim: int, train_vectors: np.ndarray, index_type: str = FAISS_INDEX_TYPE) -> faiss.Index:
+    """
+    Factory degli indici FAISS (tutti a inner product su vettori normalizzati).
+    train_vectors serve solo per IVF-PQ, che va addestrato prima dell'inserimento;
+    per corpora piccoli nlist / nbits / m vengono ridotti per restare addestrabili.
+    """
+    if index_type == "flat":
+        return faiss.IndexFlatIP(dim)
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return index
+
+    if index_type == "ivfpq":
+        n = len(train_vectors)
+        # FAISS consiglia almeno ~39 punti di training per centroide
+        nlist = max(1, min(IVF_NLIST, n // 39))
+        nbits = max(1, min(PQ_NBITS, int(math.log2(max(n, 2)))))
+        m = max(d for d in range(1, min(PQ_M, dim) + 1) if dim % d == 0)
+
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, m, nbits, faiss.METRIC_INNER_PRODUCT)
+
+        if n > IVF_TRAIN_SAMPLE:
+            rng = np.random.default_rng(0)
+            train_vectors = train_vectors[rng.choice(n, IVF_TRAIN_SAMPLE, replace=False)]
+        print(f"Training IVF-PQ (nlist={nlist}, m={m}, nbits={nbits}) su {len(train_vectors)} vettori...")
+        index.train(train_vectors)
+        return index
+
+    raise ValueError(f"Tipo di indice FAISS non supportato: {index_type}")
+
+
+def create_faiss_index(
+    embeddings: np.ndarray,
+    ids: Optional[np.ndarray] = None,
+    index_type: str = FAISS_INDEX_TYPE,
+) -> faiss.Index:
     """
     Crea un indice FAISS usando inner product (cosine-like similarity).
     Prima normalizziamo i vettori per approssimare la cos similarity.
+    L'indice è avvolto in un IndexIDMap2: ogni vettore ha un id stabile (faiss_id)
+    salvato anche nella metadata, così l'aggiornamento incrementale può
+    rimuovere/aggiungere singoli vettori.
     """
     # Normalizziamo gli embeddings a norma 1 (per cos similarity)
     faiss.normalize_L2(embeddings)
 
     dim = embeddings.shape[1]
-    print(f"Creo indice FAISS con dimensione vettori = {dim}")
-    index = faiss.IndexFlatIP(dim)  # Inner Product
+    print(f"Creo indice FAISS '{index_type}' con dimensione vettori = {dim}")
+    index = faiss.IndexIDMap2(make_index(dim, embeddings, index_type))  # Inner Product
 
-    index.add(embeddings)
+    if ids is None:
+        ids = np.arange(len(embeddings), dtype="int64")
+    index.add_with_ids(embeddings, ids)
     print(f"Indice FAISS: contiene {index.ntotal} vettori")
     return index
 
 
-def save_faiss_index(index: faiss.IndexFlatIP):
+def save_vector_store(index: faiss.Index, chunks: List[Dict]):
     """
-    Salva l'indice FAISS su disco.
+    Salva indice FAISS, metadata dei chunk e indice BM25 come una nuova generazione
+    del vector store (vector_store.py). La metadata è un JSONL: id, text, faiss_id (id del
+    vettore nell'indice) e hash del testo (per gli aggiornamenti incrementali);
+    serve a mappare gli ID dell'indice al testo e viene scritta anche nello store
+    binario letto dal retriever.
+    Tutti i file e il manifest vengono scritti in una cartella non ancora visibile,
+    poi pubblicata con una sola sostituzione di CURRENT: un crash a metà lascia
+    attiva la generazione precedente, intatta.
     """
-    faiss.write_index(index, str(FAISS_INDEX_FILE))
-    print(f"Indice FAISS salvato in: {FAISS_INDEX_FILE}")
+    records = [dict(ch, hash=ch.get("hash") or text_hash(ch["text"])) for ch in chunks]
+    generation = new_generation_id()
 
+    with writing_version(VECTOR_STORE_DIR) as tmp_dir:
+        faiss.write_index(index, str(tmp_dir / FAISS_INDEX_NAME))
+        with (tmp_dir / CHUNKS_METADATA_NAME).open("w", encoding="utf-8") as f:
+            for out in records:
+                f.write(json.dumps(out, ensure_ascii=False) + "\n")
+        write_chunk_store(records, tmp_dir / CHUNK_STORE_NAME, generation)
+        # L'indice BM25 dipende da statistiche globali (df, lunghezza media): si ricostruisce, costa poco
+        build_sparse_index(records, tmp_dir / SPARSE_INDEX_NAME, generation)
+        sparse_files = sorted(p.relative_to(tmp_dir).as_posix() for p in (tmp_dir / SPARSE_INDEX_NAME).iterdir())
+        write_manifest(
+            tmp_dir,
+            generation,
+            [FAISS_INDEX_NAME, CHUNKS_METADATA_NAME] + sparse_files,
+            n_chunks=len(records),
+        )
 
-def save_metadata(chunks: List[Dict]):
+    print(f"Indice FAISS, metadata dei chunk e indice BM25 salvati in: {VECTOR_STORE_DIR} (generazione {generation})")
+
+
+def load_existing_metadata(generation: Generation) -> List[Dict]:
     """
-    Salva l'elenco dei chunk (id + text) in un JSONL separato.
-    Questo ci serve per mappare gli ID dell'indice al testo.
+    Legge la metadata della generazione attuale. I record senza faiss_id
+    (indici costruiti prima degli id stabili) usano la loro posizione.
     """
-    VECTOR_STORE_DIR.mkdir(parents=True, exist_ok=True)
+    chunks = []
+    for data in iter_jsonl(generation.metadata_file):
+        data.setdefault("faiss_id", len(chunks))
+        data.setdefault("hash", text_hash(data["text"]))
+        chunks.append(data)
+    return chunks
 
-    with CHUNKS_METADATA_FILE.open("w", encoding="utf-8") as f:
-        for ch in chunks:
-            out = {"id": ch["id"], "text": ch["text"]}
-            f.write(json.dumps(out, ensure_ascii=False) + "\n")
 
-    print(f"Metadata dei chunk salvata in: {CHUNKS_METADATA_FILE}")
+def build_full(chunks: List[Dict]):
+    """
+    Ricostruzione completa: tutti i chunk, faiss_id = posizione.
+    """
+    texts = [c["text"] for c in chunks]
+    embeddings = encode_chunks(texts)
 
+    index = create_faiss_index(embeddings)
 
-def main():
-    # 1. Carichiamo i chunk
-    chunks = load_chunks()
-    texts = [c["text"] for c in chunks]
+    new_chunks = [dict(c, faiss_id=i) for i, c in enumerate(chunks)]
+    save_vector_store(index, new_chunks)
 
-    if not texts:
-        raise ValueError("Nessun testo da indicizzare. Verifica ai_act_chunks.jsonl")
 
-    # 2. Carichiamo il modello di embeddings
-    model = build_embeddings_model()
+def build_incremental(chunks: List[Dict]):
+    """
+    Aggiornamento incrementale: confronta i nuovi chunk con la metadata esistente
+    tramite hash del contenuto, rimuove dall'indice i vettori dei chunk spariti,
+    aggiunge solo quelli nuovi/modificati e poi pubblica una nuova generazione.
+    """
+    try:
+        generation = current_generation()
+    except FileNotFoundError:
+        print("Nessun vector store esistente: eseguo la ricostruzione completa.")
+        build_full(chunks)
+        return
+
+    index = faiss.read_index(str(generation.index_file))
+    if index.ntotal != generation.n_chunks:
+        print("Indice e manifest della generazione attuale non corrispondono: eseguo la ricostruzione completa.")
+        build_full(chunks)
+        return
+    if not isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        print("L'indice su disco non ha id stabili (IndexIDMap): eseguo la ricostruzione completa.")
+        build_full(chunks)
+        return
 
-    # 3. Calcoliamo gli embeddings
-    print("Calcolo embeddings per tutti i chunk...")
-    embeddings = model.encode(
-        texts,
-        batch_size=16,
-        show_progress_bar=True,
-        convert_to_numpy=True,
+    base_index = faiss.downcast_index(index.index)
+    if isinstance(base_index, faiss.IndexHNSW):
+        # HNSW non supporta remove_ids: ricostruiamo (gli embeddings sono comunque in cache)
+        print("L'indice HNSW non supporta la rimozione di vettori: eseguo la ricostruzione completa.")
+        build_full(chunks)
+        return
+
+    old_chunks = load_existing_metadata(generation)
+
+    # hash -> faiss_id disponibili (lista: lo stesso testo può comparire più volte)
+    available: Dict[str, List[int]] = {}
+    for ch in old_chunks:
+        available.setdefault(ch["hash"], []).append(ch["faiss_id"])
+
+    next_id = max((ch["faiss_id"] for ch in old_chunks), default=-1) + 1
+    new_chunks: List[Dict] = []
+    to_add: List[Dict] = []
+
+    for ch in chunks:
+        h = text_hash(ch["text"])
+        ids = available.get(h)
+        if ids:
+            new_chunks.append(dict(ch, hash=h, faiss_id=ids.pop(0)))
+        else:
+            new_ch = dict(ch, hash=h, faiss_id=next_id)
+            next_id += 1
+            new_chunks.append(new_ch)
+            to_add.append(new_ch)
+
+    removed = [fid for ids in available.values() for fid in ids]
+    print(
+        f"Aggiornamento incrementale: {len(new_chunks) - len(to_add)} chunk invariati, "
+        f"{len(to_add)} da aggiungere, {len(removed)} da rimuovere."
     )
 
-    # 4. Creiamo indice FAISS
-    index = create_faiss_index(embeddings)
+    if removed:
+        index.remove_ids(np.array(removed, dtype="int64"))
+
+    if to_add:
+        embeddings = encode_chunks([c["text"] for c in to_add])
+        faiss.normalize_L2(embeddings)
+        index.add_with_ids(embeddings, np.array([c["faiss_id"] for c in to_add], dtype="int64"))
+
+    print(f"Indice FAISS: contiene {index.ntotal} vettori")
+    save_vector_store(index, new_chunks)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Costruisce (o aggiorna) il vector store FAISS.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Aggiorna solo i vettori dei chunk nuovi/modificati invece di ricostruire tutto",
+    )
+    args = parser.parse_args(argv)
+
+    # 1. Carichiamo i chunk
+    chunks = load_chunks()
+
+    if not chunks:
+        raise ValueError("Nessun testo da indicizzare. Verifica ai_act_chunks.jsonl")
 
-    # 5. Salviamo indice + metadata
-    save_faiss_index(index)
-    save_metadata(chunks)
+    # 2. Embeddings + indice FAISS + metadata + indice BM25
+    if args.incremental:
+        build_incremental(chunks)
+    else:
+        build_full(chunks)
 
     print("✅ Vector store costruito con successo.")
 
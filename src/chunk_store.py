@@ -0,0 +1,236 @@
+# src/chunk_store.py
+#
+# Store binario della metadata dei chunk, alternativo a chunks_metadata.jsonl.
+# Cartella chunk_store/ della generazione del vector store (vector_store.py),
+# una versione per sottocartella (artifacts.py):
+#   - texts.bin        : testi dei chunk concatenati (UTF-8)
+#   - text_offsets.npy : int64 [n+1], il testo della riga r è texts.bin[off[r]:off[r+1]]
+#   - meta.bin         : per ogni riga, JSON compatto degli altri campi (id, faiss_id, hash, article, ...)
+#   - meta_offsets.npy : int64 [n+1], come text_offsets per meta.bin
+#   - faiss_ids.npy    : int64 [n], faiss_id di ogni riga
+#   - faiss_order.npy  : int64 [n], righe ordinate per faiss_id (ricerca binaria faiss_id → riga)
+#   - ids.npy          : bytes [n], id dei chunk ordinati (ricerca binaria id → riga)
+#   - id_order.npy     : int64 [n], riga corrispondente a ogni id ordinato
+#   - generation.json  : id della generazione del vector store da cui è stato scritto
+# Lo store è un derivato di chunks_metadata.jsonl (che è versionato in git, lo store no):
+# build_vector_store.py lo scrive nella generazione prima di pubblicarla; se manca
+# (es. generazione arrivata con un git pull) viene convertito dal JSONL.
+# Tutto viene aperto in mmap: l'avvio non dipende dalla dimensione del corpus e
+# un chunk viene letto (e decodificato) solo quando serve.
+#
+# Conversione dal JSONL esistente:
+#   python chunk_store.py
+
+import json
+import mmap
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from artifacts import ManifestMismatchError, current_version, writing_version
+from vector_store import Generation, current_generation
+
+
+def iter_jsonl(path: Path) -> Iterator[Dict]:
+    """
+    Legge un JSONL di chunk una riga alla volta.
+    """
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            yield json.loads(line)
+
+
+def write_chunk_store(
+    chunks: Iterable[Dict],
+    store_dir: Path,
+    generation: Optional[str] = None,
+) -> int:
+    """
+    Scrive lo store a partire da un iterabile di chunk (in streaming: in memoria
+    restano solo offsets e id). I record senza faiss_id usano la loro posizione.
+    La nuova versione viene scritta in una sottocartella e pubblicata con un solo
+    rename atomico (artifacts.py): chi legge non vede mai uno store a metà, né
+    nessuno store. `generation` è l'id della generazione del vector store,
+    annotato in generation.json. Restituisce il numero di chunk scritti.
+    """
+    with writing_version(store_dir) as tmp_dir:
+        n = _write_files(chunks, tmp_dir)
+        if generation is not None:
+            (tmp_dir / "generation.json").write_text(json.dumps({"generation": generation}), encoding="utf-8")
+    return n
+
+
+def _write_files(chunks: Iterable[Dict], tmp_dir: Path) -> int:
+    """
+    Scrive i file dello store in tmp_dir; restituisce il numero di chunk.
+    """
+    text_offsets = array("q", [0])
+    meta_offsets = array("q", [0])
+    faiss_ids = array("q")
+    ids: List[bytes] = []
+
+    with (tmp_dir / "texts.bin").open("wb") as f_text, (tmp_dir / "meta.bin").open("wb") as f_meta:
+        for pos, ch in enumerate(chunks):
+            meta = {k: v for k, v in ch.items() if k != "text"}
+            meta.setdefault("faiss_id", pos)
+
+            text_bytes = ch["text"].encode("utf-8")
+            meta_bytes = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            f_text.write(text_bytes)
+            f_meta.write(meta_bytes)
+
+            text_offsets.append(text_offsets[-1] + len(text_bytes))
+            meta_offsets.append(meta_offsets[-1] + len(meta_bytes))
+            faiss_ids.append(meta["faiss_id"])
+            ids.append(str(ch["id"]).encode("utf-8"))
+
+    faiss_ids_arr = np.frombuffer(faiss_ids, dtype="int64") if faiss_ids else np.zeros(0, dtype="int64")
+    ids_arr = np.array(ids, dtype=bytes) if ids else np.zeros(0, dtype="S1")
+    id_order = np.argsort(ids_arr, kind="stable")
+
+    np.save(tmp_dir / "text_offsets.npy", np.frombuffer(text_offsets, dtype="int64"))
+    np.save(tmp_dir / "meta_offsets.npy", np.frombuffer(meta_offsets, dtype="int64"))
+    np.save(tmp_dir / "faiss_ids.npy", faiss_ids_arr)
+    np.save(tmp_dir / "faiss_order.npy", np.argsort(faiss_ids_arr, kind="stable"))
+    np.save(tmp_dir / "ids.npy", ids_arr[id_order])
+    np.save(tmp_dir / "id_order.npy", id_order)
+    return len(ids)
+
+
+def convert_jsonl(jsonl_path: Path, store_dir: Path, generation: Optional[str] = None) -> int:
+    """
+    Converte chunks_metadata.jsonl (o un altro JSONL di chunk) nello store binario.
+    """
+    n = write_chunk_store(iter_jsonl(jsonl_path), store_dir, generation)
+    print(f"Convertiti {n} chunk da {jsonl_path} in {store_dir}")
+    return n
+
+
+def _open_blob(path: Path):
+    """
+    mmap in sola lettura di un file binario (b"" se il file è vuoto: mmap non lo accetta).
+    Gli accessi sono casuali (un chunk per risultato): disattiviamo il read-ahead
+    del kernel, che a cache fredda leggerebbe dal disco molto più del chunk richiesto.
+    """
+    if path.stat().st_size == 0:
+        return b""
+    with path.open("rb") as f:
+        blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, "MADV_RANDOM"):
+        blob.madvise(mmap.MADV_RANDOM)
+    return blob
+
+
+class ChunkStore:
+    """
+    Accesso in sola lettura allo store binario dei chunk.
+    I chunk si leggono per riga, per faiss_id o per id; ogni lettura restituisce
+    un dict come quelli del JSONL (metadata + "text").
+    """
+
+    def __init__(self, store_dir: Path):
+        version_dir = current_version(store_dir)
+        if version_dir is None or not (version_dir / "id_order.npy").exists():
+            raise FileNotFoundError(f"Store dei chunk non trovato: {store_dir}")
+
+        self.store_dir = store_dir
+        # I file della versione restano validi anche se nel frattempo ne viene pubblicata un'altra
+        store_dir = version_dir
+        generation_file = store_dir / "generation.json"
+        self.generation: Optional[str] = (
+            json.loads(generation_file.read_text(encoding="utf-8"))["generation"]
+            if generation_file.exists()
+            else None
+        )
+        self._texts = _open_blob(store_dir / "texts.bin")
+        self._meta = _open_blob(store_dir / "meta.bin")
+        self.text_offsets = np.load(store_dir / "text_offsets.npy", mmap_mode="r")
+        self.meta_offsets = np.load(store_dir / "meta_offsets.npy", mmap_mode="r")
+        self.faiss_ids = np.load(store_dir / "faiss_ids.npy", mmap_mode="r")
+        self.faiss_order = np.load(store_dir / "faiss_order.npy", mmap_mode="r")
+        self.ids = np.load(store_dir / "ids.npy", mmap_mode="r")
+        self.id_order = np.load(store_dir / "id_order.npy", mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.faiss_ids)
+
+    def text(self, row: int) -> str:
+        start, end = self.text_offsets[row], self.text_offsets[row + 1]
+        return self._texts[start:end].decode("utf-8")
+
+    def meta(self, row: int) -> Dict:
+        """
+        Campi della riga `row` escluso il testo (id, faiss_id, hash, article, ...).
+        """
+        start, end = self.meta_offsets[row], self.meta_offsets[row + 1]
+        return json.loads(self._meta[start:end].decode("utf-8"))
+
+    def get(self, row: int) -> Dict:
+        """
+        Chunk alla riga `row` (ordine della metadata).
+        """
+        chunk = self.meta(row)
+        chunk["text"] = self.text(row)
+        return chunk
+
+    def row_for_faiss_id(self, faiss_id: int) -> Optional[int]:
+        pos = int(np.searchsorted(self.faiss_ids, faiss_id, sorter=self.faiss_order))
+        if pos < len(self) and self.faiss_ids[self.faiss_order[pos]] == faiss_id:
+            return int(self.faiss_order[pos])
+        return None
+
+    def row_for_id(self, chunk_id: str) -> Optional[int]:
+        key = chunk_id.encode("utf-8")
+        pos = int(np.searchsorted(self.ids, key))
+        if pos < len(self) and self.ids[pos] == key:
+            return int(self.id_order[pos])
+        return None
+
+    def get_by_faiss_id(self, faiss_id: int) -> Optional[Dict]:
+        row = self.row_for_faiss_id(faiss_id)
+        return self.get(row) if row is not None else None
+
+    def get_by_id(self, chunk_id: str) -> Optional[Dict]:
+        row = self.row_for_id(chunk_id)
+        return self.get(row) if row is not None else None
+
+    def __iter__(self) -> Iterator[Dict]:
+        for row in range(len(self)):
+            yield self.get(row)
+
+
+def load_chunk_store(generation: Optional[Generation] = None) -> ChunkStore:
+    """
+    Apre lo store binario dei chunk della generazione (di default quella attiva).
+    Se manca, o è stato scritto per un'altra generazione, lo converte dal JSONL.
+    """
+    generation = generation or current_generation()
+    try:
+        store = ChunkStore(generation.chunk_store_dir)
+    except FileNotFoundError:
+        store = None
+    if store is None or store.generation != generation.id:
+        print(f"Store dei chunk assente o di un'altra generazione: lo converto da {generation.metadata_file.name}.")
+        convert_jsonl(generation.metadata_file, generation.chunk_store_dir, generation.id)
+        store = ChunkStore(generation.chunk_store_dir)
+    if len(store) != generation.n_chunks:
+        raise ManifestMismatchError(
+            f"{generation.metadata_file} ha {len(store)} chunk, il manifest ne registra {generation.n_chunks}"
+        )
+    print(f"Store dei chunk aperto: {len(store)} chunk.")
+    return store
+
+
+def main():
+    generation = current_generation()
+    convert_jsonl(generation.metadata_file, generation.chunk_store_dir, generation.id)
+    print("✅ Store binario dei chunk creato.")
+
+
+if __name__ == "__main__":
+    main()
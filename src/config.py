@@ -4,7 +4,12 @@
 
 
 # src/config.py
+#
+# I parametri marcati "override: RAG_..." si possono sostituire con variabili d'ambiente:
+# sweep.py li usa per costruire ogni variante (chunking, modello di embeddings) in una
+# cartella di artefatti separata, senza modificare questo file.
 
+import os
 from pathlib import Path
 
 # Radice del progetto
@@ -13,7 +18,8 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent
 # Cartelle dati
 DATA_DIR = PROJECT_ROOT / "data"
 RAW_DIR = DATA_DIR / "raw"
-PROCESSED_DIR = DATA_DIR / "processed"
+# Artefatti generati: chunk, lookup degli articoli, vector store (override: RAG_PROCESSED_DIR)
+PROCESSED_DIR = Path(os.environ.get("RAG_PROCESSED_DIR", DATA_DIR / "processed"))
 
 # File raw dell'AI Act
 AI_ACT_RAW_FILE = RAW_DIR / "ai_act_en.txt"
@@ -21,22 +27,200 @@ AI_ACT_RAW_FILE = RAW_DIR / "ai_act_en.txt"
 # File dei chunk (generato da prepare_corpus.py)
 CHUNKS_JSONL = PROCESSED_DIR / "ai_act_chunks.jsonl"
 
-# Parametri di chunking
-CHUNK_MAX_TOKENS = 512
-CHUNK_OVERLAP_TOKENS = 64
+# Dimensione (in caratteri) dei blocchi letti dal file raw in modalità streaming
+RAW_READ_BLOCK_CHARS = 1 << 20
+
+# Lookup precalcolato articolo/considerando/allegato → id dei chunk (generato da prepare_corpus.py)
+ARTICLE_INDEX_FILE = PROCESSED_DIR / "ai_act_article_index.json"
+
+# Strategia di chunking:
+#   "structure" = un chunk per Articolo / Considerando / Allegato (spezzato a finestre solo se troppo lungo)
+#   "tokens"    = finestre fisse di CHUNK_MAX_TOKENS token con overlap
+# Default "tokens": è la strategia con cui sono stati generati chunk e vector store
+# in data/processed; "structure" va scelta esplicitamente e richiede di rilanciare
+# prepare_corpus.py e build_vector_store.py (override: RAG_CHUNKING_STRATEGY)
+CHUNKING_STRATEGY = os.environ.get("RAG_CHUNKING_STRATEGY", "tokens")
+
+# Se True, le domande che citano esplicitamente un articolo / considerando / allegato
+# ("What does Article 50 require?") usano direttamente il lookup, senza ricerca FAISS
+ARTICLE_ROUTING = True
+
+# Parametri di chunking (override: RAG_CHUNK_MAX_TOKENS, RAG_CHUNK_OVERLAP_TOKENS)
+CHUNK_MAX_TOKENS = int(os.environ.get("RAG_CHUNK_MAX_TOKENS", 512))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("RAG_CHUNK_OVERLAP_TOKENS", 64))
 
 # ───────── Embeddings & Vector Store ───────── #
 
-# Cartella dove salveremo indice e metadata
+# Cartella dove salveremo indice e metadata: una sottocartella per generazione,
+# quella attiva è indicata dal file CURRENT (vedi vector_store.py)
 VECTOR_STORE_DIR = PROCESSED_DIR / "vector_store"
 VECTOR_STORE_DIR.mkdir(parents=True, exist_ok=True)
 
-# File dell'indice FAISS
-FAISS_INDEX_FILE = VECTOR_STORE_DIR / "faiss_index.bin"
+# File dell'indice FAISS (nella cartella della generazione)
+FAISS_INDEX_NAME = "faiss_index.bin"
+
+# Tipo di indice FAISS:
+#   "flat"  = ricerca esatta (brute force), ottima per poche migliaia di chunk
+#   "hnsw"  = grafo HNSW, approssimato, molto veloce anche su milioni di vettori
+#   "ivfpq" = IVF + Product Quantization, approssimato e compresso in memoria
+FAISS_INDEX_TYPE = "flat"
+
+# Parametri HNSW
+HNSW_M = 32                  # vicini per nodo nel grafo
+HNSW_EF_CONSTRUCTION = 200   # ampiezza della ricerca in costruzione
+HNSW_EF_SEARCH = 64          # ampiezza della ricerca in query (più alto = recall migliore, più lento)
+
+# Parametri IVF-PQ (ridotti automaticamente se il corpus è piccolo)
+IVF_NLIST = 1024             # numero di liste (centroidi)
+IVF_NPROBE = 16              # liste visitate per query
+PQ_M = 48                    # sotto-quantizzatori (deve dividere la dimensione dei vettori)
+PQ_NBITS = 8                 # bit per sotto-quantizzatore
+IVF_TRAIN_SAMPLE = 100_000   # vettori campionati per il training
 
 # File con la metadata (id → testo)
-CHUNKS_METADATA_FILE = VECTOR_STORE_DIR / "chunks_metadata.jsonl"
+CHUNKS_METADATA_NAME = "chunks_metadata.jsonl"
+
+# Stessa metadata in formato binario (testi concatenati + offsets numpy), aperta in mmap dal retriever
+CHUNK_STORE_NAME = "chunk_store"
 
-# Nome del modello di embeddings (SentenceTransformers)
-EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# Nome del modello di embeddings (SentenceTransformers) (override: RAG_EMBEDDING_MODEL_NAME)
+EMBEDDING_MODEL_NAME = os.environ.get("RAG_EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
 # Critico: modello leggero, veloce e decente per testo legale.
+
+# Batch size per SentenceTransformer.encode (query in batch e chunk del corpus)
+EMBEDDING_BATCH_SIZE = 32
+
+# Indice invertito BM25 (costruito da build_vector_store.py nella generazione, accanto all'indice FAISS)
+SPARSE_INDEX_NAME = "bm25"
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Modalità di retrieval:
+#   "dense"  = solo FAISS
+#   "hybrid" = FAISS + BM25 fusi con reciprocal rank fusion (termini esatti come "post-remote")
+# Default "dense", con cui sono stati prodotti i risultati esistenti; l'ibrido va
+# scelto esplicitamente (override: RAG_RETRIEVAL_MODE)
+RETRIEVAL_MODE = os.environ.get("RAG_RETRIEVAL_MODE", "dense")
+RRF_K = 60                   # costante della RRF: score = Σ 1 / (RRF_K + rank)
+HYBRID_CANDIDATES = 50       # candidati presi da ciascun retriever prima della fusione
+
+# Micro-batching delle query concorrenti (servizio HTTP): le query che arrivano entro
+# QUERY_BATCH_WINDOW_MS dalla prima (fino a QUERY_BATCH_MAX_SIZE) vengono codificate e cercate insieme
+QUERY_BATCH_WINDOW_MS = 2.0
+QUERY_BATCH_MAX_SIZE = 32
+
+# Re-ranking con cross-encoder (su CPU): si recuperano RERANK_CANDIDATES chunk,
+# li si ri-valuta a coppie (domanda, chunk) e si passano all'LLM solo i RERANK_TOP_K migliori
+RERANK_ENABLED = False
+RERANKER_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_CANDIDATES = 50
+RERANK_TOP_K = 3
+RERANK_BATCH_SIZE = 32
+RERANK_CACHE_MAX_ENTRIES = 100_000   # score (hash domanda, id chunk) tenuti in memoria (LRU)
+
+# Budget di token per i chunk nel CONTEXT del prompt, per modello (vedi context_packer.py).
+# I chunk entrano in ordine di score finché c'è spazio; l'overlap tra chunk adiacenti non si conta due volte.
+CONTEXT_TOKEN_BUDGET_DEFAULT = 3000
+CONTEXT_TOKEN_BUDGETS = {
+    "gpt-4o-mini": 3000,
+    "claude-sonnet-4-5": 3000,
+    "mistral-small-latest": 3000,
+    "meta-llama/Meta-Llama-3-8B-Instruct": 2000,   # finestra da 8k token, meglio restare stretti
+    "deepseek-ai/DeepSeek-V3": 3000,
+}
+
+# ───────── Cache ───────── #
+
+# Cartella per le cache su disco (risposte LLM, embeddings, ...)
+CACHE_DIR = DATA_DIR / "cache"
+
+# Cache delle risposte LLM (SQLite), condivisa da tutti i client
+LLM_CACHE_FILE = CACHE_DIR / "llm_responses.sqlite"
+
+# Numero massimo di risposte in cache: oltre, si eliminano le meno usate di recente (LRU)
+LLM_CACHE_MAX_ENTRIES = 100_000
+
+# Cache persistente degli embeddings dei chunk, una sottocartella per modello
+EMBEDDING_CACHE_DIR = CACHE_DIR / "embeddings"
+
+# Cache degli embeddings delle query: append senza fsync e dimensione limitata
+# (oltre EMBEDDING_QUERY_CACHE_MAX_ROWS le query nuove non vengono più salvate)
+EMBEDDING_QUERY_CACHE_DIR = CACHE_DIR / "query_embeddings"
+EMBEDDING_QUERY_CACHE_MAX_ROWS = 100_000
+
+# ───────── Client HTTP asincroni (AsyncLLMClient) ───────── #
+
+# Pool di connessioni condiviso da tutti i client asincroni (vedi http_pool.py)
+HTTP_MAX_CONNECTIONS = 200          # connessioni aperte in tutto
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 50 # connessioni inattive tenute aperte per il riuso
+HTTP_KEEPALIVE_EXPIRY = 30.0        # secondi prima di chiudere una connessione inattiva
+HTTP_CONNECT_TIMEOUT = 10.0
+HTTP_READ_TIMEOUT = 120.0           # le generazioni lunghe possono richiedere minuti
+
+# Endpoint chat (formato OpenAI) del router di Hugging Face Inference, usato dai client
+# asincroni LLaMA e DeepSeek con il pool condiviso (lo stesso dei client sincroni di huggingface_hub)
+HF_CHAT_COMPLETIONS_URL = "https://router.huggingface.co/v1/chat/completions"
+
+# ───────── Esperimenti ───────── #
+
+# Cartella con dataset di valutazione e risultati degli esperimenti
+EVAL_DIR = DATA_DIR / "eval"
+
+# Dataset di valutazione (domande + risposte gold)
+EVAL_FILE = EVAL_DIR / "ai_act_eval.jsonl"
+
+# Journal append-only delle generazioni (per riprendere un esperimento interrotto)
+JOURNAL_DIR = EVAL_DIR / "journal"
+
+# Numero massimo di richieste di generazione in parallelo
+EXPERIMENT_MAX_WORKERS = 8
+
+# Limite di richieste al secondo per provider (None = nessun limite)
+PROVIDER_RATE_LIMITS = {
+    "openai": 8.0,
+    "claude": 4.0,
+    "mistral": 1.0,
+    "llama": 2.0,
+    "deepseek": 2.0,
+}
+
+# ───────── Valutazione RAGAS ───────── #
+
+# Giudice di RAGAS (LLM + embeddings), uguale per tutti i modelli valutati
+RAGAS_JUDGE_MODEL = "gpt-4o-mini"
+RAGAS_JUDGE_EMBEDDING_MODEL = "text-embedding-ada-002"
+
+# Cache delle chiamate al giudice (prompt → risposta, testo → embedding)
+RAGAS_LLM_CACHE_FILE = CACHE_DIR / "ragas_judge_llm.sqlite"
+RAGAS_EMBEDDING_CACHE_DIR = CACHE_DIR / "ragas_judge_embeddings"
+
+# Punteggi già calcolati per (campione, metrica): si ricalcola solo ciò che manca
+RAGAS_SCORE_FILE = CACHE_DIR / "ragas_scores.sqlite"
+
+# Giudice locale (run_ragas.py --judge local): similarità coseno minima perché
+# una frase conti come supportata da un'altra (embeddings di EMBEDDING_MODEL_NAME)
+LOCAL_JUDGE_SUPPORT_THRESHOLD = 0.6
+
+# ───────── Valutazione del retrieval ───────── #
+
+# eval_retrieval.py: similarità coseno minima tra risposta gold (o una sua frase)
+# e un chunk recuperato perché il chunk conti come rilevante
+RETRIEVAL_EVAL_THRESHOLD = 0.5
+
+# Modello di embeddings di riferimento con cui eval_retrieval.py misura quella similarità.
+# È fisso (non segue RAG_EMBEDDING_MODEL_NAME): il modello sotto misura non giudica se stesso
+RETRIEVAL_EVAL_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Cartella delle varianti di sweep.py: una sottocartella di artefatti per combinazione di parametri
+SWEEP_DIR = DATA_DIR / "sweeps"
+
+# ───────── Servizio HTTP ───────── #
+
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8000
+SERVICE_RETRIEVAL_WORKERS = 32  # thread per il retrieval: con il micro-batching per lo più attendono il batch
+SERVICE_QUERY_BATCHING = True   # codifica insieme le query concorrenti (QueryBatcher)
+SERVICE_LLM_WORKERS = 32        # thread per le chiamate LLM (attese di rete)
+
+# Latenza simulata (s) dell'LLM finto usato nei test offline (llm_fake.py)
+FAKE_LLM_LATENCY = 0.2
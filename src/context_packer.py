@@ -0,0 +1,183 @@
+# src/context_packer.py
+#
+# Impacchettamento dei chunk recuperati nel CONTEXT del prompt:
+#   1. i chunk vengono scelti in ordine di score finché entrano nel budget di token
+#      del modello (contati con lo stesso tokenizer tiktoken del chunking);
+#   2. i chunk con id adiacenti (ai_act_N, ai_act_N+1) che sono finestre consecutive
+#      dello stesso testo vengono uniti in un unico blocco, togliendo il testo ripetuto
+#      dall'overlap. Con il chunking strutturale gli id proseguono da un'unità alla
+#      successiva: si uniscono solo le parti consecutive ("part") dello stesso
+#      articolo / considerando / allegato, così i blocchi non mescolano unità diverse.
+# Così i ~64 token di overlap non vengono pagati due volte e il prompt non supera
+# mai il budget configurato per il modello.
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from config import CONTEXT_TOKEN_BUDGETS, CONTEXT_TOKEN_BUDGET_DEFAULT
+from prepare_corpus import ARTICLE_INDEX_KEYS, get_tokenizer
+
+_CHUNK_ID_RE = re.compile(r"^(.*)_(\d+)$")
+
+# Sotto questa lunghezza (in caratteri) un suffisso/prefisso comune è una coincidenza, non overlap
+_MIN_OVERLAP_CHARS = 20
+
+_tokenizer = None
+
+
+def _get_tokenizer():
+    """
+    Tokenizer tiktoken del progetto, creato alla prima chiamata.
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        _tokenizer = get_tokenizer()
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    """
+    Numero di token del testo con il tokenizer tiktoken del progetto.
+    """
+    return len(_get_tokenizer().encode(text))
+
+
+def token_budget(model_name: Optional[str]) -> int:
+    """
+    Budget di token per il CONTEXT del modello (default se il modello non è configurato).
+    """
+    return CONTEXT_TOKEN_BUDGETS.get(model_name, CONTEXT_TOKEN_BUDGET_DEFAULT)
+
+
+def _split_id(chunk_id: str) -> Tuple[str, int]:
+    """
+    "ai_act_12" → ("ai_act", 12); id senza numero finale → (id, -1).
+    """
+    m = _CHUNK_ID_RE.match(chunk_id)
+    if not m:
+        return chunk_id, -1
+    return m.group(1), int(m.group(2))
+
+
+def continues(prev_chunk: Dict, next_chunk: Dict) -> bool:
+    """
+    True se next_chunk (id successivo a prev_chunk) prosegue lo stesso testo:
+    parte successiva della stessa unità (chunking strutturale) oppure finestra
+    successiva del testo intero (chunking a token, senza "part").
+    """
+    if "part" not in prev_chunk and "part" not in next_chunk:
+        return True
+    return (
+        prev_chunk.get("section") == next_chunk.get("section")
+        and all(prev_chunk.get(k) == next_chunk.get(k) for k in ARTICLE_INDEX_KEYS)
+        and next_chunk.get("part") == prev_chunk.get("part", -1) + 1
+    )
+
+
+def overlap_chars(prev_text: str, next_text: str) -> int:
+    """
+    Lunghezza del testo finale di prev_text ripetuto all'inizio di next_text
+    (0 se non c'è overlap significativo).
+    """
+    max_len = min(len(prev_text), len(next_text))
+    # Candidati: le posizioni in cui l'inizio di next_text compare nella coda di prev_text
+    probe = next_text[:_MIN_OVERLAP_CHARS]
+    if len(probe) < _MIN_OVERLAP_CHARS:
+        return 0
+    start = prev_text.find(probe, len(prev_text) - max_len)
+    while start != -1:
+        length = len(prev_text) - start
+        if next_text.startswith(prev_text[start:]):
+            return length
+        start = prev_text.find(probe, start + 1)
+    return 0
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Tronca il testo ai primi max_tokens token.
+    """
+    tokenizer = _get_tokenizer()
+    tokens = tokenizer.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return tokenizer.decode(tokens[:max_tokens])
+
+
+def pack_contexts(contexts: List[Dict], budget: int) -> List[Dict]:
+    """
+    Seleziona e unisce i chunk (in ordine di score, il migliore per primo) entro
+    `budget` token. Restituisce i blocchi di contesto in ordine di score: ogni blocco
+    è il primo chunk della sequenza con "text" unito e "chunk_ids" dei chunk inclusi.
+    """
+    if not contexts:
+        return []
+
+    by_key: Dict[Tuple[str, int], Dict] = {}
+    selected: List[Tuple[str, int]] = []
+    used = 0
+
+    for chunk in contexts:
+        key = _split_id(chunk["id"])
+        if key in by_key:
+            continue
+
+        # Costo = token del chunk meno il testo già presente nei vicini selezionati
+        text = chunk["text"]
+        prefix, number = key
+        prev_chunk = by_key.get((prefix, number - 1)) if number >= 0 else None
+        next_chunk = by_key.get((prefix, number + 1)) if number >= 0 else None
+        if prev_chunk is not None and not continues(prev_chunk, chunk):
+            prev_chunk = None
+        if next_chunk is not None and not continues(chunk, next_chunk):
+            next_chunk = None
+        start = overlap_chars(prev_chunk["text"], text) if prev_chunk else 0
+        end = len(text) - (overlap_chars(text, next_chunk["text"]) if next_chunk else 0)
+        cost = count_tokens(text[start:max(start, end)])
+
+        if used + cost > budget:
+            if not selected:
+                # Nemmeno il migliore entra nel budget: lo tronchiamo piuttosto che non passare nulla
+                chunk = dict(chunk, text=_truncate_to_tokens(text, budget))
+                by_key[key] = chunk
+                selected.append(key)
+                used = budget
+            continue
+
+        by_key[key] = chunk
+        selected.append(key)
+        used += cost
+
+    rank = {key: i for i, key in enumerate(selected)}
+
+    # Unione delle sequenze di id consecutivi (stesso prefisso) dello stesso testo
+    blocks: List[Tuple[int, Dict]] = []
+    current: Optional[Dict] = None
+    current_rank = 0
+    last_key: Optional[Tuple[str, int]] = None
+
+    for key in sorted(selected):
+        chunk = by_key[key]
+        prefix, number = key
+        if (
+            current is not None
+            and number >= 0
+            and last_key == (prefix, number - 1)
+            and continues(by_key[last_key], chunk)
+        ):
+            prev_text = current["text"]
+            skip = overlap_chars(prev_text, chunk["text"])
+            separator = "" if skip else "\n"
+            current["text"] = prev_text + separator + chunk["text"][skip:]
+            current["chunk_ids"].append(chunk["id"])
+            current_rank = min(current_rank, rank[key])
+        else:
+            if current is not None:
+                blocks.append((current_rank, current))
+            current = dict(chunk, chunk_ids=[chunk["id"]])
+            current_rank = rank[key]
+        last_key = key
+
+    blocks.append((current_rank, current))
+    blocks.sort(key=lambda pair: pair[0])
+    return [block for _, block in blocks]
@@ -0,0 +1,283 @@
+# src/embedding_cache.py
+#
+# Cache persistente degli embeddings, indicizzata per (modello, hash del testo).
+# Per ogni modello teniamo:
+#   - vectors.f32  : matrice float32 (una riga per testo), letta con np.memmap
+#   - index.jsonl  : una riga {"hash": ..., "row": ...} per ogni vettore salvato
+#   - meta.json    : nome del modello e dimensione dei vettori
+# Così ricostruire l'indice dopo un nuovo chunking codifica solo i chunk nuovi/modificati
+# e le query già viste non vengono ricalcolate.
+# Più processi possono usare la stessa cartella (es. le varianti di sweep.py): gli
+# append avvengono sotto un lock di file del sistema operativo, dopo aver riletto
+# le righe aggiunte dagli altri processi.
+
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from config import EMBEDDING_CACHE_DIR, EMBEDDING_MODEL_NAME
+
+
+def text_hash(text: str) -> str:
+    """
+    Hash SHA-256 (esadecimale) del testo da codificare.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """
+    Lock esclusivo tra processi sul file `path` (flock su POSIX, msvcrt su Windows).
+    """
+    with path.open("a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK rinuncia dopo 10 s: si riprova
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class EmbeddingCache:
+    """
+    Store append-only degli embeddings di un modello.
+    encode() restituisce gli embeddings nell'ordine dei testi, calcolando
+    (con encode_fn) solo quelli che non sono ancora in cache.
+    Con durable=False gli append non fanno fsync (per le query: un crash del sistema
+    può perdere le ultime righe, che vengono scartate al caricamento).
+    Con max_rows la cache smette di crescere: oltre il limite i vettori nuovi
+    vengono restituiti ma non salvati.
+    """
+
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        cache_dir: Path = EMBEDDING_CACHE_DIR,
+        durable: bool = True,
+        max_rows: Optional[int] = None,
+    ):
+        self.model_name = model_name
+        self.durable = durable
+        self.max_rows = max_rows
+        self.dir = cache_dir / re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.vectors_file = self.dir / "vectors.f32"
+        self.index_file = self.dir / "index.jsonl"
+        self.meta_file = self.dir / "meta.json"
+        self.lock_file = self.dir / "lock"
+
+        self.hits = 0
+        self.misses = 0
+        self.dim: Optional[int] = None
+        self._rows: Dict[str, int] = {}
+        self._matrix: Optional[np.memmap] = None
+        # Byte di index.jsonl già letti: le righe successive sono di altri processi
+        self._index_offset = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.meta_file.exists():
+            return
+        with file_lock(self.lock_file):
+            self._read_meta()
+            self._truncate_partial_row()
+            self._read_index()
+        self._open_matrix()
+
+    def _read_meta(self):
+        meta = json.loads(self.meta_file.read_text(encoding="utf-8"))
+        self.dim = int(meta["dim"])
+
+    def _truncate_partial_row(self):
+        """
+        Un crash durante l'append può lasciare una riga incompleta: la tagliamo.
+        Chiamare con il lock di file acquisito (nessun altro processo sta scrivendo).
+        """
+        if not self.vectors_file.exists():
+            return
+        row_bytes = self.dim * 4
+        size = self.vectors_file.stat().st_size
+        if size % row_bytes:
+            with self.vectors_file.open("r+b") as f:
+                f.truncate(size - size % row_bytes)
+
+    def _read_index(self):
+        """
+        Legge le righe complete di index.jsonl dopo _index_offset. I vettori vengono
+        scritti prima dell'indice, quindi le righe complete puntano a dati già su disco;
+        quelle oltre la fine della matrice (fsync saltato e crash) vengono ignorate.
+        """
+        if not self.index_file.exists():
+            return
+        with self.index_file.open("rb") as f:
+            f.seek(self._index_offset)
+            data = f.read()
+        complete = data[: data.rfind(b"\n") + 1]
+        self._index_offset += len(complete)
+        n_rows = self._n_rows()
+        for line in complete.decode("utf-8").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry["row"] < n_rows:
+                self._rows[entry["hash"]] = entry["row"]
+
+    def _refresh(self):
+        """
+        Aggiunge le righe salvate nel frattempo da altri processi.
+        Chiamare con il lock acquisito.
+        """
+        if self.dim is None:
+            if not self.meta_file.exists():
+                return
+            self._read_meta()
+        if self.index_file.exists() and self.index_file.stat().st_size != self._index_offset:
+            self._read_index()
+            self._open_matrix()
+
+    def _n_rows(self) -> int:
+        if self.dim is None or not self.vectors_file.exists():
+            return 0
+        return self.vectors_file.stat().st_size // (self.dim * 4)
+
+    def _open_matrix(self):
+        n_rows = self._n_rows()
+        if n_rows == 0:
+            self._matrix = None
+            return
+        self._matrix = np.memmap(self.vectors_file, dtype="float32", mode="r", shape=(n_rows, self.dim))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _append(self, hashes: List[str], vectors: np.ndarray):
+        """
+        Aggiunge i vettori nuovi in coda alla matrice e all'indice.
+        Chiamare con il lock acquisito: il lock di file serializza gli append
+        dei processi che condividono la cartella.
+        """
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.lock_file):
+            if self.dim is None and self.meta_file.exists():
+                self._read_meta()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self.meta_file.write_text(
+                    json.dumps({"model": self.model_name, "dim": self.dim}),
+                    encoding="utf-8",
+                )
+            self._truncate_partial_row()
+            # Righe scritte da altri processi dopo l'ultima lettura: non vanno duplicate
+            self._read_index()
+
+            new = [(h, v) for h, v in zip(hashes, vectors) if h not in self._rows]
+            start_row = self._n_rows()
+            if self.max_rows is not None:
+                new = new[: max(0, self.max_rows - start_row)]
+            if new:
+                block = np.ascontiguousarray(np.stack([v for _, v in new]), dtype="float32")
+                # Prima i vettori, poi l'indice: una riga d'indice punta sempre a dati già scritti
+                with self.vectors_file.open("ab") as f:
+                    f.write(block.tobytes())
+                    f.flush()
+                    if self.durable:
+                        os.fsync(f.fileno())
+                with self.index_file.open("ab") as f:
+                    lines = "".join(
+                        json.dumps({"hash": h, "row": start_row + offset}) + "\n"
+                        for offset, (h, _) in enumerate(new)
+                    )
+                    f.write(lines.encode("utf-8"))
+                    f.flush()
+                    if self.durable:
+                        os.fsync(f.fileno())
+                    self._index_offset = f.tell()
+
+                for offset, (h, _) in enumerate(new):
+                    self._rows[h] = start_row + offset
+        self._open_matrix()
+
+    def encode(
+        self,
+        texts: List[str],
+        encode_fn: Callable[[List[str]], np.ndarray],
+    ) -> np.ndarray:
+        """
+        Restituisce una matrice float32 (len(texts) x dim) con gli embeddings dei testi.
+        encode_fn viene chiamata una sola volta, sui soli testi mancanti (senza duplicati).
+        """
+        hashes = [text_hash(t) for t in texts]
+
+        with self._lock:
+            missing: Dict[str, str] = {}
+            for h, t in zip(hashes, texts):
+                if h not in self._rows and h not in missing:
+                    missing[h] = t
+            if missing:
+                # Magari li ha già calcolati un altro processo
+                self._refresh()
+                missing = {h: t for h, t in missing.items() if h not in self._rows}
+
+        computed: Dict[str, np.ndarray] = {}
+        if missing:
+            vectors = np.asarray(encode_fn(list(missing.values())), dtype="float32")
+            computed = dict(zip(missing.keys(), vectors))
+            with self._lock:
+                self._append(list(missing.keys()), vectors)
+
+        with self._lock:
+            n_missing = sum(1 for h in hashes if h in missing)
+            self.misses += n_missing
+            self.hits += len(hashes) - n_missing
+            if not hashes:
+                return np.zeros((0, self.dim or 0), dtype="float32")
+            # Copia in RAM: il chiamante può normalizzare/modificare i vettori.
+            # I vettori oltre max_rows non sono nella matrice: si usano quelli appena calcolati
+            rows = np.array([self._rows.get(h, -1) for h in hashes], dtype="int64")
+            if self._matrix is not None and (rows >= 0).any():
+                out = np.array(self._matrix[np.maximum(rows, 0)], dtype="float32")
+            else:
+                out = np.empty((len(hashes), self.dim), dtype="float32")
+            for i in np.flatnonzero(rows < 0):
+                out[i] = computed[hashes[i]]
+            return out
+
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> str:
+        return (
+            f"hit={self.hits} miss={self.misses} "
+            f"(hit ratio {self.hit_ratio():.1%}), vettori in cache={len(self)}"
+        )
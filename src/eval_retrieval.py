@@ -0,0 +1,217 @@
+# src/eval_retrieval.py
+#
+# Valutazione del solo retrieval, senza LLM né chiamate API: per ogni domanda di
+# EVAL_FILE recupera i top_k chunk come fa la pipeline (routing, ibrido, re-ranking)
+# e confronta con la similarità coseno l'embedding della risposta gold con quelli
+# dei chunk recuperati. Gli embeddings di risposte e chunk vengono da un modello di
+# riferimento fisso (RETRIEVAL_EVAL_MODEL_NAME), caricato a parte: il modello del
+# retriever sotto misura non giudica i propri risultati, e varianti con modelli di
+# embeddings diversi sono confrontabili.
+# Un chunk è "rilevante" se la similarità con la risposta gold supera
+# RETRIEVAL_EVAL_THRESHOLD. Metriche:
+#   - hit@k    : frazione di domande con almeno un chunk rilevante tra i primi k
+#   - MRR      : media di 1 / posizione del primo chunk rilevante (0 se nessuno)
+#   - coverage : frazione delle frasi della risposta gold coperte da almeno un chunk
+#   - token    : token medi dei chunk recuperati (costo del CONTEXT)
+# Tutte le similarità si calcolano con poche operazioni matriciali su tutto il dataset.
+#
+# Esempio:
+#   python eval_retrieval.py --top-k 5
+#   python eval_retrieval.py --top-k 3 --rerank --output ../data/eval/retrieval_metrics.json
+#   python eval_retrieval.py --reference-model sentence-transformers/all-mpnet-base-v2
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from chunk_store import iter_jsonl
+from config import (
+    EVAL_FILE,
+    EMBEDDING_BATCH_SIZE,
+    RERANK_ENABLED,
+    RETRIEVAL_EVAL_MODEL_NAME,
+    RETRIEVAL_EVAL_THRESHOLD,
+)
+from context_packer import count_tokens
+from embedding_cache import EmbeddingCache
+from rag_pipeline import retrieve_contexts_batch
+from ragas_judges import split_sentences
+from retriever import Retriever, get_retriever
+
+
+class ReferenceEmbedder:
+    """
+    Modello di embeddings con cui si giudica la rilevanza, indipendente dal retriever.
+    Usa la cache persistente degli embeddings: gli stessi chunk e le stesse risposte
+    gold, valutati per più top_k o più varianti dello sweep, si codificano una volta.
+    """
+
+    def __init__(self, model_name: str = RETRIEVAL_EVAL_MODEL_NAME):
+        self.model_name = model_name
+        self.cache = EmbeddingCache(model_name)
+        self._model = None
+
+    def _encode_missing(self, texts: List[str]) -> np.ndarray:
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+
+            print(f"Carico modello di embeddings di riferimento: {self.model_name}")
+            self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model.encode(texts, batch_size=EMBEDDING_BATCH_SIZE, show_progress_bar=False)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeddings normalizzati (norma 1) dei testi, una riga per testo.
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        vectors = np.asarray(self.cache.encode(texts, self._encode_missing), dtype="float32")
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+
+def chunk_embeddings(reference: ReferenceEmbedder, contexts: List[List[Dict]]) -> List[np.ndarray]:
+    """
+    Embeddings di riferimento dei chunk recuperati, una matrice (n_chunk x dim) per domanda.
+    """
+    vectors = reference.encode([chunk["text"] for ctxs in contexts for chunk in ctxs])
+
+    offsets = np.cumsum([0] + [len(ctxs) for ctxs in contexts])
+    return [vectors[lo:hi] for lo, hi in zip(offsets[:-1], offsets[1:])]
+
+
+def pad(matrices: List[np.ndarray], dim: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Impila matrici di lunghezza variabile in un tensore (n x max_len x dim) con maschera.
+    """
+    max_len = max((len(m) for m in matrices), default=0)
+    out = np.zeros((len(matrices), max_len, dim), dtype="float32")
+    mask = np.zeros((len(matrices), max_len), dtype=bool)
+    for i, m in enumerate(matrices):
+        out[i, : len(m)] = m
+        mask[i, : len(m)] = True
+    return out, mask
+
+
+def retrieval_metrics(
+    gold: np.ndarray,
+    gold_sentences: np.ndarray,
+    sentence_mask: np.ndarray,
+    chunks: np.ndarray,
+    chunk_mask: np.ndarray,
+    ks: Sequence[int],
+    threshold: float = RETRIEVAL_EVAL_THRESHOLD,
+) -> Dict[str, float]:
+    """
+    hit@k, MRR e coverage su tutto il dataset.
+      gold           : (n, dim)          risposte gold
+      gold_sentences : (n, s, dim)       frasi delle risposte gold (con sentence_mask)
+      chunks         : (n, k, dim)       chunk recuperati, in ordine di rank (con chunk_mask)
+    """
+    # (n, k): similarità risposta gold – chunk, in un solo prodotto batch
+    similarity = np.einsum("nd,nkd->nk", gold, chunks)
+    relevant = (similarity >= threshold) & chunk_mask
+
+    metrics = {f"hit@{k}": float(relevant[:, :k].any(axis=1).mean()) for k in ks}
+
+    has_hit = relevant.any(axis=1)
+    first_rank = relevant.argmax(axis=1) + 1
+    metrics["mrr"] = float(np.where(has_hit, 1.0 / first_rank, 0.0).mean())
+
+    # (n, s, k): similarità frase gold – chunk; una frase è coperta se un chunk la supera
+    sentence_similarity = np.einsum("nsd,nkd->nsk", gold_sentences, chunks)
+    sentence_similarity = np.where(chunk_mask[:, None, :], sentence_similarity, -1.0)
+    covered = (sentence_similarity.max(axis=2, initial=-1.0) >= threshold) & sentence_mask
+    per_question = covered.sum(axis=1) / np.maximum(sentence_mask.sum(axis=1), 1)
+    metrics["coverage"] = float(per_question.mean())
+    return metrics
+
+
+def evaluate_retrieval(
+    top_k: int = 5,
+    rerank: bool = RERANK_ENABLED,
+    eval_file: Path = EVAL_FILE,
+    retriever: Optional[Retriever] = None,
+    reference: Optional[ReferenceEmbedder] = None,
+) -> Dict:
+    """
+    Esegue retrieval e metriche sul dataset; restituisce metriche e tempi.
+    La rilevanza è giudicata con `reference` (di default RETRIEVAL_EVAL_MODEL_NAME).
+    """
+    examples = list(iter_jsonl(eval_file))
+    questions = [ex["question"] for ex in examples]
+    golds = [ex["answer"] for ex in examples]
+    retriever = retriever or get_retriever()
+    reference = reference or ReferenceEmbedder()
+
+    timings: Dict[str, float] = {}
+    contexts = retrieve_contexts_batch(questions, top_k=top_k, retriever=retriever, rerank=rerank, timings=timings)
+
+    start = time.perf_counter()
+    sentences = [split_sentences(gold) for gold in golds]
+    flat_sentences = [s for sents in sentences for s in sents]
+    embeddings = reference.encode(golds + flat_sentences)
+    gold, sentence_vectors = embeddings[: len(golds)], embeddings[len(golds):]
+    offsets = np.cumsum([0] + [len(sents) for sents in sentences])
+    dim = gold.shape[1]
+
+    gold_sentences, sentence_mask = pad(
+        [sentence_vectors[lo:hi] for lo, hi in zip(offsets[:-1], offsets[1:])], dim
+    )
+    chunks, chunk_mask = pad(chunk_embeddings(reference, contexts), dim)
+    ks = sorted({k for k in (1, 3, 5) if k < top_k} | {top_k})
+    metrics = retrieval_metrics(gold, gold_sentences, sentence_mask, chunks, chunk_mask, ks)
+    metrics["avg_context_tokens"] = float(
+        np.mean([sum(count_tokens(chunk["text"]) for chunk in ctxs) for ctxs in contexts])
+    )
+    timings["metrics"] = time.perf_counter() - start
+
+    return {
+        "num_questions": len(examples),
+        "top_k": top_k,
+        "rerank": rerank,
+        "mode": retriever.mode,
+        "threshold": RETRIEVAL_EVAL_THRESHOLD,
+        "reference_model": reference.model_name,
+        "metrics": metrics,
+        "timings": timings,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Metriche di retrieval (hit@k, MRR, coverage) senza LLM.")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rerank", action=argparse.BooleanOptionalAction, default=RERANK_ENABLED)
+    parser.add_argument("--eval-file", type=Path, default=EVAL_FILE)
+    parser.add_argument(
+        "--reference-model",
+        default=RETRIEVAL_EVAL_MODEL_NAME,
+        help="Modello di embeddings con cui si giudica la rilevanza (indipendente da quello del retriever)",
+    )
+    parser.add_argument("--output", type=Path, default=None, help="File JSON in cui salvare le metriche")
+    args = parser.parse_args(argv)
+
+    reference = ReferenceEmbedder(args.reference_model)
+    result = evaluate_retrieval(args.top_k, args.rerank, args.eval_file, reference=reference)
+
+    print(f"\n=== RETRIEVAL ({result['mode']}, top_k={args.top_k}, {result['num_questions']} domande) ===")
+    print(f"Rilevanza giudicata con: {reference.model_name} (soglia {RETRIEVAL_EVAL_THRESHOLD})")
+    for name, value in result["metrics"].items():
+        print(f"{name:>20}: {value:.4f}")
+    print("\nTempi:")
+    for stage, seconds in result["timings"].items():
+        print(f"{stage:>20}: {seconds * 1000:8.1f} ms")
+
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with args.output.open("w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\n✅ Metriche di retrieval salvate in: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# src/experiment_journal.py
+#
+# Journal append-only dei risultati degli esperimenti: ogni generazione completata
+# viene scritta subito su disco (con fsync), così un crash a metà esperimento non
+# butta via le risposte già pagate. Al riavvio le chiavi già presenti vengono saltate.
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def hash_text(text: str) -> str:
+    """
+    Hash SHA-256 (esadecimale) di una stringa.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_journal_key(qid, model: str, prompt_hash: str, retrieval_config: Dict) -> str:
+    """
+    Chiave di un record: (id domanda, modello, hash del prompt, configurazione di retrieval).
+    """
+    payload = json.dumps(
+        [qid, model, prompt_hash, retrieval_config],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hash_text(payload)
+
+
+class ResultJournal:
+    """
+    File JSONL append-only: una riga per generazione completata, con il campo
+    "journal_key". Thread-safe: può essere scritto dai worker del runner.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict] = {}
+        # True se l'ultima riga su disco è rimasta senza "\n" (scrittura interrotta)
+        self._needs_newline = False
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with self.path.open("rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                self._needs_newline = f.read(1) != b"\n"
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError:
+                    # Riga troncata da un crash durante la scrittura: la ignoriamo
+                    continue
+                self._records[data["journal_key"]] = data
+        print(f"Journal {self.path.name}: {len(self._records)} record già presenti.")
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._records
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self._records.get(key)
+
+    def append(self, key: str, record: Dict):
+        """
+        Aggiunge un record al journal e lo forza su disco prima di restituire.
+        """
+        record = dict(record, journal_key=key)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                if self._needs_newline:
+                    f.write("\n")
+                    self._needs_newline = False
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._records[key] = record
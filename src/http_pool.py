@@ -0,0 +1,93 @@
+# src/http_pool.py
+#
+# Pool HTTP condiviso (httpx.AsyncClient) per i client LLM asincroni: una sola
+# tabella di connessioni keep-alive per processo e per event loop, con limiti
+# espliciti sul numero di connessioni, invece di un pool separato per ogni SDK.
+# Per le API senza un SDK che accetti un client httpx esterno (Hugging Face Inference)
+# post_json / stream_json_events fanno le richieste direttamente sul pool.
+
+import asyncio
+import json
+import threading
+import weakref
+from typing import AsyncIterator, Dict
+
+import httpx
+
+from config import (
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+)
+
+# Un AsyncClient è legato all'event loop su cui apre le connessioni: uno per loop.
+# La chiave è il loop stesso (non il suo id, che dopo la garbage collection può
+# essere riusato da un loop nuovo); le voci dei loop chiusi senza
+# aclose_async_http_client vengono scartate alla chiamata successiva.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Restituisce l'httpx.AsyncClient condiviso dell'event loop corrente, creandolo alla prima chiamata.
+    """
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        for closed_loop in [other for other in _clients if other.is_closed()]:
+            del _clients[closed_loop]
+        client = _clients.get(loop)
+        if client is None or client.is_closed:
+            client = _new_client()
+            _clients[loop] = client
+    return client
+
+
+def _new_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+    )
+
+
+async def post_json(url: str, payload: Dict, headers: Dict[str, str]) -> Dict:
+    """
+    POST JSON sul pool condiviso; restituisce il corpo JSON della risposta.
+    """
+    response = await get_async_http_client().post(url, json=payload, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
+async def stream_json_events(url: str, payload: Dict, headers: Dict[str, str]) -> AsyncIterator[Dict]:
+    """
+    POST JSON con risposta in streaming Server-Sent Events (formato OpenAI: righe
+    "data: {...}" chiuse da "data: [DONE]"): restituisce un dict per evento.
+    """
+    async with get_async_http_client().stream("POST", url, json=payload, headers=headers) as response:
+        if response.is_error:
+            await response.aread()
+            response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            yield json.loads(data)
+
+
+async def aclose_async_http_client():
+    """
+    Chiude il pool dell'event loop corrente (da chiamare prima di chiudere il loop).
+    """
+    with _clients_lock:
+        client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -1,7 +1,7 @@
 #llm_base.py: per reare un’interfaccia astratta per i vari LLM, in modo che non debba cambiare il codice per i vari LLM
 
 from abc import ABC, abstractmethod
-from typing import Optional, List
+from typing import AsyncIterator, Iterator, Optional, List
 
 
 class LLMClient(ABC):
@@ -19,3 +19,49 @@ class LLMClient(ABC):
         stop: Optional[List[str]] = None,
     ) -> str:
         pass
+
+    def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+    ) -> Iterator[str]:
+        """
+        Genera la risposta come sequenza di pezzi di testo (delta), man mano che arrivano.
+        Implementazione di default per i client senza streaming: un unico delta
+        con la risposta completa. I parametri None restano ai default del client.
+        """
+        kwargs = {"max_tokens": max_tokens, "temperature": temperature, "stop": stop}
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        yield self.generate(prompt, **kwargs)
+
+
+class AsyncLLMClient(ABC):
+    """
+    Controparte asincrona di LLMClient: agenerate() è una coroutine, così centinaia
+    di generazioni concorrenti girano su un solo event loop invece che su centinaia
+    di thread. Le implementazioni condividono il pool HTTP di http_pool.py.
+    """
+
+    @abstractmethod
+    async def agenerate(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+    ) -> str:
+        pass
+
+    async def agenerate_stream(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Versione asincrona di generate_stream. Default: un unico delta con la risposta completa.
+        """
+        yield await self.agenerate(prompt, max_tokens=max_tokens, temperature=temperature, stop=stop)
@@ -0,0 +1,328 @@
+# src/llm_cache.py
+#
+# Cache su disco (SQLite) delle risposte LLM, indirizzata per contenuto:
+# la chiave è l'hash di (modello, prompt, max_tokens, temperature, stop).
+# max_tokens e temperature non passati entrano nella chiave con i valori che il
+# client userà davvero (i suoi default), non come None: client con default diversi,
+# o un client riconfigurato, non condividono le risposte.
+# CachedLLMClient avvolge qualsiasi LLMClient, quindi vale per tutti i provider.
+# In modalità read-only (replay) non si fanno chiamate di rete: una risposta
+# mancante solleva CacheMissError.
+# AsyncCachedLLMClient fa lo stesso per gli AsyncLLMClient.
+
+import asyncio
+import hashlib
+import inspect
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, List
+
+from config import LLM_CACHE_FILE, LLM_CACHE_MAX_ENTRIES
+from llm_base import AsyncLLMClient, LLMClient
+
+
+class CacheMissError(KeyError):
+    """
+    Risposta non presente in cache mentre il client è in modalità replay.
+    """
+
+
+def make_cache_key(
+    model: str,
+    prompt: str,
+    max_tokens: Optional[int],
+    temperature: Optional[float],
+    stop: Optional[List[str]],
+) -> str:
+    """
+    Hash SHA-256 dei parametri che determinano la risposta del modello.
+    """
+    payload = json.dumps(
+        {
+            "model": model,
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stop": stop,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def client_defaults(llm, method_name: str = "generate") -> Dict[str, Optional[float]]:
+    """
+    max_tokens e temperature usati dal client quando non vengono passati:
+    l'attributo del client (default del costruttore) se c'è, altrimenti il
+    default nella firma del metodo di generazione, altrimenti None.
+    """
+    parameters = inspect.signature(getattr(llm, method_name)).parameters
+    defaults: Dict[str, Optional[float]] = {}
+    for name in ("max_tokens", "temperature"):
+        value = getattr(llm, name, None)
+        if value is None and name in parameters:
+            default = parameters[name].default
+            value = None if default is inspect.Parameter.empty else default
+        defaults[name] = value
+    return defaults
+
+
+class LLMResponseCache:
+    """
+    Tabella SQLite chiave -> risposta con eviction LRU oltre max_entries.
+    Una sola connessione, protetta da lock: si può usare da più thread.
+    """
+
+    def __init__(self, path: Path = LLM_CACHE_FILE, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)"
+        )
+        # Default (max_tokens, temperature) dell'ultimo client registrato per modello:
+        # servono al replay, che costruisce le chiavi senza un client
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS client_defaults (
+                model TEXT PRIMARY KEY,
+                params TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO responses (key, model, response, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            self._count += cursor.rowcount
+            if self._count > self.max_entries:
+                excess = self._count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                    (excess,),
+                )
+                self._count -= excess
+            self._conn.commit()
+
+    def get_defaults(self, model: str) -> Dict[str, Optional[float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT params FROM client_defaults WHERE model = ?", (model,)
+            ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def put_defaults(self, model: str, params: Dict[str, Optional[float]]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO client_defaults (model, params) VALUES (?, ?)",
+                (model, json.dumps(params, sort_keys=True)),
+            )
+            self._conn.commit()
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        ratio = self.hits / total if total else 0.0
+        return f"hit={self.hits} miss={self.misses} (hit ratio {ratio:.1%}), voci in cache={self._count}"
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _resolve_defaults(llm, method_name: str, cache: LLMResponseCache, model_name: str) -> Dict[str, Optional[float]]:
+    """
+    Default del client avvolto (salvati in cache per il replay), oppure, in replay
+    senza client, quelli salvati dall'ultima esecuzione con lo stesso modello.
+    """
+    if llm is None:
+        return cache.get_defaults(model_name)
+    defaults = client_defaults(llm, method_name)
+    cache.put_defaults(model_name, defaults)
+    return defaults
+
+
+def _request_key(
+    model_name: str,
+    defaults: Dict[str, Optional[float]],
+    prompt: str,
+    max_tokens: Optional[int],
+    temperature: Optional[float],
+    stop: Optional[List[str]],
+) -> str:
+    """
+    Chiave della richiesta con max_tokens / temperature effettivi del client.
+    """
+    return make_cache_key(
+        model_name,
+        prompt,
+        max_tokens if max_tokens is not None else defaults.get("max_tokens"),
+        temperature if temperature is not None else defaults.get("temperature"),
+        stop,
+    )
+
+
+class CachedLLMClient(LLMClient):
+    """
+    Wrapper che aggiunge la cache delle risposte a un qualsiasi LLMClient.
+    I parametri non passati (None) vengono lasciati ai default del client avvolto,
+    ma nella chiave entrano i valori effettivi (client_defaults).
+    In modalità replay llm può essere None: basta model_name per costruire le chiavi,
+    con i default salvati in cache dall'ultima esecuzione non in replay.
+    """
+
+    def __init__(
+        self,
+        llm: Optional[LLMClient],
+        cache: Optional[LLMResponseCache] = None,
+        read_only: bool = False,
+        model_name: Optional[str] = None,
+    ):
+        if llm is None and not read_only:
+            raise ValueError("Serve un LLMClient da avvolgere se la cache non è in sola lettura.")
+        self.llm = llm
+        self.cache = cache if cache is not None else LLMResponseCache()
+        self.read_only = read_only
+        self.model_name = model_name or getattr(llm, "model_name", type(llm).__name__)
+        self.defaults = _resolve_defaults(llm, "generate", self.cache, self.model_name)
+
+    def generate(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+    ) -> str:
+        key = _request_key(self.model_name, self.defaults, prompt, max_tokens, temperature, stop)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        if self.read_only:
+            raise CacheMissError(f"Risposta non in cache per {self.model_name} (modalità replay)")
+
+        kwargs = {"max_tokens": max_tokens, "temperature": temperature, "stop": stop}
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        response = self.llm.generate(prompt, **kwargs)
+
+        self.cache.put(key, self.model_name, response)
+        return response
+
+    def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+    ) -> Iterator[str]:
+        """
+        Streaming con cache: una risposta in cache viene restituita in un unico delta;
+        altrimenti si inoltrano i delta del client e la risposta completa va in cache
+        solo se lo stream arriva fino in fondo.
+        """
+        key = _request_key(self.model_name, self.defaults, prompt, max_tokens, temperature, stop)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        if self.read_only:
+            raise CacheMissError(f"Risposta non in cache per {self.model_name} (modalità replay)")
+
+        kwargs = {"max_tokens": max_tokens, "temperature": temperature, "stop": stop}
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        parts: List[str] = []
+        for delta in self.llm.generate_stream(prompt, **kwargs):
+            parts.append(delta)
+            yield delta
+
+        self.cache.put(key, self.model_name, "".join(parts))
+
+
+class AsyncCachedLLMClient(AsyncLLMClient):
+    """
+    Come CachedLLMClient, ma per un AsyncLLMClient. Le letture/scritture SQLite
+    (che possono attendere il disco) girano in un thread, fuori dall'event loop.
+    """
+
+    def __init__(
+        self,
+        llm: Optional[AsyncLLMClient],
+        cache: Optional[LLMResponseCache] = None,
+        read_only: bool = False,
+        model_name: Optional[str] = None,
+    ):
+        if llm is None and not read_only:
+            raise ValueError("Serve un AsyncLLMClient da avvolgere se la cache non è in sola lettura.")
+        self.llm = llm
+        self.cache = cache if cache is not None else LLMResponseCache()
+        self.read_only = read_only
+        self.model_name = model_name or getattr(llm, "model_name", type(llm).__name__)
+        self.defaults = _resolve_defaults(llm, "agenerate", self.cache, self.model_name)
+
+    async def agenerate(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+    ) -> str:
+        key = _request_key(self.model_name, self.defaults, prompt, max_tokens, temperature, stop)
+
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            return cached
+        if self.read_only:
+            raise CacheMissError(f"Risposta non in cache per {self.model_name} (modalità replay)")
+
+        kwargs = {"max_tokens": max_tokens, "temperature": temperature, "stop": stop}
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        response = await self.llm.agenerate(prompt, **kwargs)
+
+        await asyncio.to_thread(self.cache.put, key, self.model_name, response)
+        return response
@@ -1,12 +1,13 @@
 # src/llm_claude.py
 
 import os
-from typing import Optional, List
+from typing import AsyncIterator, Iterator, Optional, List
 
 from dotenv import load_dotenv
 import anthropic
 
-from llm_base import LLMClient
+from http_pool import get_async_http_client
+from llm_base import AsyncLLMClient, LLMClient
 
 load_dotenv()
 
@@ -52,3 +53,84 @@ class ClaudeLLMClient(LLMClient):
 
         # fallback di sicurezza
         return str(response)
+
+    def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.2,
+        stop: Optional[List[str]] = None,
+    ) -> Iterator[str]:
+        """
+        Come generate(), ma con 'messages.stream': restituisce i delta di testo man mano che arrivano.
+        """
+        with self.client.messages.stream(
+            model=self.model_name,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+        ) as stream:
+            for text in stream.text_stream:
+                yield text
+
+
+class AsyncClaudeLLMClient(AsyncLLMClient):
+    """
+    Versione asincrona di ClaudeLLMClient (anthropic.AsyncAnthropic) sul pool HTTP condiviso.
+    """
+
+    def __init__(self, model_name: str = "claude-3-sonnet-20240229", api_key: Optional[str] = None):
+        self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+        if not self.api_key:
+            raise ValueError(
+                "ANTHROPIC_API_KEY non trovata. Aggiungila al file .env oppure passala al costruttore."
+            )
+        self.model_name = model_name
+        self._client: Optional[anthropic.AsyncAnthropic] = None
+        self._http_client = None
+
+    def _get_client(self) -> anthropic.AsyncAnthropic:
+        http_client = get_async_http_client()
+        if self._client is None or self._http_client is not http_client:
+            self._client = anthropic.AsyncAnthropic(api_key=self.api_key, http_client=http_client)
+            self._http_client = http_client
+        return self._client
+
+    async def agenerate(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.2,
+        stop: Optional[List[str]] = None,
+    ) -> str:
+        response = await self._get_client().messages.create(
+            model=self.model_name,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+        )
+        if response.content and hasattr(response.content[0], "text"):
+            return response.content[0].text.strip()
+        return str(response)
+
+    async def agenerate_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.2,
+        stop: Optional[List[str]] = None,
+    ) -> AsyncIterator[str]:
+        async with self._get_client().messages.stream(
+            model=self.model_name,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
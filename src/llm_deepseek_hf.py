@@ -1,11 +1,19 @@
 import os
+from typing import AsyncIterator, Iterator, Optional, List
+
 from huggingface_hub import InferenceClient
 from dotenv import load_dotenv
 
-class DeepSeekHFClient:
-    def __init__(self, model_name="deepseek-ai/DeepSeek-V3", temperature=0.1):
+from config import HF_CHAT_COMPLETIONS_URL
+from http_pool import post_json, stream_json_events
+from llm_base import AsyncLLMClient, LLMClient
+
+
+class DeepSeekHFClient(LLMClient):
+    def __init__(self, model_name="deepseek-ai/DeepSeek-V3", temperature=0.1, max_tokens=200):
         self.model_name = model_name
         self.temperature = temperature
+        self.max_tokens = max_tokens
         token = os.getenv("HF_TOKEN")
         if not token:
             raise RuntimeError("❌ HF_TOKEN non impostato! Aggiungilo al file .env o alle env di PyCharm.")
@@ -14,14 +22,105 @@ class DeepSeekHFClient:
             token=token
         )
 
-    def generate(self, prompt: str) -> str:
+    def generate(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+    ) -> str:
         response = self.client.chat_completion(
             messages=[{"role": "user", "content": prompt}],
-            max_tokens=200,
-            temperature=self.temperature
+            max_tokens=max_tokens if max_tokens is not None else self.max_tokens,
+            temperature=temperature if temperature is not None else self.temperature,
+            stop=stop,
         )
         return response.choices[0].message["content"]
 
+    def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+    ) -> Iterator[str]:
+        for chunk in self.client.chat_completion(
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens if max_tokens is not None else self.max_tokens,
+            temperature=temperature if temperature is not None else self.temperature,
+            stop=stop,
+            stream=True,
+        ):
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+class AsyncDeepSeekHFClient(AsyncLLMClient):
+    """
+    Versione asincrona di DeepSeekHFClient: come AsyncLlamaLLMClient, chiama
+    l'endpoint chat di Hugging Face Inference sul pool condiviso di http_pool.py.
+    """
+
+    def __init__(self, model_name="deepseek-ai/DeepSeek-V3", temperature=0.1, max_tokens=200):
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        token = os.getenv("HF_TOKEN")
+        if not token:
+            raise RuntimeError("❌ HF_TOKEN non impostato! Aggiungilo al file .env o alle env di PyCharm.")
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def _payload(
+        self,
+        prompt: str,
+        max_tokens: Optional[int],
+        temperature: Optional[float],
+        stop: Optional[List[str]],
+        stream: bool = False,
+    ) -> dict:
+        payload = {
+            "model": self.model_name,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens if max_tokens is not None else self.max_tokens,
+            "temperature": temperature if temperature is not None else self.temperature,
+            "stream": stream,
+        }
+        if stop:
+            payload["stop"] = stop
+        return payload
+
+    async def agenerate(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+    ) -> str:
+        response = await post_json(
+            HF_CHAT_COMPLETIONS_URL,
+            self._payload(prompt, max_tokens, temperature, stop),
+            self.headers,
+        )
+        return response["choices"][0]["message"]["content"]
+
+    async def agenerate_stream(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+    ) -> AsyncIterator[str]:
+        async for event in stream_json_events(
+            HF_CHAT_COMPLETIONS_URL,
+            self._payload(prompt, max_tokens, temperature, stop, stream=True),
+            self.headers,
+        ):
+            choices = event.get("choices") or [{}]
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
 
 if __name__ == "__main__":
     load_dotenv()  # carica .env
@@ -0,0 +1,90 @@
+# src/llm_fake.py
+#
+# LLM finto per test e benchmark offline (service.py, bench_service.py):
+# nessuna chiamata di rete, latenza simulata configurabile, risposta deterministica.
+
+import asyncio
+import time
+from typing import AsyncIterator, Iterator, Optional, List
+
+from llm_base import AsyncLLMClient, LLMClient
+
+
+class FakeLLMClient(LLMClient):
+    """
+    Stand-in di un LLMClient: impiega `latency` secondi in tutto (come una chiamata API)
+    e risponde con l'inizio del primo excerpt del CONTEXT presente nel prompt.
+    In streaming il primo delta arriva dopo un quarto della latenza, il resto
+    parola per parola.
+    """
+
+    def __init__(self, latency: float = 0.2, model_name: str = "fake", max_tokens: int = 512):
+        self.latency = latency
+        self.model_name = model_name
+        self.max_tokens = max_tokens
+
+    def generate(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+    ) -> str:
+        return "".join(self.generate_stream(prompt, max_tokens, temperature, stop))
+
+    def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+    ) -> Iterator[str]:
+        max_tokens = max_tokens or self.max_tokens
+
+        # Il CONTEXT del prompt RAG inizia dopo la riga "CONTEXT (...):"
+        _, _, context = prompt.partition("):\n")
+        words = context.split()[: min(max_tokens, 60)]
+
+        time.sleep(self.latency / 4)
+        yield "According to the provided excerpts:"
+        for word in words:
+            time.sleep(self.latency * 3 / 4 / len(words))
+            yield " " + word
+
+
+class AsyncFakeLLMClient(AsyncLLMClient):
+    """
+    Controparte asincrona di FakeLLMClient: stessa risposta e stessi tempi,
+    ma l'attesa è un asyncio.sleep, quindi non occupa thread.
+    """
+
+    def __init__(self, latency: float = 0.2, model_name: str = "fake", max_tokens: int = 512):
+        self.latency = latency
+        self.model_name = model_name
+        self.max_tokens = max_tokens
+
+    async def agenerate(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+    ) -> str:
+        return "".join([delta async for delta in self.agenerate_stream(prompt, max_tokens, temperature, stop)])
+
+    async def agenerate_stream(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+    ) -> AsyncIterator[str]:
+        max_tokens = max_tokens or self.max_tokens
+        _, _, context = prompt.partition("):\n")
+        words = context.split()[: min(max_tokens, 60)]
+
+        await asyncio.sleep(self.latency / 4)
+        yield "According to the provided excerpts:"
+        for word in words:
+            await asyncio.sleep(self.latency * 3 / 4 / len(words))
+            yield " " + word
@@ -1,15 +1,19 @@
 # src/llm_llama_hf.py
 
 import os
-from typing import Optional
+from typing import AsyncIterator, Iterator, Optional, List
 
 from dotenv import load_dotenv
 from huggingface_hub import InferenceClient
 
+from config import HF_CHAT_COMPLETIONS_URL
+from http_pool import post_json, stream_json_events
+from llm_base import AsyncLLMClient, LLMClient
+
 load_dotenv()
 
 
-class LlamaLLMClient:
+class LlamaLLMClient(LLMClient):
     """
     Client semplice per usare un modello LLaMA (es. Llama 3 Instruct)
     tramite Hugging Face Inference API.
@@ -33,14 +37,21 @@ class LlamaLLMClient:
             )
 
         self.client = InferenceClient(model=model_name, token=hf_token)
+        self.model_name = model_name
         self.temperature = temperature
         self.max_tokens = max_tokens
 
-    def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    def generate(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+        system_prompt: Optional[str] = None,
+    ) -> str:
         """
         Genera una risposta data una stringa di prompt.
-        Se la tua MistralLLMClient usa un'interfaccia diversa (es. .invoke),
-        semplicemente allinea questo metodo allo stesso nome che usi in rag_pipeline.
+        Se max_tokens / temperature non sono passati si usano quelli del costruttore.
         """
 
         messages = []
@@ -52,9 +63,122 @@ class LlamaLLMClient:
         # Usando l'API chat-like di HF
         response = self.client.chat_completion(
             messages=messages,
-            max_tokens=self.max_tokens,
-            temperature=self.temperature,
+            max_tokens=max_tokens if max_tokens is not None else self.max_tokens,
+            temperature=temperature if temperature is not None else self.temperature,
+            stop=stop,
         )
 
         # La risposta è nel primo choice
         return response.choices[0].message["content"]
+
+    def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+        system_prompt: Optional[str] = None,
+    ) -> Iterator[str]:
+        """
+        Come generate(), ma con stream=True: restituisce i delta di testo man mano che arrivano.
+        """
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+
+        messages.append({"role": "user", "content": prompt})
+
+        for chunk in self.client.chat_completion(
+            messages=messages,
+            max_tokens=max_tokens if max_tokens is not None else self.max_tokens,
+            temperature=temperature if temperature is not None else self.temperature,
+            stop=stop,
+            stream=True,
+        ):
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+class AsyncLlamaLLMClient(AsyncLLMClient):
+    """
+    Versione asincrona di LlamaLLMClient. AsyncInferenceClient di huggingface_hub
+    aprirebbe una sessione HTTP propria (non accetta un client httpx esterno):
+    le richieste vanno invece all'endpoint chat di Hugging Face Inference
+    (HF_CHAT_COMPLETIONS_URL) sul pool condiviso di http_pool.py.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "meta-llama/Meta-Llama-3-8B-Instruct",
+        temperature: float = 0.0,
+        max_tokens: int = 512,
+    ):
+        hf_token = os.getenv("HUGGINGFACEHUB_API_TOKEN")
+        if not hf_token:
+            raise ValueError(
+                "Manca HUGGINGFACEHUB_API_TOKEN nel file .env "
+                "o nelle variabili d'ambiente."
+            )
+
+        self.headers = {"Authorization": f"Bearer {hf_token}"}
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    def _payload(
+        self,
+        prompt: str,
+        max_tokens: Optional[int],
+        temperature: Optional[float],
+        stop: Optional[List[str]],
+        system_prompt: Optional[str],
+        stream: bool = False,
+    ) -> dict:
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        payload = {
+            "model": self.model_name,
+            "messages": messages,
+            "max_tokens": max_tokens if max_tokens is not None else self.max_tokens,
+            "temperature": temperature if temperature is not None else self.temperature,
+            "stream": stream,
+        }
+        if stop:
+            payload["stop"] = stop
+        return payload
+
+    async def agenerate(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+        system_prompt: Optional[str] = None,
+    ) -> str:
+        response = await post_json(
+            HF_CHAT_COMPLETIONS_URL,
+            self._payload(prompt, max_tokens, temperature, stop, system_prompt),
+            self.headers,
+        )
+        return response["choices"][0]["message"]["content"]
+
+    async def agenerate_stream(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop: Optional[List[str]] = None,
+        system_prompt: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        async for event in stream_json_events(
+            HF_CHAT_COMPLETIONS_URL,
+            self._payload(prompt, max_tokens, temperature, stop, system_prompt, stream=True),
+            self.headers,
+        ):
+            choices = event.get("choices") or [{}]
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
@@ -1,15 +1,18 @@
 # src/llm_mistral_api.py
 
 import os
-from typing import Optional, List
+from typing import AsyncIterator, Iterator, Optional, List
 
 from dotenv import load_dotenv
 from mistralai import Mistral
 
+from http_pool import get_async_http_client
+from llm_base import AsyncLLMClient, LLMClient
+
 load_dotenv()
 
 
-class MistralLLMClient:
+class MistralLLMClient(LLMClient):
     """
     Client Mistral che espone lo stesso metodo .generate()
     usato nella pipeline RAG (come OpenAILLMClient, Claude, ecc.).
@@ -46,3 +49,92 @@ class MistralLLMClient:
         )
         # Il contenuto testuale è in choices[0].message.content
         return response.choices[0].message.content
+
+    def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.2,
+        stop: Optional[List[str]] = None,
+    ) -> Iterator[str]:
+        """
+        Come generate(), ma con 'chat.stream': restituisce i delta di testo man mano che arrivano.
+        """
+        stream = self.client.chat.stream(
+            model=self.model_name,
+            messages=[
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stop=stop,
+        )
+        for event in stream:
+            # Ogni evento contiene un chunk; il delta testuale è in choices[0].delta.content
+            content = event.data.choices[0].delta.content
+            if content:
+                yield content
+
+
+class AsyncMistralLLMClient(AsyncLLMClient):
+    """
+    Versione asincrona di MistralLLMClient (chat.complete_async / chat.stream_async)
+    con il pool HTTP condiviso passato come async_client.
+    """
+
+    def __init__(self, model_name: str = "mistral-small-latest"):
+        self.api_key = os.getenv("MISTRAL_API_KEY")
+        if not self.api_key:
+            raise ValueError(
+                "MISTRAL_API_KEY non trovata. "
+                "Aggiungila nel file .env nella root del progetto."
+            )
+        self.model_name = model_name
+        self._client: Optional[Mistral] = None
+        self._http_client = None
+
+    def _get_client(self) -> Mistral:
+        http_client = get_async_http_client()
+        if self._client is None or self._http_client is not http_client:
+            self._client = Mistral(api_key=self.api_key, async_client=http_client)
+            self._http_client = http_client
+        return self._client
+
+    async def agenerate(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.2,
+        stop: Optional[List[str]] = None,
+    ) -> str:
+        response = await self._get_client().chat.complete_async(
+            model=self.model_name,
+            messages=[
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stop=stop,
+        )
+        return response.choices[0].message.content
+
+    async def agenerate_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.2,
+        stop: Optional[List[str]] = None,
+    ) -> AsyncIterator[str]:
+        stream = await self._get_client().chat.stream_async(
+            model=self.model_name,
+            messages=[
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stop=stop,
+        )
+        async for event in stream:
+            content = event.data.choices[0].delta.content
+            if content:
+                yield content
@@ -5,12 +5,13 @@ load_dotenv()
 # src/llm_openai.py
 
 import os
-from typing import Optional, List
+from typing import AsyncIterator, Iterator, Optional, List
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
-from llm_base import LLMClient
+from http_pool import get_async_http_client
+from llm_base import AsyncLLMClient, LLMClient
 
 # Carica variabili dal .env nella root del progetto
 load_dotenv()
@@ -46,3 +47,85 @@ class OpenAILLMClient(LLMClient):
             stop=stop,
         )
         return response.choices[0].message.content.strip()
+
+    def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.2,
+        stop: Optional[List[str]] = None,
+    ) -> Iterator[str]:
+        """
+        Come generate(), ma restituisce i delta di testo man mano che arrivano (stream=True).
+        """
+        stream = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stop=stop,
+            stream=True,
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class AsyncOpenAILLMClient(AsyncLLMClient):
+    """
+    Versione asincrona di OpenAILLMClient (AsyncOpenAI) sul pool HTTP condiviso.
+    Il client SDK viene creato al primo uso, dentro l'event loop, e ricreato se il pool cambia
+    (es. un nuovo asyncio.run).
+    """
+
+    def __init__(self, model_name: str = "gpt-4o-mini", api_key: Optional[str] = None):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not self.api_key:
+            raise ValueError(
+                "OPENAI_API_KEY non trovata. Mettila nel file .env oppure passala al costruttore."
+            )
+        self.model_name = model_name
+        self._client: Optional[AsyncOpenAI] = None
+        self._http_client = None
+
+    def _get_client(self) -> AsyncOpenAI:
+        http_client = get_async_http_client()
+        if self._client is None or self._http_client is not http_client:
+            self._client = AsyncOpenAI(api_key=self.api_key, http_client=http_client)
+            self._http_client = http_client
+        return self._client
+
+    async def agenerate(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.2,
+        stop: Optional[List[str]] = None,
+    ) -> str:
+        response = await self._get_client().chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stop=stop,
+        )
+        return response.choices[0].message.content.strip()
+
+    async def agenerate_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.2,
+        stop: Optional[List[str]] = None,
+    ) -> AsyncIterator[str]:
+        stream = await self._get_client().chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stop=stop,
+            stream=True,
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
@@ -1,7 +1,9 @@
 # src/prepare_corpus.py
 
 import json
-from typing import List, Dict
+import re
+from pathlib import Path
+from typing import List, Dict, Iterable, Iterator
 
 import tiktoken  # per stimare i "token" tipo GPT
 
@@ -9,10 +11,27 @@ from config import (
     AI_ACT_RAW_FILE,
     PROCESSED_DIR,
     CHUNKS_JSONL,
+    ARTICLE_INDEX_FILE,
+    CHUNKING_STRATEGY,
     CHUNK_MAX_TOKENS,
     CHUNK_OVERLAP_TOKENS,
+    RAW_READ_BLOCK_CHARS,
 )
 
+# Sequenze di 2+ spazi: diventano un solo spazio
+_MULTI_SPACES_RE = re.compile(r"  +")
+
+# Struttura del Regolamento (una riga = un'intestazione)
+_RECITALS_START = "Whereas:"
+_ENACTING_START = "HAVE ADOPTED THIS REGULATION:"
+_RECITAL_RE = re.compile(r"^\((\d+)\) ")
+_ARTICLE_RE = re.compile(r"^Article (\d+)$")
+_ANNEX_RE = re.compile(r"^ANNEX ([IVXLC]+)$")
+_HEADING_RE = re.compile(r"^(CHAPTER [IVXLC]+|SECTION \d+)$")
+
+# Campi di metadata che finiscono nel lookup precalcolato
+ARTICLE_INDEX_KEYS = ("article", "recital", "annex")
+
 
 def load_ai_act_text() -> str:
     """
@@ -24,19 +43,51 @@ def load_ai_act_text() -> str:
         return f.read()
 
 
+def iter_text_blocks(path: Path = AI_ACT_RAW_FILE, block_chars: int = RAW_READ_BLOCK_CHARS) -> Iterator[str]:
+    """
+    Legge il file a blocchi di block_chars caratteri, senza caricarlo tutto in memoria.
+    """
+    if not path.exists():
+        raise FileNotFoundError(f"File non trovato: {path}")
+    with path.open("r", encoding="utf-8") as f:
+        while True:
+            block = f.read(block_chars)
+            if not block:
+                break
+            yield block
+
+
 def normalize_whitespace(text: str) -> str:
     """
     Cleaning leggerissimo: normalizza newline, tab e spazi doppi.
     Non modifichiamo il contenuto legale.
+    Costo lineare: una sola passata della regex comprime ogni sequenza di spazi
+    (invece di rifare replace su tutto il testo finché restano spazi doppi).
     """
     text = text.replace("\r\n", "\n")
     text = text.replace("\t", " ")
-    # Brutale ma efficace: rimuove spazi doppi ripetuti
-    while "  " in text:
-        text = text.replace("  ", " ")
+    if "  " in text:
+        text = _MULTI_SPACES_RE.sub(" ", text)
     return text
 
 
+def normalize_whitespace_stream(blocks: Iterable[str]) -> Iterator[str]:
+    """
+    Variante a streaming di normalize_whitespace, per testi più grandi della memoria.
+    La coda di spazi/tab/\\r di ogni blocco viene tenuta da parte e riattaccata al
+    blocco successivo, così l'output concatenato è identico a quello su tutto il testo.
+    """
+    carry = ""
+    for block in blocks:
+        text = carry + block
+        cut = len(text.rstrip(" \t\r"))
+        carry = text[cut:]
+        if cut:
+            yield normalize_whitespace(text[:cut])
+    if carry:
+        yield normalize_whitespace(carry)
+
+
 def get_tokenizer():
     """
     Ottiene un tokenizer tiktoken.
@@ -49,62 +100,260 @@ def get_tokenizer():
     return enc
 
 
+def _safe_split_point(text: str) -> int:
+    """
+    Posizione in cui tagliare text senza cambiare la tokenizzazione:
+    subito dopo un newline seguito da un carattere non di spaziatura
+    (i pre-token di tiktoken non attraversano questo confine).
+    Restituisce 0 se nel testo non c'è un punto del genere.
+    """
+    end = len(text)
+    while True:
+        i = text.rfind("\n", 0, end)
+        if i < 0:
+            return 0
+        if i + 1 < len(text) and not text[i + 1].isspace():
+            return i + 1
+        end = i
+
+
+def _iter_windows(token_bytes: List[bytes]) -> Iterator[str]:
+    """
+    Finestre di max CHUNK_MAX_TOKENS token con overlap CHUNK_OVERLAP_TOKENS,
+    già decodificate in testo.
+    """
+    step = CHUNK_MAX_TOKENS - CHUNK_OVERLAP_TOKENS
+    start = 0
+    while start < len(token_bytes):
+        decoded = b"".join(token_bytes[start:start + CHUNK_MAX_TOKENS]).decode("utf-8", errors="replace")
+        yield decoded.strip()
+        start += step
+
+
+def iter_chunks(blocks: Iterable[str]) -> Iterator[Dict]:
+    """
+    Chunker a streaming: riceve il testo a blocchi e restituisce i chunk uno alla volta,
+    con le stesse finestre di split_into_chunks (max CHUNK_MAX_TOKENS token,
+    overlap CHUNK_OVERLAP_TOKENS).
+    Il testo viene tokenizzato a pezzi tagliati su confini sicuri (vedi _safe_split_point)
+    e in memoria resta solo la finestra di token corrente. Ogni token viene convertito
+    in byte una sola volta: i token di overlap non vengono ridecodificati.
+    """
+    tokenizer = get_tokenizer()
+    step = CHUNK_MAX_TOKENS - CHUNK_OVERLAP_TOKENS
+
+    window: List[bytes] = []  # byte dei token dal primo non ancora emesso in avanti
+    pending = ""              # testo letto ma non ancora tokenizzato
+    chunk_id = 0
+
+    def make_chunk(token_bytes: List[bytes]) -> Dict:
+        decoded = b"".join(token_bytes).decode("utf-8", errors="replace")
+        return {"id": f"ai_act_{chunk_id}", "text": decoded.strip()}
+
+    for block in blocks:
+        pending += block
+        cut = _safe_split_point(pending)
+        if not cut and len(pending) > 4 * RAW_READ_BLOCK_CHARS:
+            # Testo senza a capo: tagliamo prima dell'ultimo spazio per restare limitati in memoria
+            cut = max(pending.rfind(" "), 0)
+        if not cut:
+            continue
+
+        window.extend(tokenizer.decode_tokens_bytes(tokenizer.encode(pending[:cut])))
+        pending = pending[cut:]
+
+        # Una finestra piena è definitiva qualunque cosa arrivi dopo
+        while len(window) >= CHUNK_MAX_TOKENS:
+            yield make_chunk(window[:CHUNK_MAX_TOKENS])
+            chunk_id += 1
+            # Il prossimo chunk riparte un po' prima per mantenere continuità
+            del window[:step]
+
+    if pending:
+        window.extend(tokenizer.decode_tokens_bytes(tokenizer.encode(pending)))
+
+    for text in _iter_windows(window):
+        yield {"id": f"ai_act_{chunk_id}", "text": text}
+        chunk_id += 1
+
+
 def split_into_chunks(text: str) -> List[Dict]:
     """
     Spezza il testo in chunk di max CHUNK_MAX_TOKENS token,
     con overlap CHUNK_OVERLAP_TOKENS.
     """
-    tokenizer = get_tokenizer()
-    tokens = tokenizer.encode(text)
+    return list(iter_chunks([text]))
 
-    chunks: List[Dict] = []
-    start = 0
+
+def iter_lines(blocks: Iterable[str]) -> Iterator[str]:
+    """
+    Righe (senza "\\n") da un flusso di blocchi di testo.
+    """
+    carry = ""
+    for block in blocks:
+        lines = (carry + block).split("\n")
+        carry = lines.pop()
+        yield from lines
+    if carry:
+        yield carry
+
+
+def iter_sections(blocks: Iterable[str]) -> Iterator[Dict]:
+    """
+    Divide il Regolamento nelle sue unità strutturali, in ordine:
+    preambolo, considerando "(N)", articoli "Article N" e allegati "ANNEX N".
+    Le intestazioni CHAPTER/SECTION (con il loro titolo) vengono anteposte
+    all'articolo successivo. Ogni unità è un dict con "section", "text" e,
+    se presenti, "recital" / "article" / "annex" e "title".
+    """
+    zone = "preamble"
+    unit: Dict = {"section": "preamble"}
+    lines: List[str] = []
+    pending_headings: List[str] = []
+    heading_title_next = False
+    unit_title_next = False
+    next_recital = 1
+    last_article = 0
+
+    def close(current: Dict, current_lines: List[str]) -> Iterator[Dict]:
+        text = "\n".join(current_lines).strip()
+        if text:
+            yield dict(current, text=text)
+
+    for line in iter_lines(blocks):
+        stripped = line.strip()
+        new_unit = None
+
+        if zone == "preamble" and stripped == _RECITALS_START:
+            zone = "recitals"
+        elif zone == "recitals":
+            m = _RECITAL_RE.match(stripped)
+            if stripped == _ENACTING_START:
+                zone = "articles"
+                pending_headings.append(line)
+                continue
+            # Il numero deve essere il successivo atteso: evita falsi positivi nel testo
+            if m and int(m.group(1)) == next_recital:
+                next_recital += 1
+                new_unit = {"section": "recital", "recital": m.group(1)}
+        elif zone == "articles":
+            m = _ARTICLE_RE.match(stripped)
+            if heading_title_next:
+                pending_headings.append(line)
+                heading_title_next = False
+                continue
+            if _HEADING_RE.match(stripped):
+                pending_headings.append(line)
+                heading_title_next = True
+                continue
+            if m and int(m.group(1)) > last_article:
+                last_article = int(m.group(1))
+                new_unit = {"section": "article", "article": m.group(1)}
+            elif _ANNEX_RE.match(stripped):
+                zone = "annexes"
+        if zone == "annexes" and new_unit is None:
+            m = _ANNEX_RE.match(stripped)
+            if m:
+                new_unit = {"section": "annex", "annex": m.group(1)}
+
+        if new_unit is not None:
+            yield from close(unit, lines)
+            unit, lines = new_unit, pending_headings + [line]
+            pending_headings = []
+            unit_title_next = new_unit["section"] in ("article", "annex")
+            continue
+
+        if pending_headings:
+            lines.extend(pending_headings)
+            pending_headings = []
+        if unit_title_next and stripped:
+            unit["title"] = stripped
+            unit_title_next = False
+        lines.append(line)
+
+    yield from close(unit, lines + pending_headings)
+
+
+def iter_structured_chunks(blocks: Iterable[str]) -> Iterator[Dict]:
+    """
+    Chunker strutturale: un chunk per considerando / articolo / allegato, con la
+    relativa metadata. Le unità più lunghe di CHUNK_MAX_TOKENS vengono spezzate
+    in finestre con overlap; ogni parte conserva la metadata e ha un campo "part".
+    """
+    tokenizer = get_tokenizer()
     chunk_id = 0
 
-    while start < len(tokens):
-        end = start + CHUNK_MAX_TOKENS
-        chunk_tokens = tokens[start:end]
-        decoded = tokenizer.decode(chunk_tokens)
+    for unit in iter_sections(blocks):
+        meta = {k: v for k, v in unit.items() if k != "text"}
+        token_bytes = tokenizer.decode_tokens_bytes(tokenizer.encode(unit["text"]))
+        if len(token_bytes) <= CHUNK_MAX_TOKENS:
+            parts = [unit["text"]]
+        else:
+            parts = list(_iter_windows(token_bytes))
 
-        chunks.append({
-            "id": f"ai_act_{chunk_id}",
-            "text": decoded.strip()
-        })
+        for part, text in enumerate(parts):
+            yield {"id": f"ai_act_{chunk_id}", "text": text, **meta, "part": part}
+            chunk_id += 1
 
-        chunk_id += 1
-        # Il prossimo chunk riparte un po' prima per mantenere continuità
-        start = end - CHUNK_OVERLAP_TOKENS
 
-    return chunks
+def track_article_index(chunks: Iterable[Dict], article_index: Dict[str, Dict[str, List[str]]]) -> Iterator[Dict]:
+    """
+    Lascia passare i chunk e intanto riempie il lookup
+    {"article": {"50": [id, ...]}, "recital": {...}, "annex": {...}}.
+    """
+    for ch in chunks:
+        for key in ARTICLE_INDEX_KEYS:
+            if key in ch:
+                article_index[key].setdefault(ch[key], []).append(ch["id"])
+        yield ch
 
 
-def save_chunks(chunks: List[Dict]):
+def save_article_index(article_index: Dict[str, Dict[str, List[str]]]):
+    """
+    Salva il lookup articolo/considerando/allegato → id dei chunk.
+    """
+    with ARTICLE_INDEX_FILE.open("w", encoding="utf-8") as f:
+        json.dump(article_index, f, ensure_ascii=False, indent=1)
+
+    n_refs = sum(len(v) for v in article_index.values())
+    print(f"✅ Lookup di {n_refs} riferimenti salvato in {ARTICLE_INDEX_FILE}")
+
+
+def save_chunks(chunks: Iterable[Dict]) -> int:
     """
     Salva i chunk in JSONL: una riga = un JSON { "id": ..., "text": ... }
+    Accetta anche un generatore: i chunk vengono scritti man mano che arrivano.
     """
     PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
+    n_chunks = 0
     with CHUNKS_JSONL.open("w", encoding="utf-8") as f:
         for c in chunks:
             f.write(json.dumps(c, ensure_ascii=False) + "\n")
+            n_chunks += 1
 
-    print(f"✅ {len(chunks)} chunk salvati in {CHUNKS_JSONL}")
+    print(f"✅ {n_chunks} chunk salvati in {CHUNKS_JSONL}")
+    return n_chunks
 
 
 def main():
+    # Lettura, normalizzazione, chunking e scrittura in streaming:
+    # la memoria usata non dipende dalla dimensione del corpus.
     print(f"Carico il testo da: {AI_ACT_RAW_FILE}")
-    text = load_ai_act_text()
-    print(f"Lunghezza testo (caratteri): {len(text)}")
-
-    print("Normalizzo whitespace…")
-    text = normalize_whitespace(text)
+    blocks = iter_text_blocks(AI_ACT_RAW_FILE)
 
-    print("Genero chunk…")
-    chunks = split_into_chunks(text)
-    print(f"Numero di chunk generati: {len(chunks)}")
+    print(f"Normalizzo whitespace, genero (strategia '{CHUNKING_STRATEGY}') e salvo i chunk…")
+    text_blocks = normalize_whitespace_stream(blocks)
+    if CHUNKING_STRATEGY == "structure":
+        chunks = iter_structured_chunks(text_blocks)
+    elif CHUNKING_STRATEGY == "tokens":
+        chunks = iter_chunks(text_blocks)
+    else:
+        raise ValueError(f"Strategia di chunking non supportata: {CHUNKING_STRATEGY}")
 
-    print("Salvo i chunk…")
-    save_chunks(chunks)
+    article_index: Dict[str, Dict[str, List[str]]] = {key: {} for key in ARTICLE_INDEX_KEYS}
+    save_chunks(track_article_index(chunks, article_index))
+    save_article_index(article_index)
 
 
 if __name__ == "__main__":
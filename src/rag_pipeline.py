@@ -1,9 +1,169 @@
 # src/rag_pipeline.py
 
-from typing import List, Tuple, Dict
+import re
+import time
+from typing import Iterator, List, Tuple, Dict, Optional
 
+from config import ARTICLE_ROUTING, RERANK_ENABLED, RERANK_CANDIDATES
+from context_packer import pack_contexts, token_budget
 from llm_base import LLMClient
-from retriever import retrieve_chunks
+from retriever import Retriever, get_retriever
+
+# Riferimenti espliciti nella domanda: "Article 50", "Art. 5(1)", "Articles 9 and 10",
+# "Articles 9 to 15", "Recital 27", "Annex III".
+# I numeri romani sono solo maiuscoli e devono finire a fine parola: altrimenti
+# "the annex in relation to..." o "the annex list" verrebbero letti come Annex I / LI.
+_NUMBER = r"(?:\d+|(?-i:[IVXLC]+))\b"
+_REFERENCE_RE = re.compile(
+    r"\b(articles?|art\.|recitals?|annex(?:es)?)\s+"
+    rf"({_NUMBER}(?:\(\w+\))*(?:\s*(?:,|and|or|to)\s*{_NUMBER}(?:\(\w+\))*)*)",
+    re.IGNORECASE,
+)
+_ROMAN_VALUES = {"I": 1, "V": 5, "X": 10, "L": 50, "C": 100}
+_ROMAN_SYMBOLS = [("C", 100), ("XC", 90), ("L", 50), ("XL", 40), ("X", 10), ("IX", 9), ("V", 5), ("IV", 4), ("I", 1)]
+# Riferimenti ad altri atti ("Article 16 TFEU", "Article 42 of Regulation (EU) 2018/1725"): non vanno risolti
+_OTHER_ACT_RE = re.compile(
+    r"\s*(?:of\s+(?:Regulation|Directive|Decision|the\s+Charter|the\s+Treaty)|TFEU|TEU)",
+    re.IGNORECASE,
+)
+_REFERENCE_KINDS = {"art": "article", "rec": "recital", "ann": "annex"}
+
+
+def _roman_to_int(numeral: str) -> int:
+    total = 0
+    for current, following in zip(numeral, numeral[1:] + " "):
+        value = _ROMAN_VALUES[current]
+        total += -value if value < _ROMAN_VALUES.get(following, 0) else value
+    return total
+
+
+def _int_to_roman(value: int) -> str:
+    numeral = ""
+    for symbol, amount in _ROMAN_SYMBOLS:
+        count, value = divmod(value, amount)
+        numeral += symbol * count
+    return numeral
+
+
+def _expand_range(first: str, last: str) -> List[str]:
+    """
+    Numeri dopo `first` fino a `last` compreso ("9 to 15", "I to III").
+    Estremi di tipo diverso o in ordine inverso: solo `last`.
+    """
+    if first.isdigit() and last.isdigit():
+        return [str(n) for n in range(int(first) + 1, int(last) + 1)] or [last]
+    if not first.isdigit() and not last.isdigit():
+        lo, hi = _roman_to_int(first), _roman_to_int(last)
+        return [_int_to_roman(n) for n in range(lo + 1, hi + 1)] or [last]
+    return [last]
+
+
+def _reference_numbers(text: str) -> List[str]:
+    """
+    Numeri di un elenco di riferimenti, con gli intervalli "X to Y" espansi.
+    """
+    numbers: List[str] = []
+    in_range = False
+    for token in re.findall(r"\d+|[IVXLC]+|(?i:\bto\b)", re.sub(r"\(\w+\)", "", text)):
+        if token.lower() == "to":
+            in_range = bool(numbers)
+        elif in_range:
+            numbers += _expand_range(numbers[-1], token)
+            in_range = False
+        else:
+            numbers.append(token)
+    return numbers
+
+
+def find_references(question: str) -> List[Tuple[str, str]]:
+    """
+    Estrae dalla domanda i riferimenti espliciti al Regolamento, come coppie
+    (tipo, numero): es. "What does Article 50 require?" → [("article", "50")].
+    """
+    references: List[Tuple[str, str]] = []
+    for m in _REFERENCE_RE.finditer(question):
+        if _OTHER_ACT_RE.match(question, m.end()):
+            continue
+        kind = _REFERENCE_KINDS[m.group(1)[:3].lower()]
+        for number in _reference_numbers(m.group(2)):
+            # Articoli e considerando hanno numeri arabi, gli allegati numeri romani
+            if (kind == "annex") != (not number.isdigit()):
+                continue
+            ref = (kind, number)
+            if ref not in references:
+                references.append(ref)
+    return references
+
+
+def _add_timing(timings: Optional[Dict[str, float]], stage: str, start: float):
+    """
+    Accumula in timings[stage] i secondi trascorsi da start (se timings è richiesto).
+    """
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def retrieve_contexts(
+    question: str,
+    top_k: int = 5,
+    retriever: Optional[Retriever] = None,
+    rerank: bool = RERANK_ENABLED,
+    timings: Optional[Dict[str, float]] = None,
+) -> List[Dict]:
+    """
+    Retrieval con router: se la domanda cita articoli / considerando / allegati
+    risolvibili, si usa il lookup in memoria; altrimenti la ricerca FAISS (o ibrida).
+    Con rerank=True si recuperano RERANK_CANDIDATES candidati e il cross-encoder
+    sceglie i top_k da passare all'LLM.
+    """
+    return retrieve_contexts_batch(
+        [question], top_k=top_k, retriever=retriever, rerank=rerank, timings=timings
+    )[0]
+
+
+def retrieve_contexts_batch(
+    questions: List[str],
+    top_k: int = 5,
+    retriever: Optional[Retriever] = None,
+    rerank: bool = RERANK_ENABLED,
+    timings: Optional[Dict[str, float]] = None,
+) -> List[List[Dict]]:
+    """
+    Come retrieve_contexts per più domande: quelle non risolte dal router
+    vengono cercate tutte insieme con una sola search_batch, e il re-ranking
+    (se attivo) valuta tutte le coppie con un solo passaggio del cross-encoder.
+    Se timings è un dict, vi vengono accumulati i secondi di "retrieval" e "rerank".
+    """
+    retriever = retriever or get_retriever()
+    pool = max(top_k, RERANK_CANDIDATES) if rerank else top_k
+    all_contexts: List[Optional[List[Dict]]] = [None] * len(questions)
+
+    start = time.perf_counter()
+    if ARTICLE_ROUTING:
+        for i, question in enumerate(questions):
+            contexts = retriever.lookup_references(find_references(question), top_k=pool)
+            if contexts:
+                all_contexts[i] = contexts
+
+    unresolved = [i for i, contexts in enumerate(all_contexts) if contexts is None]
+    if unresolved:
+        if len(unresolved) == 1:
+            # Una sola domanda: search() la accoda al micro-batcher, se attivo (servizio HTTP)
+            results = [retriever.search(questions[unresolved[0]], top_k=pool)]
+        else:
+            results = retriever.search_batch([questions[i] for i in unresolved], top_k=pool)
+        for i, res in zip(unresolved, results):
+            # res = lista di (score, chunk_dict); ci servono solo i chunk_dict
+            all_contexts[i] = [chunk for score, chunk in res]
+    _add_timing(timings, "retrieval", start)
+
+    if rerank:
+        start = time.perf_counter()
+        reranked = retriever.rerank_batch(questions, all_contexts, top_k=top_k)
+        all_contexts = [[chunk for score, chunk in res] for res in reranked]
+        _add_timing(timings, "rerank", start)
+
+    return all_contexts
 
 
 def build_rag_prompt(question: str, contexts: List[Dict]) -> str:
@@ -33,30 +193,92 @@ ANSWER (be precise, formal, and refer explicitly to the Regulation when relevant
     return prompt
 
 
+def prepare_prompt(
+    llm: LLMClient,
+    question: str,
+    contexts: List[Dict],
+) -> Tuple[str, List[Dict]]:
+    """
+    Prepara l'input per l'LLM a partire dai chunk recuperati (in ordine di score):
+    i chunk vengono impacchettati nel budget di token del modello, unendo quelli
+    adiacenti senza ripeterne l'overlap.
+    Restituisce (prompt, contesti effettivamente inseriti nel prompt).
+    """
+    packed = pack_contexts(contexts, token_budget(getattr(llm, "model_name", None)))
+    return build_rag_prompt(question, packed), packed
+
+
 def answer_question(
     llm: LLMClient,
     question: str,
     top_k: int = 5,
+    retriever: Optional[Retriever] = None,
+    contexts: Optional[List[Dict]] = None,
+    rerank: bool = RERANK_ENABLED,
+    timings: Optional[Dict[str, float]] = None,
 ) -> Tuple[str, List[Dict]]:
     """
     Pipeline RAG:
-    1. retrieval dei top_k chunk più rilevanti
+    1. retrieval dei top_k chunk più rilevanti (lookup diretto se la domanda cita un articolo,
+       eventualmente ri-ordinati dal cross-encoder se rerank=True)
     2. costruzione del prompt
     3. chiamata al modello LLM
     4. restituisce (risposta, contesti usati)
-    """
-    results = retrieve_chunks(question, top_k=top_k)
 
-    # results = lista di (score, chunk_dict); ci servono solo i chunk_dict
-    contexts = [chunk for score, chunk in results]
+    Se retriever non è passato si usa quello condiviso del processo (get_retriever()).
+    Se contexts è passato (chunk già recuperati, es. in batch) il retrieval viene saltato.
+    Se timings è un dict, vi vengono scritti i secondi di "retrieval", "rerank" e "generation".
+    """
+    if contexts is None:
+        contexts = retrieve_contexts(
+            question, top_k=top_k, retriever=retriever, rerank=rerank, timings=timings
+        )
 
-    prompt = build_rag_prompt(question, contexts)
+    prompt, contexts = prepare_prompt(llm, question, contexts)
 
+    start = time.perf_counter()
     answer = llm.generate(prompt)
+    _add_timing(timings, "generation", start)
 
     return answer, contexts
 
 
+def answer_question_stream(
+    llm: LLMClient,
+    question: str,
+    top_k: int = 5,
+    retriever: Optional[Retriever] = None,
+    contexts: Optional[List[Dict]] = None,
+    rerank: bool = RERANK_ENABLED,
+    timings: Optional[Dict[str, float]] = None,
+) -> Tuple[Iterator[str], List[Dict]]:
+    """
+    Come answer_question, ma la risposta arriva in streaming:
+    restituisce (iteratore dei delta di testo, contesti usati).
+    Retrieval e prompt vengono preparati subito; la generazione parte quando
+    si inizia a consumare l'iteratore. In timings vanno anche i secondi fino al
+    primo delta ("first_token").
+    """
+    if contexts is None:
+        contexts = retrieve_contexts(
+            question, top_k=top_k, retriever=retriever, rerank=rerank, timings=timings
+        )
+
+    prompt, contexts = prepare_prompt(llm, question, contexts)
+
+    def deltas() -> Iterator[str]:
+        start = time.perf_counter()
+        first = True
+        for delta in llm.generate_stream(prompt):
+            if first:
+                _add_timing(timings, "first_token", start)
+                first = False
+            yield delta
+        _add_timing(timings, "generation", start)
+
+    return deltas(), contexts
+
+
 def main():
     # Usiamo OpenAI come primo LLM
     from llm_openai import OpenAILLMClient
@@ -64,19 +286,26 @@ def main():
     llm = OpenAILLMClient(model_name="gpt-4o-mini")
 
     question = "What are the main obligations for providers of high-risk AI systems under this Regulation?"
-    answer, contexts = answer_question(llm, question, top_k=5)
+    timings: Dict[str, float] = {}
+    deltas, contexts = answer_question_stream(llm, question, top_k=5, timings=timings)
 
     print("QUESTION:")
     print(question)
     print("\nANSWER:")
 
-    print(answer)
+    for delta in deltas:
+        print(delta, end="", flush=True)
+    print()
 
     print("\n--- CONTEXTS USED ---")
     for i, c in enumerate(contexts):
         print(f"\n[CONTEXT {i}] ID={c['id']}")
         print(c["text"][:400], "...")
 
+    print("\n--- LATENZA ---")
+    for stage, seconds in timings.items():
+        print(f"{stage:>10}: {seconds * 1000:8.1f} ms")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,254 @@
+# src/ragas_judges.py
+#
+# Giudici intercambiabili per run_ragas.py. Ogni giudice calcola una metrica
+# (answer_relevancy, context_precision, context_recall, faithfulness) su una
+# lista di campioni e ha un'identità che entra nella chiave dei punteggi:
+#   - "openai": RAGAS con ChatOpenAI + OpenAIEmbeddings (cache su disco delle chiamate)
+#   - "local" : euristiche deterministiche sugli embeddings locali (EMBEDDING_MODEL_NAME),
+#               nessuna chiamata di rete; pensato per la CI offline e per i confronti
+#               rapidi, non sostituisce i numeri del giudice LLM.
+
+import os
+
+# ⚠️ Importantissimo: settiamo questa variabile PRIMA di importare ragas/git
+os.environ["GIT_PYTHON_REFRESH"] = "quiet"
+
+import re
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_MODEL_NAME,
+    LOCAL_JUDGE_SUPPORT_THRESHOLD,
+    RAGAS_JUDGE_MODEL,
+    RAGAS_JUDGE_EMBEDDING_MODEL,
+    RAGAS_LLM_CACHE_FILE,
+    RAGAS_EMBEDDING_CACHE_DIR,
+)
+
+METRIC_NAMES = ["answer_relevancy", "context_precision", "context_recall", "faithfulness"]
+
+JUDGES = ["openai", "local"]
+
+
+class Judge(ABC):
+    """
+    Calcola i punteggi di una metrica RAGAS per una lista di campioni
+    (dict con question, answer, contexts, ground_truth).
+    """
+
+    # Suffisso dei file delle medie: i punteggi di giudici diversi non si sovrascrivono
+    output_suffix = ""
+
+    @abstractmethod
+    def identity(self) -> Dict:
+        pass
+
+    @abstractmethod
+    def score(self, metric_name: str, samples: List[Dict]) -> List[float]:
+        pass
+
+
+class RagasJudge(Judge):
+    """
+    RAGAS con GPT come LLM giudice. Le chiamate all'LLM passano dalla cache SQLite
+    di langchain, gli embeddings da CacheBackedEmbeddings (entrambe sotto cache_dir).
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.llm_cache_file = cache_dir / RAGAS_LLM_CACHE_FILE.name if cache_dir else RAGAS_LLM_CACHE_FILE
+        self.embedding_cache_dir = (
+            cache_dir / RAGAS_EMBEDDING_CACHE_DIR.name if cache_dir else RAGAS_EMBEDDING_CACHE_DIR
+        )
+        self._llm = None
+        self._embeddings = None
+
+    def identity(self) -> Dict:
+        import ragas
+
+        return {
+            "llm": RAGAS_JUDGE_MODEL,
+            "embeddings": RAGAS_JUDGE_EMBEDDING_MODEL,
+            "ragas": ragas.__version__,
+        }
+
+    def _setup(self):
+        from langchain.embeddings import CacheBackedEmbeddings
+        from langchain.storage import LocalFileStore
+        from langchain_community.cache import SQLiteCache
+        from langchain_core.globals import set_llm_cache
+        from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+        self.llm_cache_file.parent.mkdir(parents=True, exist_ok=True)
+        set_llm_cache(SQLiteCache(database_path=str(self.llm_cache_file)))
+
+        self._llm = ChatOpenAI(model=RAGAS_JUDGE_MODEL, temperature=0.0)
+        self._embeddings = CacheBackedEmbeddings.from_bytes_store(
+            OpenAIEmbeddings(model=RAGAS_JUDGE_EMBEDDING_MODEL),
+            LocalFileStore(str(self.embedding_cache_dir)),
+            namespace=RAGAS_JUDGE_EMBEDDING_MODEL,
+            query_embedding_cache=True,
+        )
+
+    def score(self, metric_name: str, samples: List[Dict]) -> List[float]:
+        from datasets import Dataset
+        from ragas import evaluate
+        from ragas import metrics as ragas_metrics
+
+        if self._llm is None:
+            self._setup()
+        result = evaluate(
+            dataset=Dataset.from_list(samples),
+            metrics=[getattr(ragas_metrics, metric_name)],
+            llm=self._llm,
+            embeddings=self._embeddings,
+        )
+        return [float(v) for v in result.to_pandas()[metric_name]]
+
+
+# Frasi: si spezza dopo la punteggiatura forte o sugli a capo
+_SENTENCE_RE = re.compile(r"(?<=[.!?;:])\s+|\n+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Frasi di almeno 3 parole; se non ce ne sono, il testo intero (se non vuoto).
+    """
+    sentences = [s.strip() for s in _SENTENCE_RE.split(text or "")]
+    sentences = [s for s in sentences if len(s.split()) >= 3]
+    if not sentences and (text or "").strip():
+        sentences = [text.strip()]
+    return sentences
+
+
+class LocalJudge(Judge):
+    """
+    Giudice offline e deterministico: niente LLM, solo similarità coseno tra
+    embeddings locali (con la cache persistente degli embeddings).
+    Una frase è "supportata" se la frase più simile dell'altro testo supera
+    LOCAL_JUDGE_SUPPORT_THRESHOLD.
+      - answer_relevancy : similarità domanda–risposta
+      - faithfulness     : frazione di frasi della risposta supportate dai contesti
+      - context_recall   : frazione di frasi della risposta gold supportate dai contesti
+      - context_precision: average precision dei contesti, rilevante = supporta la risposta gold
+    """
+
+    output_suffix = "_local"
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        threshold: float = LOCAL_JUDGE_SUPPORT_THRESHOLD,
+    ):
+        from embedding_cache import EmbeddingCache
+
+        self.model_name = model_name
+        self.threshold = threshold
+        self.cache = EmbeddingCache(
+            model_name, cache_dir / EMBEDDING_CACHE_DIR.name if cache_dir else EMBEDDING_CACHE_DIR
+        )
+        self._model = None
+
+    def identity(self) -> Dict:
+        return {"judge": "local", "embeddings": self.model_name, "threshold": self.threshold}
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+
+            print(f"Carico modello di embeddings per il giudice locale: {self.model_name}")
+            self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model.encode(texts, batch_size=EMBEDDING_BATCH_SIZE, show_progress_bar=False)
+
+    def _embed_all(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Embeddings normalizzati di tutti i testi, calcolati in un solo passaggio.
+        """
+        unique = list(dict.fromkeys(texts))
+        if not unique:
+            return {}
+        vectors = self.cache.encode(unique, self._encode)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return dict(zip(unique, vectors))
+
+    def _support(self, claims: np.ndarray, evidence: np.ndarray) -> np.ndarray:
+        """
+        Per ogni riga di `claims`, True se una riga di `evidence` è abbastanza simile.
+        """
+        if not len(claims) or not len(evidence):
+            return np.zeros(len(claims), dtype=bool)
+        return (claims @ evidence.T).max(axis=1) >= self.threshold
+
+    def score(self, metric_name: str, samples: List[Dict]) -> List[float]:
+        if metric_name not in METRIC_NAMES:
+            raise ValueError(f"Metrica non supportata dal giudice locale: {metric_name}")
+
+        # Frasi di ogni campione, poi un solo encode per tutte
+        split = [
+            {
+                "answer": split_sentences(s["answer"]),
+                "ground_truth": split_sentences(s["ground_truth"]),
+                "contexts": [split_sentences(c) for c in s["contexts"]],
+            }
+            for s in samples
+        ]
+        texts: List[str] = []
+        for s, parts in zip(samples, split):
+            if metric_name == "answer_relevancy":
+                texts += [s["question"], s["answer"]]
+            else:
+                texts += parts["answer"] + parts["ground_truth"]
+                texts += [sentence for context in parts["contexts"] for sentence in context]
+        vectors = self._embed_all([t for t in texts if t.strip()])
+        dim = next(iter(vectors.values())).shape[0] if vectors else 0
+
+        def matrix(sentences: List[str]) -> np.ndarray:
+            if not sentences:
+                return np.zeros((0, dim), dtype="float32")
+            return np.stack([vectors[t] for t in sentences])
+
+        scores = []
+        for s, parts in zip(samples, split):
+            if metric_name == "answer_relevancy":
+                if not s["answer"].strip():
+                    scores.append(0.0)
+                    continue
+                similarity = float(vectors[s["question"]] @ vectors[s["answer"]])
+                scores.append(max(0.0, similarity))
+                continue
+
+            context_matrices = [matrix(c) for c in parts["contexts"]]
+            all_contexts = np.concatenate(context_matrices) if context_matrices else matrix([])
+
+            if metric_name == "faithfulness":
+                supported = self._support(matrix(parts["answer"]), all_contexts)
+                scores.append(float(supported.mean()) if len(supported) else 0.0)
+            elif metric_name == "context_recall":
+                supported = self._support(matrix(parts["ground_truth"]), all_contexts)
+                scores.append(float(supported.mean()) if len(supported) else 0.0)
+            else:
+                reference = matrix(parts["ground_truth"])
+                relevant = np.array([self._support(c, reference).any() for c in context_matrices], dtype=float)
+                if not relevant.sum():
+                    scores.append(0.0)
+                    continue
+                precision_at_k = np.cumsum(relevant) / np.arange(1, len(relevant) + 1)
+                scores.append(float((precision_at_k * relevant).sum() / relevant.sum()))
+        return scores
+
+
+def make_judge(name: str, cache_dir: Optional[Path] = None) -> Judge:
+    """
+    Giudice per nome ("openai" o "local"); cache_dir sostituisce le cartelle di cache di default.
+    """
+    if name == "openai":
+        return RagasJudge(cache_dir)
+    if name == "local":
+        return LocalJudge(cache_dir)
+    raise ValueError(f"Giudice non supportato: {name} (disponibili: {', '.join(JUDGES)})")
@@ -1,46 +1,93 @@
 # src/retriever.py
 
 import json
-from typing import List, Dict, Tuple
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from typing import List, Dict, Tuple, Optional
 
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
+from sentence_transformers import CrossEncoder, SentenceTransformer
 
 from config import (
-    FAISS_INDEX_FILE,
-    CHUNKS_METADATA_FILE,
+    ARTICLE_INDEX_FILE,
     EMBEDDING_MODEL_NAME,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_QUERY_CACHE_DIR,
+    EMBEDDING_QUERY_CACHE_MAX_ROWS,
+    HNSW_EF_SEARCH,
+    IVF_NPROBE,
+    RETRIEVAL_MODE,
+    RRF_K,
+    HYBRID_CANDIDATES,
+    RERANKER_MODEL_NAME,
+    RERANK_TOP_K,
+    RERANK_BATCH_SIZE,
+    RERANK_CACHE_MAX_ENTRIES,
+    QUERY_BATCH_WINDOW_MS,
+    QUERY_BATCH_MAX_SIZE,
 )
+from artifacts import ManifestMismatchError
+from chunk_store import ChunkStore, load_chunk_store
+from embedding_cache import EmbeddingCache, text_hash
+from sparse_index import SparseIndex, load_sparse_index
+from vector_store import Generation, current_generation
 
 
-def load_metadata() -> List[Dict]:
+def load_article_index(chunks: ChunkStore) -> Dict[str, Dict[str, List[str]]]:
     """
-    Carica i chunk (id + text) dal file metadata.
+    Carica il lookup articolo/considerando/allegato → id dei chunk generato da
+    prepare_corpus.py. Se manca, lo ricava dai campi della metadata.
     """
-    chunks = []
-    with CHUNKS_METADATA_FILE.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            data = json.loads(line)
-            chunks.append(data)
-    print(f"Caricati {len(chunks)} chunk di metadata.")
-    return chunks
+    if ARTICLE_INDEX_FILE.exists():
+        with ARTICLE_INDEX_FILE.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    article_index: Dict[str, Dict[str, List[str]]] = {}
+    for ch in (chunks.meta(row) for row in range(len(chunks))):
+        for key in ("article", "recital", "annex"):
+            if key in ch:
+                article_index.setdefault(key, {}).setdefault(str(ch[key]), []).append(ch["id"])
+    return article_index
 
 
-def load_faiss_index() -> faiss.IndexFlatIP:
+def load_faiss_index(generation: Optional[Generation] = None) -> faiss.Index:
     """
-    Carica l'indice FAISS da disco.
+    Carica l'indice FAISS della generazione (di default quella attiva del vector store).
     """
-    if not FAISS_INDEX_FILE.exists():
-        raise FileNotFoundError(f"Indice FAISS non trovato: {FAISS_INDEX_FILE}")
-    index = faiss.read_index(str(FAISS_INDEX_FILE))
+    generation = generation or current_generation()
+    if not generation.index_file.exists():
+        raise FileNotFoundError(f"Indice FAISS non trovato: {generation.index_file}")
+    index = faiss.read_index(str(generation.index_file))
+    if index.ntotal != generation.n_chunks:
+        raise ManifestMismatchError(
+            f"{generation.index_file} ha {index.ntotal} vettori, il manifest ne registra {generation.n_chunks}"
+        )
+    configure_search(index)
     print(f"Indice FAISS caricato. Numero vettori: {index.ntotal}")
     return index
 
 
+def configure_search(
+    index: faiss.Index,
+    ef_search: int = HNSW_EF_SEARCH,
+    nprobe: int = IVF_NPROBE,
+):
+    """
+    Imposta i parametri di ricerca in base al tipo di indice su disco
+    (efSearch per HNSW, nprobe per IVF); per l'indice flat non c'è nulla da fare.
+    """
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    params = faiss.ParameterSpace()
+    if isinstance(base, faiss.IndexHNSW):
+        params.set_index_parameter(index, "efSearch", ef_search)
+    elif isinstance(base, faiss.IndexIVF):
+        params.set_index_parameter(index, "nprobe", nprobe)
+
+
 def load_embedding_model() -> SentenceTransformer:
     """
     Carica il modello di embeddings (stesso usato per creare l'indice).
@@ -50,6 +97,448 @@ def load_embedding_model() -> SentenceTransformer:
     return model
 
 
+class Reranker:
+    """
+    Cross-encoder su CPU che ri-valuta coppie (domanda, chunk).
+    Gli score vengono tenuti in una cache LRU in memoria indicizzata per
+    (hash della domanda, id del chunk): rieseguire le stesse domande
+    (es. più modelli sullo stesso dataset) non richiama il modello.
+    """
+
+    def __init__(
+        self,
+        model_name: str = RERANKER_MODEL_NAME,
+        batch_size: int = RERANK_BATCH_SIZE,
+        max_cache_entries: int = RERANK_CACHE_MAX_ENTRIES,
+    ):
+        print(f"Carico cross-encoder per il re-ranking: {model_name}")
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = batch_size
+        self.max_cache_entries = max_cache_entries
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def score_batch(self, queries: List[str], chunk_lists: List[List[Dict]]) -> List[List[float]]:
+        """
+        Score di rilevanza per ogni (domanda, chunk), una lista per domanda.
+        Tutte le coppie non in cache, di tutte le domande, vanno in un'unica predict().
+        """
+        keys = [
+            [(text_hash(query), ch["id"]) for ch in chunks]
+            for query, chunks in zip(queries, chunk_lists)
+        ]
+
+        known: Dict[Tuple[str, str], float] = {}
+        missing: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        with self._lock:
+            for query, chunks, query_keys in zip(queries, chunk_lists, keys):
+                for ch, key in zip(chunks, query_keys):
+                    if key in known or key in missing:
+                        continue
+                    if key in self._cache:
+                        self._cache.move_to_end(key)
+                        known[key] = self._cache[key]
+                        self.hits += 1
+                    else:
+                        missing[key] = (query, ch["text"])
+                        self.misses += 1
+
+        if missing:
+            scores = self.model.predict(
+                list(missing.values()),
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            computed = {key: float(score) for key, score in zip(missing, scores)}
+            known.update(computed)
+            with self._lock:
+                self._cache.update(computed)
+                while len(self._cache) > self.max_cache_entries:
+                    self._cache.popitem(last=False)
+
+        return [[known[key] for key in query_keys] for query_keys in keys]
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+class Retriever:
+    """
+    Retriever persistente: apre una sola volta lo store dei chunk (in mmap),
+    l'indice FAISS, l'indice BM25 (in modalità "hybrid") e il modello di embeddings
+    e li tiene in memoria per tutte le query successive.
+    Va ottenuto tramite get_retriever() per condividere la stessa istanza.
+    """
+
+    def __init__(self, mode: str = RETRIEVAL_MODE):
+        if mode not in ("dense", "hybrid"):
+            raise ValueError(f"Modalità di retrieval non supportata: {mode}")
+
+        # Store dei chunk e indice vengono dalla stessa generazione del vector store.
+        # L'indice restituisce i faiss_id dei vettori: lo store li risolve con una
+        # ricerca binaria, leggendo dal disco (mmap) solo i chunk restituiti
+        generation = current_generation()
+        self.chunks = load_chunk_store(generation)
+        self.article_index = load_article_index(self.chunks)
+        self.index = load_faiss_index(generation)
+        self.sparse_index: Optional[SparseIndex] = None
+        if mode == "hybrid":
+            # None se l'indice BM25 manca o non è della generazione caricata: solo FAISS
+            self.sparse_index = load_sparse_index(generation)
+        self.mode = "hybrid" if self.sparse_index is not None else "dense"
+        self.model = load_embedding_model()
+        # Le query hanno una cache a parte: senza fsync nel percorso della richiesta e limitata
+        self.embedding_cache = EmbeddingCache(
+            EMBEDDING_MODEL_NAME,
+            EMBEDDING_QUERY_CACHE_DIR,
+            durable=False,
+            max_rows=EMBEDDING_QUERY_CACHE_MAX_ROWS,
+        )
+        # Il cross-encoder viene caricato solo alla prima richiesta di re-ranking
+        self._reranker: Optional[Reranker] = None
+        self._reranker_lock = threading.Lock()
+        # Se attivo (enable_batching), search() passa dal micro-batcher
+        self.batcher: Optional[QueryBatcher] = None
+
+    def enable_batching(
+        self,
+        window_ms: float = QUERY_BATCH_WINDOW_MS,
+        max_batch_size: int = QUERY_BATCH_MAX_SIZE,
+    ) -> "QueryBatcher":
+        """
+        Attiva il micro-batching: le search() concorrenti di più thread vengono
+        raccolte e risolte con un'unica search_batch.
+        """
+        if self.batcher is None:
+            self.batcher = QueryBatcher(self, window_ms=window_ms, max_batch_size=max_batch_size)
+        return self.batcher
+
+    def disable_batching(self):
+        """
+        Disattiva il micro-batching: le search() successive tornano dirette.
+        Il batcher viene staccato prima di chiuderlo, così nessuna nuova query
+        finisce in una coda che non verrà più servita.
+        """
+        batcher, self.batcher = self.batcher, None
+        if batcher is not None:
+            batcher.close()
+
+    @property
+    def reranker(self) -> Reranker:
+        if self._reranker is None:
+            with self._reranker_lock:
+                if self._reranker is None:
+                    self._reranker = Reranker()
+        return self._reranker
+
+    def _encode(self, queries: List[str], batch_size: int = EMBEDDING_BATCH_SIZE) -> np.ndarray:
+        """
+        Calcola gli embeddings normalizzati (norma 1) di una lista di query,
+        con un'unica chiamata a encode() per le query non ancora in cache.
+        """
+        embeddings = self.embedding_cache.encode(
+            queries,
+            lambda missing: self.model.encode(missing, batch_size=batch_size, convert_to_numpy=True),
+        )
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        faiss.normalize_L2(embeddings)
+        return embeddings
+
+    def _collect(self, distances: np.ndarray, indices: np.ndarray) -> List[Tuple[float, Dict]]:
+        """
+        Converte una riga di risultati FAISS in una lista di (score, chunk_dict).
+        """
+        results: List[Tuple[float, Dict]] = []
+        for score, idx in zip(distances, indices):
+            if idx == -1:
+                continue  # nessun risultato
+            chunk = self.chunks.get_by_faiss_id(int(idx))
+            # Vettore senza metadata (generazione modificata a mano): lo saltiamo
+            if chunk is not None:
+                results.append((float(score), chunk))
+        return results
+
+    def _fuse(
+        self,
+        dense_ids: np.ndarray,
+        sparse_results: List[Tuple[float, int]],
+        top_k: int,
+    ) -> List[Tuple[float, Dict]]:
+        """
+        Reciprocal rank fusion dei candidati FAISS e BM25 di una query:
+        score = Σ 1 / (RRF_K + rank). Restituisce i top_k come (score RRF, chunk_dict).
+        """
+        fused: Dict[int, float] = {}
+        dense_ranked = [int(idx) for idx in dense_ids if idx != -1]
+        sparse_ranked = [faiss_id for _, faiss_id in sparse_results]
+        for ranked in (dense_ranked, sparse_ranked):
+            for rank, faiss_id in enumerate(ranked, start=1):
+                fused[faiss_id] = fused.get(faiss_id, 0.0) + 1.0 / (RRF_K + rank)
+
+        results: List[Tuple[float, Dict]] = []
+        for faiss_id, score in sorted(fused.items(), key=lambda kv: kv[1], reverse=True):
+            # FAISS, BM25 e store sono della stessa generazione (load_sparse_index): None solo se alterati
+            chunk = self.chunks.get_by_faiss_id(faiss_id)
+            if chunk is not None:
+                results.append((score, chunk))
+            if len(results) == top_k:
+                break
+        return results
+
+    def lookup_references(self, references: List[Tuple[str, str]], top_k: int = 5) -> List[Dict]:
+        """
+        Risolve riferimenti espliciti, es. [("article", "50"), ("annex", "III")],
+        tramite il lookup in memoria (nessun embedding, nessuna ricerca FAISS).
+        Restituisce al massimo top_k chunk, nell'ordine dei riferimenti e del testo.
+        """
+        contexts: List[Dict] = []
+        seen = set()
+        for kind, number in references:
+            for chunk_id in self.article_index.get(kind, {}).get(number, []):
+                chunk = self.chunks.get_by_id(chunk_id)
+                # Il lookup può essere più recente del vector store: ignoriamo id sconosciuti
+                if chunk is None or chunk_id in seen:
+                    continue
+                seen.add(chunk_id)
+                contexts.append(chunk)
+        return contexts[:top_k]
+
+    def rerank(
+        self,
+        query: str,
+        chunks: List[Dict],
+        top_k: int = RERANK_TOP_K,
+    ) -> List[Tuple[float, Dict]]:
+        """
+        Ri-ordina i chunk candidati con il cross-encoder e restituisce i top_k
+        come (score cross-encoder, chunk_dict).
+        """
+        return self.rerank_batch([query], [chunks], top_k=top_k)[0]
+
+    def rerank_batch(
+        self,
+        queries: List[str],
+        chunk_lists: List[List[Dict]],
+        top_k: int = RERANK_TOP_K,
+    ) -> List[List[Tuple[float, Dict]]]:
+        """
+        Come rerank(), per più domande con un solo passaggio batch del cross-encoder.
+        """
+        if not queries:
+            return []
+        all_scores = self.reranker.score_batch(queries, chunk_lists)
+        results = []
+        for chunks, scores in zip(chunk_lists, all_scores):
+            ranked = sorted(zip(scores, chunks), key=lambda pair: pair[0], reverse=True)
+            results.append(ranked[:top_k])
+        return results
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[float, Dict]]:
+        """
+        Restituisce i top_k chunk più simili alla query, come (score, chunk_dict).
+        In modalità "hybrid" lo score è quello della reciprocal rank fusion.
+        Con il micro-batching attivo la query viene accodata a quelle concorrenti.
+        """
+        batcher = self.batcher
+        if batcher is not None:
+            try:
+                return batcher.search(query, top_k=top_k)
+            except BatcherClosedError:
+                pass  # batcher chiuso nel frattempo: si cerca direttamente
+        return self.search_batch([query], top_k=top_k)[0]
+
+    def search_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+    ) -> List[List[Tuple[float, Dict]]]:
+        """
+        Come search(), ma per più query: una lista di risultati per ogni query,
+        nello stesso ordine delle query in input.
+        Tutte le query vengono codificate insieme e cercate con una sola
+        index.search sulla matrice degli embeddings; in modalità "hybrid" i
+        candidati FAISS vengono fusi con quelli BM25 di ciascuna query.
+        """
+        if not queries:
+            return []
+        query_embeddings = self._encode(list(queries), batch_size=batch_size)
+
+        if self.sparse_index is None:
+            distances, indices = self.index.search(query_embeddings, top_k)
+            return [self._collect(d, i) for d, i in zip(distances, indices)]
+
+        n_candidates = max(top_k, HYBRID_CANDIDATES)
+        _, indices = self.index.search(query_embeddings, n_candidates)
+        return [
+            self._fuse(dense_ids, self.sparse_index.search(query, top_k=n_candidates), top_k)
+            for query, dense_ids in zip(queries, indices)
+        ]
+
+
+class BatcherClosedError(RuntimeError):
+    """
+    Query inviata a un QueryBatcher già chiuso.
+    """
+
+
+class QueryBatcher:
+    """
+    Coalescer delle query concorrenti: un thread dedicato raccoglie le query che
+    arrivano entro window_ms dalla prima (o fino a max_batch_size), le codifica e
+    cerca con una sola search_batch e risolve il Future di ciascun chiamante.
+    Tiene le statistiche sulle dimensioni dei batch ottenuti.
+    """
+
+    def __init__(
+        self,
+        retriever: Retriever,
+        window_ms: float = QUERY_BATCH_WINDOW_MS,
+        max_batch_size: int = QUERY_BATCH_MAX_SIZE,
+    ):
+        self.retriever = retriever
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue: "queue.Queue[Optional[Tuple[str, int, Future]]]" = queue.Queue()
+        # closed e l'accodamento sono protetti dallo stesso lock: nessuna query
+        # può finire in coda dopo il segnale di stop
+        self._closed = False
+        self._submit_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batch_sizes: Counter = Counter()
+        self._thread = threading.Thread(target=self._loop, name="query-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, query: str, top_k: int = 5) -> Future:
+        """
+        Accoda una query; il Future restituisce la lista di (score, chunk_dict).
+        """
+        future: Future = Future()
+        with self._submit_lock:
+            if self._closed:
+                future.set_exception(BatcherClosedError("QueryBatcher chiuso"))
+            else:
+                self._queue.put((query, top_k, future))
+        return future
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[float, Dict]]:
+        return self.submit(query, top_k).result()
+
+    def _collect_batch(self, first: Tuple[str, int, Future]) -> Tuple[List[Tuple[str, int, Future]], bool]:
+        """
+        Raccoglie le query che arrivano entro la finestra. Restituisce (batch, stop).
+        """
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run_batch(self, batch: List[Tuple[str, int, Future]]):
+        # Le query con lo stesso top_k vanno in un'unica search_batch (di solito tutte)
+        by_top_k: Dict[int, List[Tuple[str, Future]]] = {}
+        for query, top_k, future in batch:
+            by_top_k.setdefault(top_k, []).append((query, future))
+
+        for top_k, items in by_top_k.items():
+            try:
+                results = self.retriever.search_batch([q for q, _ in items], top_k=top_k)
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(items, results):
+                future.set_result(result)
+
+        with self._stats_lock:
+            self.batch_sizes[len(batch)] += 1
+
+    def _loop(self):
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stop = self._collect_batch(first)
+            self._run_batch(batch)
+
+    def close(self):
+        """
+        Ferma il thread dopo aver servito le query già accodate; le query che
+        dovessero restare in coda falliscono con BatcherClosedError.
+        """
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[2].set_exception(BatcherClosedError("QueryBatcher chiuso"))
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            sizes = dict(sorted(self.batch_sizes.items()))
+        batches = sum(sizes.values())
+        queries = sum(size * count for size, count in sizes.items())
+        return {
+            "batches": batches,
+            "queries": queries,
+            "mean_batch_size": queries / batches if batches else 0.0,
+            "max_batch_size": max(sizes, default=0),
+            "batch_size_histogram": sizes,
+        }
+
+
+_retriever: Optional[Retriever] = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever() -> Retriever:
+    """
+    Restituisce il Retriever condiviso dal processo, creandolo alla prima chiamata.
+    Thread-safe: anche con più thread concorrenti le risorse vengono caricate una volta sola.
+    """
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = Retriever()
+    return _retriever
+
+
+def reset_retriever():
+    """
+    Scarta il Retriever condiviso (es. dopo aver ricostruito l'indice):
+    la prossima get_retriever() ricaricherà tutto da disco.
+    """
+    global _retriever
+    with _retriever_lock:
+        _retriever = None
+
+
 def retrieve_chunks(
     query: str,
     top_k: int = 5,
@@ -57,32 +546,21 @@ def retrieve_chunks(
     """
     Data una query testuale, restituisce i top_k chunk più simili.
     Ritorna una lista di tuple (score, chunk_dict).
+    Usa il Retriever condiviso: modello e indice vengono caricati solo alla prima query.
     """
-    # Carichiamo risorse (in un sistema reale le terremo in RAM, qui è ok ricaricarle per test)
-    chunks = load_metadata()
-    index = load_faiss_index()
-    model = load_embedding_model()
-
-    # Embedding della query
-    query_embedding = model.encode(query, convert_to_numpy=True)
-    query_embedding = np.expand_dims(query_embedding, axis=0)
-    faiss.normalize_L2(query_embedding)
-
-    # Ricerca nell'indice
-    distances, indices = index.search(query_embedding, top_k)
-    distances = distances[0]
-    indices = indices[0]
+    return get_retriever().search(query, top_k=top_k)
 
-    results: List[Tuple[float, Dict]] = []
 
-    for score, idx in zip(distances, indices):
-        if idx == -1:
-            continue  # nessun risultato
-        # idx è l'indice del vettore; coincide con l'ordine dei chunk
-        chunk = chunks[idx]
-        results.append((float(score), chunk))
-
-    return results
+def retrieve_chunks_batch(
+    queries: List[str],
+    top_k: int = 5,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+) -> List[List[Tuple[float, Dict]]]:
+    """
+    Versione batch di retrieve_chunks: un solo encode e una sola ricerca FAISS
+    per tutte le query. Restituisce una lista di risultati per query, in ordine.
+    """
+    return get_retriever().search_batch(queries, top_k=top_k, batch_size=batch_size)
 
 
 def main():
@@ -1,85 +1,10 @@
 # src/run_claude_experiment.py
+#
+# Mantenuto per compatibilità: equivale a `python run_experiment.py --model claude`.
 
-import json
-from typing import List, Dict
-
-from dotenv import load_dotenv
-
-from config import PROJECT_ROOT
-from rag_pipeline import answer_question
-from llm_claude import ClaudeLLMClient
-
-load_dotenv()
-
-EVAL_FILE = PROJECT_ROOT / "data" / "eval" / "ai_act_eval.jsonl"
-RESULTS_FILE = PROJECT_ROOT / "data" / "eval" / "results_claude_sonnet.jsonl"
-
-
-def load_eval_dataset() -> List[Dict]:
-    """
-    Carica il dataset di valutazione (domande + risposta gold).
-    Ogni riga del JSONL deve avere almeno:
-      - question
-      - answer
-    """
-    if not EVAL_FILE.exists():
-        raise FileNotFoundError(f"File di valutazione non trovato: {EVAL_FILE}")
-
-    examples = []
-    with EVAL_FILE.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            data = json.loads(line)
-            examples.append(data)
-
-    print(f"Caricati {len(examples)} esempi di valutazione.")
-    return examples
-
-
-def main():
-    # 1) Carica dataset
-    eval_examples = load_eval_dataset()
-
-    # 2) Inizializza LLM Claude
-    llm = ClaudeLLMClient(model_name="claude-sonnet-4-5")
-
-    # 3) Per ogni domanda, esegui la pipeline RAG
-    RESULTS_FILE.parent.mkdir(parents=True, exist_ok=True)
-
-    with RESULTS_FILE.open("w", encoding="utf-8") as f_out:
-        for idx, ex in enumerate(eval_examples, start=1):
-            qid = idx
-            question = ex["question"]
-            gold_answer = ex["answer"]
-
-            print(f"\n=== CLAUDE – ESEMPIO {qid} ===")
-            print(f"Q: {question}")
-
-            try:
-                model_answer, contexts = answer_question(llm, question, top_k=5)
-            except Exception as e:
-                print(f"Errore durante la generazione per id={qid}: {e}")
-                model_answer = ""
-                contexts = []
-
-            record = {
-                "id": qid,
-                "question": question,
-                "gold_answer": gold_answer,
-                "model_answer": model_answer,
-                "contexts": [c["text"] for c in contexts],
-            }
-
-            f_out.write(json.dumps(record, ensure_ascii=False) + "\n")
-
-            print("Claude answer:")
-            print(model_answer[:400], "...")
-            print("-" * 60)
-
-    print(f"\n✅ Risultati Claude salvati in: {RESULTS_FILE}")
+import sys
 
+from run_experiment import main
 
 if __name__ == "__main__":
-    main()
+    main(["--model", "claude", *sys.argv[1:]])
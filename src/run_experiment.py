@@ -0,0 +1,495 @@
+# src/run_experiment.py
+#
+# Runner unico per gli esperimenti RAG: sostituisce i cinque run_*_experiment.py.
+# Le generazioni vengono eseguite in parallelo (pool di thread limitato + rate limit
+# per provider), ma i risultati vengono scritti nell'ordine delle domande.
+# Ogni generazione completata finisce subito in un journal append-only: rilanciando
+# lo stesso esperimento vengono rigenerate solo le domande mancanti.
+# Con --async le generazioni usano gli AsyncLLMClient su un solo event loop
+# (concorrenza limitata da un semaforo, non dal numero di thread).
+#
+# Esempio:
+#   python run_experiment.py --model openai --concurrency 8
+#   python run_experiment.py --model openai --async --concurrency 200
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Optional
+
+from dotenv import load_dotenv
+
+from config import (
+    EVAL_DIR,
+    EVAL_FILE,
+    JOURNAL_DIR,
+    ARTICLE_ROUTING,
+    RERANKER_MODEL_NAME,
+    RERANK_ENABLED,
+    RERANK_TOP_K,
+    EMBEDDING_MODEL_NAME,
+    EXPERIMENT_MAX_WORKERS,
+    PROVIDER_RATE_LIMITS,
+)
+from experiment_journal import ResultJournal, hash_text, make_journal_key
+from llm_cache import AsyncCachedLLMClient, CachedLLMClient, LLMResponseCache
+from rag_pipeline import prepare_prompt, retrieve_contexts_batch
+from retriever import get_retriever
+
+load_dotenv()
+
+
+# I client vengono importati solo quando servono: così non servono gli SDK
+# di tutti i provider per lanciare un singolo esperimento.
+def _openai_client():
+    from llm_openai import OpenAILLMClient
+    return OpenAILLMClient(model_name=PROVIDERS["openai"]["model_name"])
+
+
+def _claude_client():
+    from llm_claude import ClaudeLLMClient
+    return ClaudeLLMClient(model_name=PROVIDERS["claude"]["model_name"])
+
+
+def _mistral_client():
+    from llm_mistral_api import MistralLLMClient
+    return MistralLLMClient(model_name=PROVIDERS["mistral"]["model_name"])
+
+
+def _llama_client():
+    from llm_llama_hf import LlamaLLMClient
+    return LlamaLLMClient(
+        model_name=PROVIDERS["llama"]["model_name"],
+        temperature=0.0,
+        max_tokens=512,
+    )
+
+
+def _deepseek_client():
+    from llm_deepseek_hf import DeepSeekHFClient
+    return DeepSeekHFClient(model_name=PROVIDERS["deepseek"]["model_name"])
+
+
+def _openai_async_client():
+    from llm_openai import AsyncOpenAILLMClient
+    return AsyncOpenAILLMClient(model_name=PROVIDERS["openai"]["model_name"])
+
+
+def _claude_async_client():
+    from llm_claude import AsyncClaudeLLMClient
+    return AsyncClaudeLLMClient(model_name=PROVIDERS["claude"]["model_name"])
+
+
+def _mistral_async_client():
+    from llm_mistral_api import AsyncMistralLLMClient
+    return AsyncMistralLLMClient(model_name=PROVIDERS["mistral"]["model_name"])
+
+
+def _llama_async_client():
+    from llm_llama_hf import AsyncLlamaLLMClient
+    return AsyncLlamaLLMClient(
+        model_name=PROVIDERS["llama"]["model_name"],
+        temperature=0.0,
+        max_tokens=512,
+    )
+
+
+def _deepseek_async_client():
+    from llm_deepseek_hf import AsyncDeepSeekHFClient
+    return AsyncDeepSeekHFClient(model_name=PROVIDERS["deepseek"]["model_name"])
+
+
+# Provider supportati: etichetta per i log, factory dei client (sincrono e asincrono),
+# modello e file dei risultati
+PROVIDERS: Dict[str, Dict] = {
+    "openai": {
+        "label": "OpenAI",
+        "factory": _openai_client,
+        "async_factory": _openai_async_client,
+        "model_name": "gpt-4o-mini",
+        "results_file": EVAL_DIR / "results_openai_gpt4omini.jsonl",
+    },
+    "claude": {
+        "label": "Claude",
+        "factory": _claude_client,
+        "async_factory": _claude_async_client,
+        "model_name": "claude-sonnet-4-5",
+        "results_file": EVAL_DIR / "results_claude_sonnet.jsonl",
+    },
+    "mistral": {
+        "label": "Mistral",
+        "factory": _mistral_client,
+        "async_factory": _mistral_async_client,
+        "model_name": "mistral-small-latest",
+        "results_file": EVAL_DIR / "results_mistral_api.jsonl",
+    },
+    "llama": {
+        "label": "LLaMA",
+        "factory": _llama_client,
+        "async_factory": _llama_async_client,
+        "model_name": "meta-llama/Meta-Llama-3-8B-Instruct",
+        "results_file": EVAL_DIR / "results_llama_api.jsonl",
+    },
+    "deepseek": {
+        "label": "DeepSeek",
+        "factory": _deepseek_client,
+        "async_factory": _deepseek_async_client,
+        "model_name": "deepseek-ai/DeepSeek-V3",
+        "results_file": EVAL_DIR / "results_deepseek.jsonl",
+    },
+}
+
+
+class RateLimiter:
+    """
+    Limita le richieste a max `rate` al secondo, distanziandone gli avvii.
+    Condiviso tra i thread del pool (wait) o tra le coroutine (await_slot).
+    """
+
+    def __init__(self, rate: Optional[float]):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def _reserve(self) -> float:
+        """
+        Prenota il prossimo slot libero e restituisce quanti secondi mancano.
+        """
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        return slot - now
+
+    def wait(self):
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def await_slot(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def load_eval_dataset(eval_file: Path = EVAL_FILE) -> List[Dict]:
+    """
+    Carica dataset domande-risposte in formato JSONL.
+    Se manca 'id', lo aggiunge automaticamente (progressivo da 1).
+    """
+    if not eval_file.exists():
+        raise FileNotFoundError(f"File di valutazione non trovato: {eval_file}")
+
+    examples: List[Dict] = []
+    with eval_file.open("r", encoding="utf-8") as f:
+        for idx, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            data = json.loads(line)
+
+            if "id" not in data:
+                data["id"] = idx
+
+            examples.append(data)
+
+    print(f"Caricati {len(examples)} esempi di valutazione.")
+    return examples
+
+
+def retrieval_config(top_k: int, rerank: bool = RERANK_ENABLED) -> Dict:
+    """
+    Parametri di retrieval che entrano nella chiave del journal.
+    La modalità è quella effettiva del retriever ("dense" se manca l'indice BM25),
+    non quella richiesta in config.
+    """
+    return {
+        "top_k": top_k,
+        "embedding_model": EMBEDDING_MODEL_NAME,
+        "mode": get_retriever().mode,
+        "article_routing": ARTICLE_ROUTING,
+        "reranker": RERANKER_MODEL_NAME if rerank else None,
+    }
+
+
+def prepare_request(llm, model_id: str, ex: Dict, retrieved: List[Dict], top_k: int, rerank: bool) -> Dict:
+    """
+    Prompt, contesti e chiave del journal di un esempio (parte comune di run_one e run_one_async).
+    """
+    prompt, contexts = prepare_prompt(llm, ex["question"], retrieved)
+    prompt_hash = hash_text(prompt)
+    retrieval = retrieval_config(top_k, rerank)
+    return {
+        "prompt": prompt,
+        "contexts": contexts,
+        "prompt_hash": prompt_hash,
+        "retrieval": retrieval,
+        "key": make_journal_key(ex["id"], model_id, prompt_hash, retrieval),
+    }
+
+
+def make_record(ex: Dict, model_id: str, request: Dict, model_answer: str) -> Dict:
+    return {
+        "id": ex["id"],
+        "question": ex["question"],
+        "gold_answer": ex["answer"],
+        "model_answer": model_answer,
+        "contexts": [c["text"] for c in request["contexts"]],
+        "model": model_id,
+        "prompt_hash": request["prompt_hash"],
+        "retrieval": request["retrieval"],
+    }
+
+
+def failed_record(ex: Dict, label: str, error: Exception) -> Dict:
+    # Gli errori non vanno nel journal: al prossimo avvio la domanda verrà ritentata
+    print(f"[{label}] Errore durante la generazione per id={ex['id']}: {error}")
+    return {
+        "id": ex["id"],
+        "question": ex["question"],
+        "gold_answer": ex["answer"],
+        "model_answer": "",
+        "contexts": [],
+    }
+
+
+def run_one(
+    llm,
+    model_id: str,
+    journal: ResultJournal,
+    limiter: RateLimiter,
+    label: str,
+    ex: Dict,
+    retrieved: List[Dict],
+    top_k: int,
+    rerank: bool,
+) -> Dict:
+    """
+    Genera la risposta per un singolo esempio e restituisce il record da salvare.
+    Se il journal contiene già la stessa chiave, la generazione viene saltata.
+    """
+    request = prepare_request(llm, model_id, ex, retrieved, top_k, rerank)
+    cached = journal.get(request["key"])
+    if cached is not None:
+        return cached
+
+    limiter.wait()
+    try:
+        model_answer = llm.generate(request["prompt"])
+    except Exception as e:
+        return failed_record(ex, label, e)
+
+    record = make_record(ex, model_id, request, model_answer)
+    journal.append(request["key"], record)
+    return record
+
+
+async def run_one_async(
+    llm,
+    model_id: str,
+    journal: ResultJournal,
+    limiter: RateLimiter,
+    semaphore: asyncio.Semaphore,
+    label: str,
+    ex: Dict,
+    retrieved: List[Dict],
+    top_k: int,
+    rerank: bool,
+) -> Dict:
+    """
+    Come run_one, ma con un AsyncLLMClient; il semaforo limita le generazioni in volo.
+    """
+    request = prepare_request(llm, model_id, ex, retrieved, top_k, rerank)
+    cached = journal.get(request["key"])
+    if cached is not None:
+        return cached
+
+    async with semaphore:
+        await limiter.await_slot()
+        try:
+            model_answer = await llm.agenerate(request["prompt"])
+        except Exception as e:
+            return failed_record(ex, label, e)
+
+    record = make_record(ex, model_id, request, model_answer)
+    journal.append(request["key"], record)
+    return record
+
+
+async def run_all_async(
+    llm,
+    model_id: str,
+    journal: ResultJournal,
+    limiter: RateLimiter,
+    concurrency: int,
+    label: str,
+    examples: List[Dict],
+    all_results: List[List[Dict]],
+    top_k: int,
+    rerank: bool,
+) -> List[Dict]:
+    """
+    Tutte le generazioni su un solo event loop; i record tornano nell'ordine delle domande.
+    Alla fine chiude il pool HTTP condiviso del loop.
+    """
+    from http_pool import aclose_async_http_client
+
+    semaphore = asyncio.Semaphore(concurrency)
+    try:
+        return await asyncio.gather(
+            *(
+                run_one_async(llm, model_id, journal, limiter, semaphore, label, ex, retrieved, top_k, rerank)
+                for ex, retrieved in zip(examples, all_results)
+            )
+        )
+    finally:
+        await aclose_async_http_client()
+
+
+def print_record(label: str, record: Dict):
+    print(f"\n=== {label.upper()} – ESEMPIO {record['id']} ===")
+    print(f"Q: {record['question']}")
+    print(f"{label} answer:")
+    print(record["model_answer"][:400], "...")
+    print("-" * 60)
+
+
+def write_results(results_file: Path, records: List[Dict]):
+    """
+    Scrive il file dei risultati (nell'ordine delle domande) in modo atomico.
+    """
+    tmp_file = results_file.with_suffix(results_file.suffix + ".tmp")
+    with tmp_file.open("w", encoding="utf-8") as f_out:
+        for record in records:
+            record = {k: v for k, v in record.items() if k != "journal_key"}
+            f_out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_file, results_file)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Esegue la pipeline RAG sul dataset di valutazione.")
+    parser.add_argument("--model", required=True, choices=sorted(PROVIDERS))
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=EXPERIMENT_MAX_WORKERS,
+        help="Numero massimo di generazioni in parallelo",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=None,
+        help="Richieste al secondo verso il provider (default da config.PROVIDER_RATE_LIMITS)",
+    )
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=None,
+        help=f"Chunk passati all'LLM (default 5, oppure {RERANK_TOP_K} con --rerank)",
+    )
+    parser.add_argument(
+        "--rerank",
+        action=argparse.BooleanOptionalAction,
+        default=RERANK_ENABLED,
+        help="Ri-ordina un pool più ampio di candidati con il cross-encoder",
+    )
+    parser.add_argument("--eval-file", type=Path, default=EVAL_FILE)
+    parser.add_argument("--results-file", type=Path, default=None)
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Generazioni con i client asincroni su un solo event loop (niente pool di thread)",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Disattiva la cache delle risposte LLM")
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Usa solo la cache delle risposte LLM (nessuna chiamata di rete)",
+    )
+    args = parser.parse_args(argv)
+
+    provider = PROVIDERS[args.model]
+    label = provider["label"]
+    results_file = args.results_file or provider["results_file"]
+    rate = args.rate_limit if args.rate_limit is not None else PROVIDER_RATE_LIMITS.get(args.model)
+    top_k = args.top_k if args.top_k is not None else (RERANK_TOP_K if args.rerank else 5)
+
+    # 1) Carica dataset
+    eval_examples = load_eval_dataset(args.eval_file)
+
+    # 2) Retrieval di tutte le domande in un colpo solo, prima di qualsiasi chiamata all'LLM
+    timings: Dict[str, float] = {}
+    all_results = retrieve_contexts_batch(
+        [ex["question"] for ex in eval_examples],
+        top_k=top_k,
+        rerank=args.rerank,
+        timings=timings,
+    )
+
+    # 3) Inizializza LLM (con cache delle risposte) e journal
+    cache = None
+    cached_cls = AsyncCachedLLMClient if args.use_async else CachedLLMClient
+    factory = provider["async_factory"] if args.use_async else provider["factory"]
+    if args.replay:
+        cache = LLMResponseCache()
+        llm = cached_cls(None, cache, read_only=True, model_name=provider["model_name"])
+    elif args.no_cache:
+        llm = factory()
+    else:
+        cache = LLMResponseCache()
+        llm = cached_cls(factory(), cache)
+    model_id = f"{args.model}:{provider['model_name']}"
+    limiter = RateLimiter(rate)
+    journal = ResultJournal(JOURNAL_DIR / f"{results_file.stem}.journal.jsonl")
+    already_done = len(journal)
+
+    # 4) Generazioni in parallelo; raccogliamo i record nell'ordine delle domande
+    results_file.parent.mkdir(parents=True, exist_ok=True)
+    mode = "async" if args.use_async else "thread"
+    print(f"[{label}] concorrenza={args.concurrency} ({mode}), rate limit={rate or '∞'} req/s")
+    print(f"Scriverò i risultati in: {results_file}")
+
+    start = time.perf_counter()
+    if args.use_async:
+        records = asyncio.run(
+            run_all_async(
+                llm, model_id, journal, limiter, args.concurrency, label,
+                eval_examples, all_results, top_k, args.rerank,
+            )
+        )
+        for record in records:
+            print_record(label, record)
+    else:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [
+                pool.submit(run_one, llm, model_id, journal, limiter, label, ex, retrieved, top_k, args.rerank)
+                for ex, retrieved in zip(eval_examples, all_results)
+            ]
+            records = []
+            for future in futures:
+                records.append(future.result())
+                print_record(label, records[-1])
+
+    timings["generation"] = time.perf_counter() - start
+    write_results(results_file, records)
+
+    generated = len(journal) - already_done
+    print(f"\nGenerate {generated} risposte nuove, {len(records) - generated} riprese dal journal o fallite.")
+    if cache is not None:
+        print(f"Cache LLM: {cache.stats()}")
+    print("\nLatenza (tempo reale, su tutto il dataset):")
+    for stage, seconds in timings.items():
+        print(f"  {stage:>10}: {seconds:8.2f} s  ({seconds * 1000 / max(len(records), 1):8.1f} ms/domanda)")
+    print(f"\n✅ Risultati {label} salvati in: {results_file} ({timings['generation']:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
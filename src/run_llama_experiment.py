@@ -1,92 +1,10 @@
 # src/run_llama_experiment.py
+#
+# Mantenuto per compatibilità: equivale a `python run_experiment.py --model llama`.
 
-import json
-from typing import List, Dict
-
-from dotenv import load_dotenv
-
-from config import PROJECT_ROOT
-from rag_pipeline import answer_question
-from llm_llama_hf import LlamaLLMClient
-
-load_dotenv()
-
-EVAL_FILE = PROJECT_ROOT / "data" / "eval" / "ai_act_eval.jsonl"
-RESULTS_FILE = PROJECT_ROOT / "data" / "eval" / "results_llama_api.jsonl"
-
-
-def load_eval_dataset() -> List[Dict]:
-    """
-    Carica dataset domande-risposte in formato JSONL.
-    Se manca 'id', lo aggiunge automaticamente.
-    """
-    if not EVAL_FILE.exists():
-        raise FileNotFoundError(f"File di valutazione non trovato: {EVAL_FILE}")
-
-    examples: List[Dict] = []
-    with EVAL_FILE.open("r", encoding="utf-8") as f:
-        for idx, line in enumerate(f, start=1):
-            line = line.strip()
-            if not line:
-                continue
-            data = json.loads(line)
-
-            if "id" not in data:
-                data["id"] = idx
-
-            examples.append(data)
-
-    print(f"Caricati {len(examples)} esempi di valutazione.")
-    return examples
-
-
-def main():
-    # 1) Carica dataset
-    eval_examples = load_eval_dataset()
-
-    # 2) Inizializza LLaMA
-    llm = LlamaLLMClient(
-        model_name="meta-llama/Meta-Llama-3-8B-Instruct",
-        temperature=0.0,
-        max_tokens=512,
-    )
-
-    # 3) Per ogni domanda, esegui la pipeline RAG
-    RESULTS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    print(f"Scriverò i risultati in: {RESULTS_FILE}")
-
-    with RESULTS_FILE.open("w", encoding="utf-8") as f_out:
-        for ex in eval_examples:
-            qid = ex["id"]
-            question = ex["question"]
-            gold_answer = ex["answer"]
-
-            print(f"\n=== LLAMA – ESEMPIO {qid} ===")
-            print(f"Q: {question}")
-
-            try:
-                model_answer, contexts = answer_question(llm, question, top_k=5)
-            except Exception as e:
-                print(f"Errore durante la generazione per id={qid}: {e}")
-                model_answer = f"Errore LLaMA: {e}"
-                contexts = []
-
-            record = {
-                "id": qid,
-                "question": question,
-                "gold_answer": gold_answer,
-                "model_answer": model_answer,
-                "contexts": [c["text"] for c in contexts],
-            }
-
-            f_out.write(json.dumps(record, ensure_ascii=False) + "\n")
-
-            print("LLaMA answer:")
-            print(model_answer[:400], "...")
-            print("-" * 60)
-
-    print(f"\n✅ Risultati LLaMA salvati in: {RESULTS_FILE}")
+import sys
 
+from run_experiment import main
 
 if __name__ == "__main__":
-    main()
+    main(["--model", "llama", *sys.argv[1:]])
@@ -0,0 +1,277 @@
+# src/run_ragas.py
+#
+# Valutazione RAGAS unica: sostituisce i cinque run_ragas_*.py.
+# Valuta in un solo processo i file di risultati di più modelli con un giudice
+# intercambiabile (ragas_judges.py: "openai" di default, "local" offline) e non rifà
+# il lavoro già fatto:
+#   - le chiamate all'LLM giudice passano da una cache SQLite di langchain
+#     (chiave: prompt + parametri del modello);
+#   - gli embeddings del giudice passano da CacheBackedEmbeddings (chiave: hash del testo);
+#   - ogni punteggio (campione, metrica) viene salvato in RAGAS_SCORE_FILE, con chiave
+#     l'hash del giudice e dei soli campi che la metrica legge (METRIC_INPUTS):
+#     si calcolano solo le coppie mancanti.
+# context_precision e context_recall non dipendono dalla risposta del modello: con
+# contesti condivisi vengono calcolate una volta per (domanda, contesti, riferimento)
+# e il punteggio vale per tutti i modelli.
+# Aggiungere un modello costa quindi solo le chiamate al giudice per i suoi campioni.
+#
+# Esempio:
+#   python run_ragas.py                          # tutti i modelli con un file di risultati
+#   python run_ragas.py --models openai mistral
+#   python run_ragas.py --results-file ../data/eval/results_openai_gpt4omini_no_rag.jsonl
+#   python run_ragas.py --judge local             # offline, medie in ragas_<nome>_local.json
+
+import argparse
+import hashlib
+import json
+import math
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from config import EVAL_DIR, RAGAS_SCORE_FILE
+from ragas_judges import JUDGES, METRIC_NAMES, Judge, make_judge
+
+load_dotenv()
+
+# Campi del campione letti da ciascuna metrica: solo questi entrano nella chiave del punteggio
+METRIC_INPUTS: Dict[str, Tuple[str, ...]] = {
+    "answer_relevancy": ("question", "answer"),
+    "faithfulness": ("question", "answer", "contexts"),
+    "context_precision": ("question", "contexts", "ground_truth"),
+    "context_recall": ("question", "contexts", "ground_truth"),
+}
+
+# Modelli valutabili: file dei risultati (da run_experiment.py) e file delle medie RAGAS
+RAGAS_TARGETS: Dict[str, Tuple[Path, Path]] = {
+    "openai": (EVAL_DIR / "results_openai_gpt4omini.jsonl", EVAL_DIR / "ragas_openai_gpt4omini.json"),
+    "claude": (EVAL_DIR / "results_claude_sonnet.jsonl", EVAL_DIR / "ragas_claude_sonnet.json"),
+    "deepseek": (EVAL_DIR / "results_deepseek.jsonl", EVAL_DIR / "ragas_deepseek.json"),
+    "llama": (EVAL_DIR / "results_llama_api.jsonl", EVAL_DIR / "ragas_llama.json"),
+    "mistral": (EVAL_DIR / "results_mistral_api.jsonl", EVAL_DIR / "ragas_mistral.json"),
+}
+
+
+def score_key(sample: Dict, metric_name: str, judge: Dict) -> str:
+    """
+    Hash SHA-256 di (metrica, identità del giudice, campi del campione letti dalla metrica).
+    Due modelli con gli stessi input per una metrica condividono la chiave,
+    quindi anche il punteggio; cambiare giudice (modello, embeddings, versione di
+    RAGAS, giudice locale) non riusa punteggi non confrontabili.
+    """
+    payload = json.dumps(
+        {
+            "metric": metric_name,
+            "judge": judge,
+            **{field: sample[field] for field in METRIC_INPUTS[metric_name]},
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ScoreStore:
+    """
+    Tabella SQLite chiave -> punteggio per le coppie (campione, metrica) già valutate.
+    I punteggi NaN (giudice che non risponde nel formato atteso) non vengono salvati:
+    saranno ritentati al prossimo avvio.
+    """
+
+    def __init__(self, path: Path = RAGAS_SCORE_FILE):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scores (
+                key TEXT PRIMARY KEY,
+                metric TEXT NOT NULL,
+                score REAL NOT NULL,
+                created REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, float]:
+        keys = list(set(keys))
+        found: Dict[str, float] = {}
+        # SQLite limita il numero di parametri per query
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = self._conn.execute(
+                f"SELECT key, score FROM scores WHERE key IN ({','.join('?' * len(batch))})", batch
+            )
+            found.update(rows)
+        return found
+
+    def put_many(self, metric_name: str, scores: Dict[str, float]):
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO scores (key, metric, score, created) VALUES (?, ?, ?, ?)",
+            [(key, metric_name, score, now) for key, score in scores.items() if not math.isnan(score)],
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def load_results_for_ragas(results_file: Path) -> List[Dict]:
+    """
+    Carica un file di risultati e lo converte nei campi che RAGAS si aspetta
+    (question, answer/response, contexts, ground_truth/reference).
+    Gli esempi senza risposta del modello vengono saltati.
+    """
+    if not results_file.exists():
+        raise FileNotFoundError(f"File risultati non trovato: {results_file}")
+
+    examples = []
+    with results_file.open("r", encoding="utf-8") as f:
+        for idx, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+
+            data = json.loads(line)
+            model_answer = data["model_answer"]
+            if model_answer is None:
+                print(f"[WARN] {results_file.name} riga {idx}: model_answer è None, salto l'esempio.")
+                continue
+
+            examples.append(
+                {
+                    "question": data["question"],
+                    "answer": model_answer,
+                    "response": model_answer,   # alias richiesto da answer_relevancy in alcune versioni di RAGAS
+                    "contexts": data["contexts"],
+                    "ground_truth": data["gold_answer"],
+                    "reference": data["gold_answer"],
+                }
+            )
+
+    print(f"Caricati {len(examples)} esempi da {results_file.name}.")
+    return examples
+
+
+def score_missing(judge: Judge, pending: Dict[str, Dict[str, Dict]], store: ScoreStore) -> Dict[str, float]:
+    """
+    Valuta le coppie mancanti, una metrica alla volta (ogni metrica solo sui
+    campioni che non l'hanno ancora), e salva i punteggi nello store.
+    `pending` è metrica -> {chiave: campione}.
+    """
+    scores: Dict[str, float] = {}
+    for metric_name in METRIC_NAMES:
+        samples = pending.get(metric_name)
+        if not samples:
+            continue
+        print(f"Eseguo {metric_name} su {len(samples)} campioni (giudice {type(judge).__name__})...")
+        keys = list(samples)
+        values = judge.score(metric_name, [samples[key] for key in keys])
+        metric_scores = dict(zip(keys, values))
+        store.put_many(metric_name, metric_scores)
+        scores.update(metric_scores)
+    return scores
+
+
+def write_means(out_file: Path, metric_means: Dict[str, float], num_samples: int):
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+    with out_file.open("w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "metric_means": metric_means,
+                "num_samples": num_samples,
+            },
+            f,
+            indent=2,
+            ensure_ascii=False,
+        )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Valutazione RAGAS (con cache) dei risultati di uno o più modelli.")
+    parser.add_argument("--models", nargs="+", choices=sorted(RAGAS_TARGETS), default=None)
+    parser.add_argument(
+        "--results-file",
+        type=Path,
+        nargs="+",
+        default=[],
+        help="Altri file di risultati (le medie vanno in ragas_<nome>.json accanto al file)",
+    )
+    parser.add_argument("--judge", choices=JUDGES, default="openai", help="Giudice (local = offline)")
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help="Cartella per punteggi e cache del giudice (default: quelle di config)",
+    )
+    parser.add_argument("--out-dir", type=Path, default=None, help="Cartella dei file delle medie")
+    args = parser.parse_args(argv)
+
+    targets: List[Tuple[str, Path, Path]] = []
+    if args.models is None and not args.results_file:
+        # Default: tutti i modelli di cui esiste già un file di risultati
+        targets = [(name, res, out) for name, (res, out) in RAGAS_TARGETS.items() if res.exists()]
+    for name in args.models or []:
+        targets.append((name, *RAGAS_TARGETS[name]))
+    for res in args.results_file:
+        out = res.with_name(res.stem.replace("results_", "ragas_", 1) + ".json")
+        targets.append((res.stem, res, out))
+    if not targets:
+        raise ValueError("Nessun file di risultati da valutare.")
+
+    # 1) Campioni di tutti i file e relative chiavi per metrica
+    judge = make_judge(args.judge, args.cache_dir)
+    identity = judge.identity()
+    samples_by_target: Dict[str, List[Dict]] = {}
+    keys_by_target: Dict[str, List[Dict[str, str]]] = {}
+    for name, results_file, _ in targets:
+        samples = load_results_for_ragas(results_file)
+        if not samples:
+            raise ValueError(f"Nessun esempio valido caricato da {results_file.name}.")
+        samples_by_target[name] = samples
+        keys_by_target[name] = [{m: score_key(s, m, identity) for m in METRIC_NAMES} for s in samples]
+
+    # 2) Punteggi già noti; le coppie mancanti (senza duplicati tra file) vanno al giudice
+    store = ScoreStore(args.cache_dir / RAGAS_SCORE_FILE.name if args.cache_dir else RAGAS_SCORE_FILE)
+    all_keys = [key for keys in keys_by_target.values() for sample_keys in keys for key in sample_keys.values()]
+    scores = store.get_many(all_keys)
+    pending: Dict[str, Dict[str, Dict]] = {m: {} for m in METRIC_NAMES}
+    for name, samples in samples_by_target.items():
+        for sample, sample_keys in zip(samples, keys_by_target[name]):
+            for metric_name, key in sample_keys.items():
+                if key not in scores:
+                    pending[metric_name][key] = sample
+
+    n_pairs = sum(len(keys) * len(METRIC_NAMES) for keys in keys_by_target.values())
+    n_pending = sum(len(p) for p in pending.values())
+    print(
+        f"Coppie (campione, metrica): {n_pairs}, distinte: {len(set(all_keys))}, "
+        f"già in cache: {len(scores)}, da calcolare: {n_pending}"
+    )
+    scores.update(score_missing(judge, pending, store))
+    store.close()
+
+    # 3) Medie per modello (i NaN, come in DataFrame.mean, vengono ignorati)
+    for name, _, out_file in targets:
+        metric_means = {}
+        for metric_name in METRIC_NAMES:
+            values = [scores.get(keys[metric_name], math.nan) for keys in keys_by_target[name]]
+            values = [v for v in values if not math.isnan(v)]
+            metric_means[metric_name] = sum(values) / len(values) if values else math.nan
+
+        out_file = (args.out_dir or out_file.parent) / (out_file.stem + judge.output_suffix + out_file.suffix)
+        print(f"\n=== RISULTATI RAGAS {name.upper()} (media sui casi) ===")
+        for metric_name, value in metric_means.items():
+            print(f"{metric_name}: {value:.4f}")
+
+        write_means(out_file, metric_means, len(samples_by_target[name]))
+        print(f"✅ Risultati RAGAS salvati in: {out_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+# src/service.py
+#
+# Servizio HTTP locale (ASGI) attorno alla pipeline RAG.
+# All'avvio carica una sola volta store dei chunk, indice FAISS/BM25, modello di
+# embeddings e client LLM; poi ogni richiesta riusa le risorse già in memoria.
+# Le richieste sono gestite in concorrenza con asyncio: il retrieval (CPU) gira in
+# un pool di thread dedicato, le generazioni (I/O verso le API) in un pool separato.
+#
+# Endpoint:
+#   GET  /health                                  → {"status": "ok"}
+#   GET  /metrics                                 → statistiche del micro-batching delle query
+#   POST /retrieve  {"question": ..., "top_k": 5} → {"contexts": [{"id", "text"}, ...]}
+#   POST /answer    {"question": ..., "top_k": 5} → {"answer", "contexts", "timings"}
+#   POST /answer    {..., "stream": true}         → NDJSON: una riga {"delta": ...} per pezzo di
+#                                                   risposta, poi {"contexts", "timings"}
+#
+# Esempio:
+#   python service.py --model openai --port 8000
+#   uvicorn service:app_from_env --factory   # modello da RAG_SERVICE_MODEL (default openai)
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import (
+    SERVICE_HOST,
+    SERVICE_PORT,
+    SERVICE_RETRIEVAL_WORKERS,
+    SERVICE_LLM_WORKERS,
+    SERVICE_QUERY_BATCHING,
+    FAKE_LLM_LATENCY,
+)
+from llm_base import LLMClient
+from rag_pipeline import answer_question, answer_question_stream, retrieve_contexts
+from retriever import Retriever, get_retriever
+
+SERVICE_MODELS = ["fake", "openai", "claude", "mistral", "llama", "deepseek"]
+
+
+class BadRequest(ValueError):
+    """
+    Richiesta non valida: diventa una risposta 400.
+    """
+
+
+def make_llm_factory(model: str, fake_latency: float = FAKE_LLM_LATENCY) -> Callable[[], LLMClient]:
+    """
+    Factory del client LLM del servizio: "fake" per i test offline, altrimenti
+    uno dei provider di run_experiment.py (con la cache delle risposte).
+    Gli SDK vengono importati solo quando la factory viene chiamata (allo startup).
+    """
+    if model == "fake":
+        from llm_fake import FakeLLMClient
+        return partial(FakeLLMClient, latency=fake_latency)
+
+    def factory() -> LLMClient:
+        from llm_cache import CachedLLMClient
+        from run_experiment import PROVIDERS
+        return CachedLLMClient(PROVIDERS[model]["factory"]())
+
+    return factory
+
+
+async def read_json(receive) -> Dict:
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    try:
+        payload = json.loads(body or b"{}")
+    except json.JSONDecodeError as e:
+        raise BadRequest(f"JSON non valido: {e}")
+    if not isinstance(payload, dict):
+        raise BadRequest("Il corpo della richiesta deve essere un oggetto JSON")
+    return payload
+
+
+async def send_json(send, status: int, payload: Dict):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json; charset=utf-8"),
+                (b"content-length", str(len(body)).encode("ascii")),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def parse_query(payload: Dict) -> Tuple[str, int]:
+    question = payload.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise BadRequest("Campo 'question' mancante o vuoto")
+    top_k = payload.get("top_k", 5)
+    if not isinstance(top_k, int) or isinstance(top_k, bool) or not 1 <= top_k <= 50:
+        raise BadRequest("Campo 'top_k' deve essere un intero tra 1 e 50")
+    return question, top_k
+
+
+def serialize_contexts(contexts: List[Dict]) -> List[Dict]:
+    return [{"id": c["id"], "text": c["text"]} for c in contexts]
+
+
+class RAGService:
+    """
+    Applicazione ASGI. Le risorse vengono caricate nel lifespan "startup"
+    (uvicorn lo esegue prima di accettare connessioni) e i pool chiusi allo "shutdown".
+    """
+
+    def __init__(
+        self,
+        llm_factory: Callable[[], LLMClient],
+        retrieval_workers: int = SERVICE_RETRIEVAL_WORKERS,
+        llm_workers: int = SERVICE_LLM_WORKERS,
+    ):
+        self.llm_factory = llm_factory
+        self.retrieval_workers = retrieval_workers
+        self.llm_workers = llm_workers
+        self.retriever: Optional[Retriever] = None
+        self.llm: Optional[LLMClient] = None
+        self.retrieval_pool: Optional[ThreadPoolExecutor] = None
+        self.llm_pool: Optional[ThreadPoolExecutor] = None
+
+    async def startup(self):
+        start = time.perf_counter()
+        self.retrieval_pool = ThreadPoolExecutor(self.retrieval_workers, thread_name_prefix="retrieval")
+        self.llm_pool = ThreadPoolExecutor(self.llm_workers, thread_name_prefix="llm")
+
+        loop = asyncio.get_running_loop()
+        self.retriever = await loop.run_in_executor(self.retrieval_pool, get_retriever)
+        if SERVICE_QUERY_BATCHING:
+            self.retriever.enable_batching()
+        # Una query di riscaldamento: il primo encode paga l'inizializzazione del modello
+        await loop.run_in_executor(self.retrieval_pool, self.retriever.search, "warm-up", 1)
+        self.llm = await loop.run_in_executor(self.llm_pool, self.llm_factory)
+        print(f"✅ Servizio pronto in {time.perf_counter() - start:.1f} s")
+
+    async def shutdown(self):
+        """
+        Attende le richieste ancora in corso nei pool (senza bloccare il loop), poi
+        ferma il micro-batcher: le ricerche in corso possono ancora averne bisogno.
+        """
+        loop = asyncio.get_running_loop()
+        for pool in (self.retrieval_pool, self.llm_pool):
+            if pool is not None:
+                await loop.run_in_executor(None, partial(pool.shutdown, wait=True))
+        if self.retriever is not None:
+            self.retriever.disable_batching()
+
+    async def retrieve(self, payload: Dict) -> Dict:
+        question, top_k = parse_query(payload)
+        timings: Dict[str, float] = {}
+        contexts = await asyncio.get_running_loop().run_in_executor(
+            self.retrieval_pool,
+            partial(retrieve_contexts, question, top_k=top_k, retriever=self.retriever, timings=timings),
+        )
+        return {"contexts": serialize_contexts(contexts), "timings": timings}
+
+    async def answer(self, payload: Dict) -> Dict:
+        question, top_k = parse_query(payload)
+        loop = asyncio.get_running_loop()
+        timings: Dict[str, float] = {}
+
+        # Retrieval nel pool CPU, generazione nel pool delle chiamate LLM:
+        # le attese sulle API non occupano i thread del retrieval
+        contexts = await loop.run_in_executor(
+            self.retrieval_pool,
+            partial(retrieve_contexts, question, top_k=top_k, retriever=self.retriever, timings=timings),
+        )
+        answer, used_contexts = await loop.run_in_executor(
+            self.llm_pool,
+            partial(answer_question, self.llm, question, contexts=contexts, timings=timings),
+        )
+        return {"answer": answer, "contexts": serialize_contexts(used_contexts), "timings": timings}
+
+    async def answer_stream(self, payload: Dict, receive, send):
+        """
+        /answer in streaming: i delta dell'LLM vengono inoltrati al client appena
+        arrivano (una riga JSON ciascuno), così il primo token non aspetta la risposta intera.
+        Se il client si disconnette la generazione viene interrotta al delta successivo,
+        senza continuare a consumare un thread del pool LLM e la quota del provider.
+        """
+        question, top_k = parse_query(payload)
+        loop = asyncio.get_running_loop()
+        timings: Dict[str, float] = {}
+
+        contexts = await loop.run_in_executor(
+            self.retrieval_pool,
+            partial(retrieve_contexts, question, top_k=top_k, retriever=self.retriever, timings=timings),
+        )
+        deltas, used_contexts = await loop.run_in_executor(
+            self.retrieval_pool,
+            partial(answer_question_stream, self.llm, question, contexts=contexts, timings=timings),
+        )
+
+        # Lo stream dell'LLM è bloccante: lo consuma un thread del pool LLM e passa i delta al loop.
+        # stop chiede al thread di smettere (client disconnesso o invio fallito)
+        events: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def pump():
+            try:
+                for delta in deltas:
+                    if stop.is_set():
+                        return
+                    loop.call_soon_threadsafe(events.put_nowait, ("delta", delta))
+                loop.call_soon_threadsafe(events.put_nowait, ("end", None))
+            except Exception as e:
+                if not stop.is_set():
+                    loop.call_soon_threadsafe(events.put_nowait, ("error", str(e)))
+            finally:
+                # Chiude lo stream del provider (e la sua connessione) se è stato interrotto
+                deltas.close()
+
+        async def watch_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            stop.set()
+            events.put_nowait(("disconnect", None))
+
+        pump_future = loop.run_in_executor(self.llm_pool, pump)
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [(b"content-type", b"application/x-ndjson; charset=utf-8")],
+                }
+            )
+            while True:
+                kind, value = await events.get()
+                if kind == "disconnect":
+                    return
+                if kind == "delta":
+                    line = {"delta": value}
+                elif kind == "end":
+                    line = {"contexts": serialize_contexts(used_contexts), "timings": timings}
+                else:
+                    # Gli header sono già partiti: l'errore va nell'ultima riga dello stream
+                    print(f"Errore durante lo streaming: {value}")
+                    line = {"error": value}
+                body = (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+                await send({"type": "http.response.body", "body": body, "more_body": kind == "delta"})
+                if kind != "delta":
+                    return
+        finally:
+            stop.set()
+            watcher.cancel()
+            # Il thread esce al prossimo delta: lo si attende per osservarne gli errori
+            try:
+                await pump_future
+            except Exception as e:
+                print(f"Errore nel thread dello streaming: {e}")
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        routes = {"/retrieve": self.retrieve, "/answer": self.answer}
+        path, method = scope["path"], scope["method"]
+
+        if path == "/health":
+            ready = self.retriever is not None and self.llm is not None
+            await send_json(send, 200 if ready else 503, {"status": "ok" if ready else "starting"})
+            return
+        if path == "/metrics":
+            batcher = self.retriever.batcher if self.retriever is not None else None
+            await send_json(send, 200, {"query_batching": batcher.stats() if batcher else None})
+            return
+        if path not in routes:
+            await send_json(send, 404, {"error": f"Endpoint non trovato: {path}"})
+            return
+        if method != "POST":
+            await send_json(send, 405, {"error": "Metodo non consentito: usare POST"})
+            return
+        if self.retriever is None or self.llm is None:
+            await send_json(send, 503, {"error": "Servizio non ancora pronto"})
+            return
+
+        try:
+            payload = await read_json(receive)
+            if path == "/answer" and payload.get("stream"):
+                await self.answer_stream(payload, receive, send)
+                return
+            result = await routes[path](payload)
+        except BadRequest as e:
+            await send_json(send, 400, {"error": str(e)})
+            return
+        except Exception as e:
+            print(f"Errore su {path}: {e}")
+            await send_json(send, 500, {"error": str(e)})
+            return
+        await send_json(send, 200, result)
+
+
+def create_app(model: str = "openai", fake_latency: float = FAKE_LLM_LATENCY) -> RAGService:
+    if model not in SERVICE_MODELS:
+        raise ValueError(f"Modello non supportato: {model} (disponibili: {', '.join(SERVICE_MODELS)})")
+    return RAGService(make_llm_factory(model, fake_latency))
+
+
+def app_from_env() -> RAGService:
+    """
+    Factory per `uvicorn service:app_from_env --factory`: il modello è letto da
+    RAG_SERVICE_MODEL solo quando uvicorn crea l'app, così importare service non
+    costruisce nulla (né richiede le chiavi API).
+    """
+    return create_app(os.environ.get("RAG_SERVICE_MODEL", "openai"))
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Servizio HTTP della pipeline RAG.")
+    parser.add_argument("--model", default="openai", choices=SERVICE_MODELS)
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--fake-latency", type=float, default=FAKE_LLM_LATENCY, help="Latenza dell'LLM finto (s)")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.model, args.fake_latency), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# src/sparse_index.py
+#
+# Indice invertito BM25 sui chunk, costruito da build_vector_store.py accanto a
+# faiss_index.bin, nella stessa generazione del vector store (vector_store.py): i
+# documenti sono identificati dai faiss_id di quella generazione, che dopo una
+# ricostruzione completa sono posizioni, quindi l'indice vale solo per i suoi chunk.
+# Formato su disco (cartella bm25/ della generazione), tutto numpy in CSR:
+#   - vocab.json        : termine → term_id
+#   - term_offsets.npy  : int64 [V+1], le postings del termine t sono [off[t], off[t+1])
+#   - postings_docs.npy : int32, documento (posizione nel vector store) di ogni posting
+#   - postings_tf.npy   : float32, frequenza del termine nel documento
+#   - doc_lengths.npy   : float32, lunghezza (in termini) di ogni documento
+#   - doc_ids.npy       : int64, faiss_id di ogni documento
+#   - meta.json         : parametri BM25, numero di documenti e id della generazione
+# Gli array vengono aperti in mmap; lo scoring di una query è interamente vettoriale
+# (concatenazione delle postings + np.bincount), senza loop Python sui documenti.
+
+import json
+import re
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import BM25_K1, BM25_B
+from vector_store import Generation, current_generation
+
+# Parole alfanumeriche; "post-remote" → ["post", "remote"], "5(b)" → ["5", "b"]
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Parole funzionali molto frequenti: non discriminano e allungherebbero le postings da scorrere
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this "
+    "to was were which will with shall such".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokenizzazione per BM25: minuscolo, sequenze alfanumeriche, senza stopwords.
+    """
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def build_sparse_index(chunks: List[Dict], index_dir: Path, generation: str):
+    """
+    Costruisce l'indice invertito dei chunk (nell'ordine della metadata) e lo
+    salva in index_dir, la cartella bm25/ di una generazione non ancora
+    pubblicata: diventa visibile insieme all'indice FAISS e alla metadata.
+    """
+    vocab: Dict[str, int] = {}
+    term_ids: List[int] = []
+    doc_pos: List[int] = []
+    tfs: List[int] = []
+    doc_lengths = np.zeros(len(chunks), dtype="float32")
+
+    for pos, ch in enumerate(chunks):
+        tokens = tokenize(ch["text"])
+        doc_lengths[pos] = len(tokens)
+        for term, tf in Counter(tokens).items():
+            term_ids.append(vocab.setdefault(term, len(vocab)))
+            doc_pos.append(pos)
+            tfs.append(tf)
+
+    # Ordinamento stabile per termine: le postings di ogni termine restano ordinate per documento
+    term_ids_arr = np.asarray(term_ids, dtype="int64")
+    order = np.argsort(term_ids_arr, kind="stable")
+    counts = np.bincount(term_ids_arr, minlength=len(vocab))
+    term_offsets = np.zeros(len(vocab) + 1, dtype="int64")
+    np.cumsum(counts, out=term_offsets[1:])
+
+    index_dir.mkdir(parents=True, exist_ok=True)
+    np.save(index_dir / "term_offsets.npy", term_offsets)
+    np.save(index_dir / "postings_docs.npy", np.asarray(doc_pos, dtype="int32")[order])
+    np.save(index_dir / "postings_tf.npy", np.asarray(tfs, dtype="float32")[order])
+    np.save(index_dir / "doc_lengths.npy", doc_lengths)
+    np.save(
+        index_dir / "doc_ids.npy",
+        np.array([ch.get("faiss_id", pos) for pos, ch in enumerate(chunks)], dtype="int64"),
+    )
+    with (index_dir / "vocab.json").open("w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+    with (index_dir / "meta.json").open("w", encoding="utf-8") as f:
+        meta = {"n_docs": len(chunks), "n_terms": len(vocab), "k1": BM25_K1, "b": BM25_B, "generation": generation}
+        json.dump(meta, f)
+
+    print(f"Indice BM25 salvato in: {index_dir} ({len(vocab)} termini, {len(term_ids)} postings)")
+
+
+class SparseIndex:
+    """
+    Indice BM25 in sola lettura, con gli array aperti in mmap.
+    search() restituisce (score, faiss_id) dei top_k documenti per la query.
+    """
+
+    def __init__(self, index_dir: Path):
+        if not (index_dir / "meta.json").exists():
+            raise FileNotFoundError(f"Indice BM25 non trovato: {index_dir}")
+
+        with (index_dir / "meta.json").open("r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with (index_dir / "vocab.json").open("r", encoding="utf-8") as f:
+            self.vocab: Dict[str, int] = json.load(f)
+
+        self.term_offsets = np.load(index_dir / "term_offsets.npy", mmap_mode="r")
+        self.postings_docs = np.load(index_dir / "postings_docs.npy", mmap_mode="r")
+        self.postings_tf = np.load(index_dir / "postings_tf.npy", mmap_mode="r")
+        self.doc_ids = np.load(index_dir / "doc_ids.npy", mmap_mode="r")
+        doc_lengths = np.load(index_dir / "doc_lengths.npy")
+
+        self.n_docs = meta["n_docs"]
+        self.generation: Optional[str] = meta.get("generation")
+        self.k1 = meta["k1"]
+        b = meta["b"]
+
+        # Parti dello score che non dipendono dalla query, calcolate una volta sola:
+        # idf per termine e normalizzazione per lunghezza di ogni documento
+        df = np.diff(self.term_offsets).astype("float32")
+        self.idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5)).astype("float32")
+        avgdl = float(doc_lengths.mean()) if self.n_docs else 0.0
+        self.doc_norm = (self.k1 * (1.0 - b + b * doc_lengths / max(avgdl, 1e-9))).astype("float32")
+
+        print(f"Indice BM25 caricato. Documenti: {self.n_docs}, termini: {len(self.vocab)}")
+
+    def scores(self, query: str) -> np.ndarray:
+        """
+        Score BM25 della query per tutti i documenti (array float32 [n_docs]).
+        """
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids:
+            return np.zeros(self.n_docs, dtype="float32")
+
+        ranges = [(self.term_offsets[t], self.term_offsets[t + 1]) for t in term_ids]
+        docs = np.concatenate([self.postings_docs[s:e] for s, e in ranges])
+        tf = np.concatenate([self.postings_tf[s:e] for s, e in ranges])
+        idf = np.repeat(self.idf[list(term_ids)], [e - s for s, e in ranges])
+
+        contrib = idf * tf * (self.k1 + 1.0) / (tf + self.doc_norm[docs])
+        return np.bincount(docs, weights=contrib, minlength=self.n_docs).astype("float32")
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[float, int]]:
+        """
+        Restituisce i top_k documenti con score > 0, come (score, faiss_id).
+        """
+        scores = self.scores(query)
+        k = min(top_k, self.n_docs)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(float(scores[i]), int(self.doc_ids[i])) for i in top if scores[i] > 0]
+
+
+def load_sparse_index(generation: Optional[Generation] = None) -> Optional[SparseIndex]:
+    """
+    Indice BM25 della generazione (di default quella attiva), o None se manca o non
+    è stato costruito per i suoi chunk: i suoi faiss_id indicherebbero chunk
+    sbagliati, quindi il retriever ripiega sul retrieval denso.
+    """
+    generation = generation or current_generation()
+    try:
+        index = SparseIndex(generation.sparse_index_dir)
+    except FileNotFoundError as e:
+        print(f"{e}: uso il retrieval denso (rilancia build_vector_store.py per l'ibrido).")
+        return None
+    if index.generation != generation.id or index.n_docs != generation.n_chunks:
+        print(
+            f"Indice BM25 non costruito per questa generazione ({index.n_docs} documenti, "
+            f"{generation.n_chunks} chunk): uso il retrieval denso (rilancia build_vector_store.py)."
+        )
+        return None
+    return index
+
+
+def main():
+    # Esempio di test: latenza e risultati BM25 per una query con termini esatti
+    query = "post-remote biometric identification Annex III point 5(b)"
+    index = load_sparse_index()
+    if index is None:
+        return
+
+    start = time.perf_counter()
+    for _ in range(100):
+        results = index.search(query, top_k=5)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / 100
+
+    print(f"Query: {query}")
+    print(f"Latenza media: {elapsed_ms:.3f} ms")
+    for score, faiss_id in results:
+        print(f"  faiss_id={faiss_id}  score={score:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# src/sweep.py
+#
+# Sweep dei parametri di chunking / embeddings / top_k valutati con eval_retrieval.py.
+# Ogni combinazione (strategia, chunk size, overlap, modello di embeddings) è una
+# variante con la propria cartella di artefatti SWEEP_DIR/<hash dei parametri>:
+# corpus a chunk, vector store e metriche vengono prodotti da un processo figlio
+# con i parametri passati come variabili d'ambiente (override di config.py).
+# Le varianti già costruite (build.json presente) vengono riusate: si rifà solo la
+# valutazione del retrieval, che non chiama API. top_k non richiede ricostruzioni:
+# ogni variante viene valutata per tutti i top_k richiesti.
+# Tutte le varianti sono giudicate con lo stesso modello di riferimento (--reference-model),
+# anche quelle con un altro modello di embeddings: le metriche sono confrontabili.
+# Alla fine una tabella confronta le varianti e marca con * quelle sulla frontiera
+# di Pareto tra le righe con lo stesso top_k (nessun'altra ha meno token di contesto
+# con hit@k e coverage almeno uguali).
+#
+# Esempio:
+#   python sweep.py --chunk-sizes 256 512 --overlaps 32 64 --top-k 3 5 --jobs 2
+#   python sweep.py --strategies tokens --embedding-models sentence-transformers/all-MiniLM-L6-v2 BAAI/bge-small-en-v1.5
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import (
+    AI_ACT_RAW_FILE,
+    CHUNKING_STRATEGY,
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    EMBEDDING_MODEL_NAME,
+    FAISS_INDEX_TYPE,
+    RETRIEVAL_EVAL_MODEL_NAME,
+    SWEEP_DIR,
+)
+
+# Parametro della variante → variabile d'ambiente letta da config.py
+SWEEP_ENV = {
+    "chunking_strategy": "RAG_CHUNKING_STRATEGY",
+    "chunk_max_tokens": "RAG_CHUNK_MAX_TOKENS",
+    "chunk_overlap_tokens": "RAG_CHUNK_OVERLAP_TOKENS",
+    "embedding_model": "RAG_EMBEDDING_MODEL_NAME",
+}
+
+
+def file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def variant_key(params: Dict) -> str:
+    """
+    Hash dei parametri che determinano gli artefatti (nome della cartella della variante).
+    """
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def build_and_evaluate(top_ks: List[int], rerank: bool, reference_model: str):
+    """
+    Eseguito nel processo figlio, con config già puntato alla cartella della variante:
+    costruisce corpus e vector store se mancano, poi valuta il retrieval per ogni top_k
+    giudicando la rilevanza con reference_model.
+    """
+    from config import PROCESSED_DIR
+
+    marker = PROCESSED_DIR / "build.json"
+    if not marker.exists():
+        import build_vector_store
+        import prepare_corpus
+
+        start = time.perf_counter()
+        prepare_corpus.main()
+        build_vector_store.main([])
+        marker.write_text(json.dumps({"build_s": time.perf_counter() - start}), encoding="utf-8")
+
+    from eval_retrieval import ReferenceEmbedder, evaluate_retrieval
+
+    reference = ReferenceEmbedder(reference_model)
+    results = [evaluate_retrieval(top_k, rerank, reference=reference) for top_k in top_ks]
+    with (PROCESSED_DIR / "retrieval.json").open("w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+def run_variant(params: Dict, top_ks: List[int], rerank: bool, reference_model: str, threads: int) -> Dict:
+    """
+    Costruisce/valuta una variante in un processo separato; il log va in sweep.log nella sua cartella.
+    """
+    variant_dir = SWEEP_DIR / variant_key(params)
+    variant_dir.mkdir(parents=True, exist_ok=True)
+    (variant_dir / "params.json").write_text(json.dumps(params, indent=2, ensure_ascii=False), encoding="utf-8")
+    reused = (variant_dir / "build.json").exists()
+
+    env = dict(os.environ, RAG_PROCESSED_DIR=str(variant_dir))
+    env.update({var: str(params[name]) for name, var in SWEEP_ENV.items()})
+    # Più varianti in parallelo: i thread di torch/FAISS vengono divisi tra i processi
+    env.setdefault("OMP_NUM_THREADS", str(threads))
+
+    cmd = [sys.executable, __file__, "--child", "--top-k", *map(str, top_ks)]
+    cmd.append("--rerank" if rerank else "--no-rerank")
+    cmd += ["--reference-model", reference_model]
+    start = time.perf_counter()
+    with (variant_dir / "sweep.log").open("w", encoding="utf-8") as log:
+        proc = subprocess.run(cmd, env=env, stdout=log, stderr=subprocess.STDOUT)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        print(f"❌ Variante {variant_dir.name} fallita: vedi {variant_dir / 'sweep.log'}")
+        return {"key": variant_dir.name, "params": params, "error": True}
+
+    print(f"Variante {variant_dir.name} {'riusata' if reused else 'costruita'} in {elapsed:.1f} s")
+    results = json.loads((variant_dir / "retrieval.json").read_text(encoding="utf-8"))
+    n_chunks = sum(1 for _ in (variant_dir / "ai_act_chunks.jsonl").open("r", encoding="utf-8"))
+    return {"key": variant_dir.name, "params": params, "reused": reused, "n_chunks": n_chunks, "results": results}
+
+
+def pareto_front(rows: List[Dict]) -> List[bool]:
+    """
+    True per le righe non dominate: nessun'altra ha token <= e hit@k, coverage >= (con almeno un <, >).
+    Ha senso solo tra righe con lo stesso top_k (hit@k con k diversi non sono confrontabili).
+    """
+    points = [(r["tokens"], -r["hit"], -r["coverage"]) for r in rows]
+    return [
+        not any(q != p and all(qi <= pi for qi, pi in zip(q, p)) for q in points)
+        for p in points
+    ]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Sweep di chunking / embeddings / top_k valutato sul retrieval.")
+    parser.add_argument("--strategies", nargs="+", default=[CHUNKING_STRATEGY], choices=["structure", "tokens"])
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[CHUNK_MAX_TOKENS])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[CHUNK_OVERLAP_TOKENS])
+    parser.add_argument("--embedding-models", nargs="+", default=[EMBEDDING_MODEL_NAME])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[3, 5, 8])
+    parser.add_argument("--rerank", action=argparse.BooleanOptionalAction, default=False)
+    parser.add_argument(
+        "--reference-model",
+        default=RETRIEVAL_EVAL_MODEL_NAME,
+        help="Modello di embeddings che giudica la rilevanza per tutte le varianti",
+    )
+    parser.add_argument("--jobs", type=int, default=2, help="Varianti costruite in parallelo")
+    parser.add_argument("--output", type=Path, default=None, help="File JSON con tutte le righe della tabella")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        build_and_evaluate(args.top_k, args.rerank, args.reference_model)
+        return
+
+    corpus_hash = file_hash(AI_ACT_RAW_FILE)
+    variants = []
+    for strategy, size, overlap, model in itertools.product(
+        args.strategies, args.chunk_sizes, args.overlaps, args.embedding_models
+    ):
+        if overlap >= size:
+            print(f"Salto chunk={size}, overlap={overlap}: l'overlap deve essere minore della dimensione.")
+            continue
+        variants.append(
+            {
+                "chunking_strategy": strategy,
+                "chunk_max_tokens": size,
+                "chunk_overlap_tokens": overlap,
+                "embedding_model": model,
+                "faiss_index_type": FAISS_INDEX_TYPE,
+                "corpus_sha256": corpus_hash,
+            }
+        )
+
+    jobs = max(1, min(args.jobs, len(variants)))
+    threads = max(1, (os.cpu_count() or 1) // jobs)
+    print(f"{len(variants)} varianti, {jobs} in parallelo, artefatti in {SWEEP_DIR}")
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        outcomes = list(
+            pool.map(lambda p: run_variant(p, args.top_k, args.rerank, args.reference_model, threads), variants)
+        )
+
+    rows = []
+    for outcome in outcomes:
+        if outcome.get("error"):
+            continue
+        params = outcome["params"]
+        for result in outcome["results"]:
+            metrics = result["metrics"]
+            rows.append(
+                {
+                    "key": outcome["key"],
+                    "strategy": params["chunking_strategy"],
+                    "chunk": params["chunk_max_tokens"],
+                    "overlap": params["chunk_overlap_tokens"],
+                    "model": params["embedding_model"],
+                    "n_chunks": outcome["n_chunks"],
+                    "top_k": result["top_k"],
+                    "hit@1": metrics["hit@1"],
+                    "hit": metrics[f"hit@{result['top_k']}"],
+                    "mrr": metrics["mrr"],
+                    "coverage": metrics["coverage"],
+                    "tokens": metrics["avg_context_tokens"],
+                }
+            )
+    rows.sort(key=lambda r: (r["top_k"], r["tokens"]))
+    for _, group in itertools.groupby(rows, key=lambda r: r["top_k"]):
+        group = list(group)
+        for row, best in zip(group, pareto_front(group)):
+            row["pareto"] = best
+
+    print("\n=== SWEEP: RETRIEVAL PER VARIANTE (per top_k, ordinato per token di contesto) ===")
+    print(f"Rilevanza giudicata con: {args.reference_model}; * = frontiera di Pareto a parità di top_k")
+    print(
+        f"{'':1} {'variante':>12} {'strategia':>9} {'chunk':>6} {'overlap':>7} {'modello':>24} {'n chunk':>8} "
+        f"{'top_k':>5} {'hit@1':>6} {'hit@k':>6} {'MRR':>6} {'coverage':>8} {'token':>7}"
+    )
+    for r in rows:
+        print(
+            f"{'*' if r['pareto'] else '':1} {r['key']:>12} {r['strategy']:>9} {r['chunk']:>6} {r['overlap']:>7} "
+            f"{r['model'].split('/')[-1][:24]:>24} {r['n_chunks']:>8} {r['top_k']:>5} {r['hit@1']:>6.3f} "
+            f"{r['hit']:>6.3f} {r['mrr']:>6.3f} {r['coverage']:>8.3f} {r['tokens']:>7.0f}"
+        )
+
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with args.output.open("w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False)
+        print(f"\n✅ Tabella dello sweep salvata in: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
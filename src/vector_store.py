@@ -0,0 +1,74 @@
+# src/vector_store.py
+#
+# Generazioni del vector store. Ogni build di build_vector_store.py scrive una nuova
+# sottocartella di VECTOR_STORE_DIR con tutto ciò che dipende da ordine e id dei chunk:
+#   - faiss_index.bin       : indice FAISS
+#   - chunks_metadata.jsonl : metadata dei chunk (id, text, faiss_id, hash, ...)
+#   - chunk_store/          : la stessa metadata in formato binario (chunk_store.py)
+#   - bm25/                 : indice BM25 sugli stessi faiss_id (sparse_index.py)
+#   - manifest.json         : id della generazione, numero di chunk, dimensione e sha256 dei file
+# e la rende attiva sostituendo una sola volta il file CURRENT (artifacts.py): chi
+# carica vede sempre file della stessa generazione, mai un indice nuovo con la
+# metadata vecchia, e un crash a metà build lascia attiva la generazione precedente.
+# Al caricamento si confrontano solo id della generazione e numero di chunk (costo
+# costante); la verifica degli sha256 è un comando esplicito:
+#   python vector_store.py --verify
+
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+from artifacts import current_version, read_manifest, verify_manifest
+from config import (
+    VECTOR_STORE_DIR,
+    FAISS_INDEX_NAME,
+    CHUNKS_METADATA_NAME,
+    CHUNK_STORE_NAME,
+    SPARSE_INDEX_NAME,
+)
+
+
+class Generation:
+    """
+    Una generazione pubblicata del vector store: percorsi dei file e dati del manifest.
+    """
+
+    def __init__(self, version_dir: Path):
+        manifest = read_manifest(version_dir)
+        self.dir = version_dir
+        self.id: str = manifest["generation"]
+        self.n_chunks: int = manifest["n_chunks"]
+        self.index_file = version_dir / FAISS_INDEX_NAME
+        self.metadata_file = version_dir / CHUNKS_METADATA_NAME
+        self.chunk_store_dir = version_dir / CHUNK_STORE_NAME
+        self.sparse_index_dir = version_dir / SPARSE_INDEX_NAME
+
+
+def current_generation(base_dir: Path = VECTOR_STORE_DIR) -> Generation:
+    """
+    Generazione attiva del vector store (FileNotFoundError se non è mai stato costruito).
+    """
+    version_dir = current_version(base_dir)
+    if version_dir is None:
+        raise FileNotFoundError(f"Vector store non trovato: {base_dir} (lancia build_vector_store.py)")
+    return Generation(version_dir)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Mostra (e verifica) la generazione attiva del vector store.")
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Ricalcola lo sha256 dei file e lo confronta con il manifest (lento su corpora grandi)",
+    )
+    args = parser.parse_args(argv)
+
+    generation = current_generation()
+    print(f"Generazione {generation.id}: {generation.n_chunks} chunk in {generation.dir}")
+    if args.verify:
+        verify_manifest(generation.dir)
+        print("✅ I file della generazione corrispondono al manifest.")
+
+
+if __name__ == "__main__":
+    main()